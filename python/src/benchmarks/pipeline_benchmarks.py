@@ -0,0 +1,154 @@
+import argparse
+import copy
+import json
+import os
+import platform
+import resource
+import time
+import numpy as np
+import src.benchmarks.synthetic_dataset as sd
+import src.pipelines.zebra_wings.pipeline as pl
+import src.pipelines.zebra_wings.models.ner_decoder as nd
+
+# Latency and throughput of each stage of the zebra wings pipeline, for several batch sizes and sentence lengths.
+# Uses a synthetic dataset and the dictionary bundled with the typescript package, the models are not trained
+# (the weights don't change the cost of the predictions). Run from the python directory with:
+#   python -m src.benchmarks.pipeline_benchmarks --output benchmarks.json
+
+DEFAULT_DICTIONARY_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'typescript', 'dictionary')
+
+
+def peak_rss_mb():
+    # NOTE: ru_maxrss is in kilobytes on linux (bytes on macOS)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(fn, repeats, warmup=1):
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def latency_stats(latencies, batch_size):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        'meanMs': float(latencies.mean() * 1000),
+        'p50Ms': float(p50),
+        'p95Ms': float(p95),
+        'p99Ms': float(p99),
+        'sentencesPerSecond': float(batch_size / latencies.mean()),
+        'peakRssMb': peak_rss_mb(),
+    }
+
+
+def pipeline_stages(pipeline, dataset_params, sentences, backend):
+    # each stage gets the outputs of the previous ones precomputed, so only its own cost is measured
+    models = pipeline.models()
+    embeddings_model = models['embedding']
+    tokens = embeddings_model.tokenize(sentences)
+    embedded = embeddings_model.embed(sentences, tokens)
+    classification = models['classification'].predict(sentences, embedded, backend)
+    intents = dataset_params['intents']
+    intent_labels = np.eye(len(intents), dtype=np.float32)[[intents.index(p['intent']) for p in classification]]
+    ner_output = models['ner'].bucketed_prediction(intent_labels, embedded, backend)
+    slot_names = nd.slot_names(dataset_params['slotsToId'])
+    threshold = pl.default_pipeline_definition['config']['ner']['lowConfidenceThreshold']
+    return {
+        'tokenize': lambda: embeddings_model.tokenize(sentences),
+        'wordIds': lambda: embeddings_model.sentence_to_word_ids(sentences, tokens),
+        'embed': lambda: embeddings_model.embed(sentences, tokens),
+        'classificationForward': lambda: models['classification'].raw_output(sentences, embedded, backend),
+        'nerForward': lambda: models['ner'].bucketed_prediction(intent_labels, embedded, backend),
+        'nerDecode': lambda: nd.decode(ner_output, sentences, tokens, slot_names, threshold),
+        'predict': lambda: pipeline.predict(sentences, backend),
+    }
+
+
+def run_benchmarks(
+    dictionary_path=DEFAULT_DICTIONARY_PATH,
+    batch_sizes=(1, 8, 64, 256),
+    sentence_lengths=(5, 15, 30),
+    backends=('keras', 'numpy'),
+    repeats=20,
+    precompute_word_vectors=False,
+    seed=0,
+    logger=print,
+):
+    with open(os.path.join(dictionary_path, 'ngram_to_id_dictionary.json')) as f:
+        ngram_to_id_dictionary = json.load(f)
+    with open(os.path.join(dictionary_path, 'dictionary.json')) as f:
+        pretrained_ngram_vectors = json.load(f)
+    dataset_params, _, _ = sd.synthetic_dataset(
+        ngram_to_id_dictionary, num_training=0, num_testing=0, sentence_lengths=(1, max(sentence_lengths)), seed=seed)
+    pipeline_definition = copy.deepcopy(pl.default_pipeline_definition)
+    pipeline_definition['config']['default']['embeddingDimensions'] = len(pretrained_ngram_vectors[0][1])
+    pipeline_definition['config']['default']['precomputeWordVectors'] = precompute_word_vectors
+    pipeline = pl.AidaPipeline(
+        dataset_params, lambda _: None, ngram_to_id_dictionary, None, None, None, pretrained_ngram_vectors, pipeline_definition)
+    rng = np.random.RandomState(seed)
+    words = sd.vocabulary(ngram_to_id_dictionary, 2000, rng)
+    results = []
+    for sentence_length in sentence_lengths:
+        for batch_size in batch_sizes:
+            sentences = sd.random_sentences(words, batch_size, sentence_length, rng)
+            for backend in backends:
+                for stage, fn in pipeline_stages(pipeline, dataset_params, sentences, backend).items():
+                    # NOTE: the backend only changes the model forward passes
+                    if backend != backends[0] and stage in ('tokenize', 'wordIds', 'embed', 'nerDecode'):
+                        continue
+                    result = {'stage': stage, 'backend': backend, 'batchSize': batch_size, 'sentenceLength': sentence_length}
+                    result.update(latency_stats(measure(fn, repeats), batch_size))
+                    logger(f'{stage} ({backend}) batch size {batch_size}, {sentence_length} words: '
+                           f'p50 {result["p50Ms"]:.2f}ms, {result["sentencesPerSecond"]:.0f} sentences/s')
+                    results.append(result)
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'config': {
+            'batchSizes': list(batch_sizes),
+            'sentenceLengths': list(sentence_lengths),
+            'backends': list(backends),
+            'repeats': repeats,
+            'precomputeWordVectors': precompute_word_vectors,
+        },
+        'cacheStats': pipeline.models()['embedding'].cache_stats(),
+        'peakRssMb': peak_rss_mb(),
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the stages of the zebra wings pipeline')
+    parser.add_argument('--output', default='benchmarks.json', help='path of the json results')
+    parser.add_argument('--dictionary', default=DEFAULT_DICTIONARY_PATH, help='directory with the dictionary json files')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 64, 256])
+    parser.add_argument('--sentence-lengths', type=int, nargs='+', default=[5, 15, 30])
+    parser.add_argument('--backends', nargs='+', default=['keras', 'numpy'])
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--precompute-word-vectors', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    report = run_benchmarks(
+        args.dictionary,
+        args.batch_sizes,
+        args.sentence_lengths,
+        args.backends,
+        args.repeats,
+        args.precompute_word_vectors,
+        args.seed,
+    )
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
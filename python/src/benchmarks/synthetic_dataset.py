@@ -0,0 +1,66 @@
+import numpy as np
+
+# Random datasets with the same structure as dataset_params.json, dataset_training.json and dataset_testing.json
+# (see IDatasetParams, ITrainingParams and ITestingParams at typescript/src/types.ts). The words are made of
+# the alphabetic ngrams of the dictionary, so the sentences are embedded like real ones.
+
+
+def vocabulary(ngram_to_id_dictionary, size, rng):
+    ngrams = sorted(k for k in ngram_to_id_dictionary if k and k.isalpha() and len(k) > 1)
+    return [''.join(rng.choice(ngrams, rng.randint(1, 4))) for _ in range(size)]
+
+
+def sentence_slots(num_words, num_slots, rng):
+    # slot id per word, 0 ('O') for the words out of the slots, with up to 2 spans of slots
+    tags = np.zeros(num_words, dtype=np.int64)
+    if num_slots > 1:
+        for _ in range(rng.randint(0, 3)):
+            start = rng.randint(0, num_words)
+            tags[start:start + rng.randint(1, 4)] = rng.randint(1, num_slots)
+    return tags.tolist()
+
+
+def random_sentences(words, num_sentences, num_words, rng):
+    return [' '.join(rng.choice(words, num_words)) for _ in range(num_sentences)]
+
+
+def synthetic_dataset(
+    ngram_to_id_dictionary,
+    num_training=1000,
+    num_testing=200,
+    sentence_lengths=(3, 15),
+    num_intents=10,
+    num_slots=5,
+    language='en',
+    vocabulary_size=2000,
+    seed=0,
+):
+    # returns dataset_params, dataset_training and dataset_testing
+    rng = np.random.RandomState(seed)
+    words = vocabulary(ngram_to_id_dictionary, vocabulary_size, rng)
+    slots_to_id = {'O': 0}
+    slots_to_id.update({f'slot{i}': i for i in range(1, num_slots)})
+    intents = [f'intent{i}' for i in range(num_intents)]
+
+    def examples(num_examples):
+        lengths = rng.randint(sentence_lengths[0], sentence_lengths[1] + 1, num_examples)
+        return (
+            [' '.join(rng.choice(words, n)) for n in lengths],
+            rng.randint(0, num_intents, num_examples).tolist(),
+            [sentence_slots(n, num_slots, rng) for n in lengths],
+        )
+
+    train_x, train_y, train_y2 = examples(num_training)
+    test_x, test_y, test_y2 = examples(num_testing)
+    dataset_params = {
+        'maxWordsPerSentence': sentence_lengths[1],
+        'slotsToId': slots_to_id,
+        'intents': intents,
+        'intentsWithSlots': intents,
+        'language': language,
+    }
+    return (
+        dataset_params,
+        {'trainX': train_x, 'trainY': train_y, 'trainY2': train_y2},
+        {'testX': test_x, 'testY': test_y, 'testY2': test_y2},
+    )
@@ -0,0 +1,56 @@
+import re
+import numpy as np
+
+# TODO: use fancier tokenizer, better split of words, better joining of sentences
+
+# The tokenizer shared by all the languages, the language specific regexps and number words
+# are defined by the language data modules (see src.languages.tokenizer_registry).
+
+
+class BaseTokenizer:
+    @classmethod
+    def from_language_module(cls, language_module):
+        return cls(
+            language_module.FILTER_CHARS_REGEXP,
+            language_module.WORD_SEPARATORS_REGEXP,
+            language_module.NON_ALPHANUMERIC_REGEXP,
+            language_module.NUMBERS_MAP,
+        )
+
+    def __init__(self, filter_chars_regexp, word_separators_regexp, non_alphanumeric_regexp, numbers_map):
+        # list of valid characters used for the dictionary, any word with a char that is not listed here will be skip
+        self.FILTER_CHARS_REGEXP = filter_chars_regexp
+        # list of charaters that act as word splitters (includes space)
+        self.WORD_SEPARATORS_REGEXP = word_separators_regexp
+        # regexp that detect if a word contains non alphanumeric characters
+        self.NON_ALPHANUMERIC_REGEXP = non_alphanumeric_regexp
+        # when ngram is unkown, replace it with this string listed at the dictionary
+        self.UNKNOWN_NGRAM_KEY = '__'
+        # fastText doesn't contain numbers, so we use the sane embeddings for the number words
+        self.NUMBERS_MAP = numbers_map
+        # NOTE: the regexps are compiled once, they are used for every sentence
+        self.__filter_chars = re.compile(self.FILTER_CHARS_REGEXP)
+        self.__word_separators = re.compile(self.WORD_SEPARATORS_REGEXP, re.IGNORECASE)
+
+    def sanitize_sentence(self, sentence):
+        return self.__filter_chars.sub('', sentence.strip().lower())
+
+    def split_sentence_to_words(self, sentence):
+        return [word for word in self.__word_separators.split(sentence) if word.strip()]
+
+    def tokenize_batch(self, sentences):
+        # returns the words of all the sentences in a flat list and the offsets of each sentence words,
+        # the words of sentence i are words[offsets[i]:offsets[i + 1]]
+        words = []
+        offsets = np.zeros(len(sentences) + 1, dtype=np.int64)
+        split = self.__word_separators.split
+        for idx, sentence in enumerate(sentences):
+            words.extend(word for word in split(sentence) if word.strip())
+            offsets[idx + 1] = len(words)
+        return words, offsets
+
+    def split_word_to_bigrams(self, word):
+        return [first + second for first, second in zip(word, word[1:])]
+
+    def join_words_to_sentence(self, words):
+        return ' '.join([str(x) for x in words])
@@ -0,0 +1,36 @@
+import importlib
+import threading
+import src.languages.base_tokenizer as bt
+
+# Tokenizers by language code. Each language is a module with the tokenizer data (the regexps and
+# NUMBERS_MAP, see src.languages.en.english_tokenizer), imported the first time the language is used.
+# Tokenizers don't keep any state between sentences, so all the pipelines of a language share one instance.
+
+LANGUAGE_MODULES = {
+    'en': 'src.languages.en.english_tokenizer',
+    'es': 'src.languages.es.spanish_tokenizer',
+}
+
+_tokenizers = {}
+_lock = threading.Lock()
+
+
+def register_language(language, module_name):
+    with _lock:
+        LANGUAGE_MODULES[language.lower()] = module_name
+        _tokenizers.pop(language.lower(), None)
+
+
+def available_languages():
+    return sorted(LANGUAGE_MODULES.keys())
+
+
+def get_tokenizer(language):
+    key = language.lower()
+    with _lock:
+        if key not in _tokenizers:
+            if key not in LANGUAGE_MODULES:
+                raise ValueError(f'Unknown language: {language}')
+            language_module = importlib.import_module(LANGUAGE_MODULES[key])
+            _tokenizers[key] = bt.BaseTokenizer.from_language_module(language_module)
+        return _tokenizers[key]
@@ -15,5 +15,11 @@ class CombineNgramsLayer(keras.layers.Layer):
         )
         return keras.backend.l2_normalize(combined, axis=2)
 
+    def compute_mask(self, inputs, mask=None):
+        # a word is masked when all its ngrams are masked (padding words)
+        if mask is None:
+            return None
+        return keras.backend.any(mask, axis=-1)
+
     def compute_output_shape(self, input_shape):
         return (None, input_shape[1], input_shape[-1])
@@ -1,12 +1,17 @@
-import keras
 import numpy as np
-import src.pipelines.zebra_wings.embeddings.presaved_embeddings_initializer as pei
-import src.pipelines.zebra_wings.embeddings.combine_ngrams_layer as ctg
+import src.pipelines.zebra_wings.embeddings.word_vectors_table as wvt
+import src.utils.lru_cache as lru
+import src.utils.ngram_vectors_utils as nvu
+import src.utils.metrics as mu
 
 
 class EmbeddingsModel:
     @staticmethod
-    def setup_model(pretrained_ngram_vectors, max_words, max_ngrams, embedding_dimensions):
+    def setup_model(pretrained_ngram_vectors, max_words, max_ngrams, embedding_dimensions, quantization=None):
+        # NOTE: keras is only imported when the keras model is used, the precomputed word vectors don't need it
+        import keras
+        import src.pipelines.zebra_wings.embeddings.presaved_embeddings_initializer as pei
+        import src.pipelines.zebra_wings.embeddings.combine_ngrams_layer as ctg
         model = keras.models.Sequential()
         embed = keras.layers.Embedding(
             len(pretrained_ngram_vectors),
@@ -14,7 +19,7 @@ class EmbeddingsModel:
             mask_zero=True,
             input_length=max_ngrams,
             trainable=False,
-            embeddings_initializer=pei.PreSavedEmbeddingsInitializer(pretrained_ngram_vectors)
+            embeddings_initializer=pei.PreSavedEmbeddingsInitializer(pretrained_ngram_vectors, quantization)
         )
         model.add(keras.layers.TimeDistributed(
             embed, input_shape=(max_words, max_ngrams)))
@@ -28,74 +33,137 @@ class EmbeddingsModel:
         embedding_dimensions,
         tokenizer,
         pretrained_embedding_model=None,
-        pretrained_ngram_vectors=None
+        pretrained_ngram_vectors=None,
+        word_ids_cache_size=100000,
+        precompute_word_vectors=False,
+        word_vectors_table=None,
+        metrics=mu.NOOP_METRICS,
+        quantization=None,
+        word_ids_cache=None,
     ):
+        # quantization ('float16' or 'int8') rounds the ngram vectors like the quantized ngram vectors tables
+        # word_ids_cache can be shared by the embeddings models with the same dictionary, tokenizer and max ngrams
         self.__ngram_to_id_dictionary = ngram_to_id_dictionary
         # self.__max_chars_per_word = max_chars_per_word
         self.__max_words = max_words
         self.__max_ngrams = max_ngrams
         self.__embedding_dimensions = embedding_dimensions
-        self.__model = pretrained_embedding_model if pretrained_embedding_model != None else EmbeddingsModel.setup_model(
-            pretrained_ngram_vectors, self.__max_words, self.__max_ngrams, self.__embedding_dimensions,
-        )
+        self.__pretrained_ngram_vectors = pretrained_ngram_vectors
+        self.__quantization = quantization
+        # NOTE: the keras model is built on first use, the precomputed word vectors mode only needs it for saving
+        self.__model = pretrained_embedding_model
         self.__model_input = None
+        # bounded cache of already encoded words, word -> padded ngram ids row
+        self.__word_rows = word_ids_cache if word_ids_cache is not None else lru.LRUCache(word_ids_cache_size)
         self.tokenizer = tokenizer
+        self.__metrics = metrics
+        self.__word_vectors = word_vectors_table
+        if self.__word_vectors is None and precompute_word_vectors:
+            if isinstance(pretrained_ngram_vectors, nvu.QuantizedNgramVectors):
+                # NOTE: keep quantized vectors as they are, they are dequantized at lookup time
+                ngram_vectors = pretrained_ngram_vectors
+            elif pretrained_ngram_vectors is not None:
+                ngram_vectors = nvu.ngram_vectors_matrix(pretrained_ngram_vectors)
+                if quantization:
+                    ngram_vectors = nvu.quantize_ngram_vectors(ngram_vectors, quantization)
+            else:
+                ngram_vectors = self.keras_model().layers[0].get_weights()[0]
+            self.__word_vectors = wvt.WordVectorsTable(ngram_vectors, word_ids_cache_size)
+        self.__padding_vector = None
+        if self.__word_vectors is not None:
+            # padded words have all ngram ids set to 0, so they also combine to a fixed vector
+            self.__padding_vector = self.__word_vectors.combine(np.zeros(self.__max_ngrams, dtype=np.int32))
 
-    def keras_model(self): return self.__model
+    def keras_model(self):
+        if self.__model is None:
+            self.__model = EmbeddingsModel.setup_model(
+                self.__pretrained_ngram_vectors, self.__max_words, self.__max_ngrams, self.__embedding_dimensions,
+                self.__quantization,
+            )
+        return self.__model
 
     def model_input(self):
         if not self.__model_input:
+            import keras
             _input = keras.layers.Input(shape=(self.__max_words, self.__max_ngrams),)
-            embedded = self.__model(_input)
+            embedded = self.keras_model()(_input)
             self.__model_input = keras.models.Model(inputs=_input, outputs=embedded)
         return self.__model_input
 
+    # tokens are the (words, offsets) of tokenize(sentences), when they were already computed
+    def embed(self, sentences, tokens=None):
+        with self.__metrics.timer('embed_seconds'):
+            if self.__word_vectors is not None:
+                return self.embed_with_word_vectors(sentences, tokens)
+            sentences_tensor = self.sentence_to_word_ids(sentences, tokens)
+            return self.model_input().predict_on_batch(sentences_tensor)
 
-    def embed(self, sentences):
-        sentences_tensor = self.sentence_to_word_ids(sentences)
-        return self.model_input().predict_on_batch(sentences_tensor)
+    def embed_with_word_vectors(self, sentences, tokens=None):
+        words, sentence_index, word_index = self.__words_coordinates(sentences, tokens)
+        buffer = np.empty((len(sentences), self.__max_words,
+                           self.__embedding_dimensions), dtype=np.float32)
+        buffer[:] = self.__padding_vector
+        if words:
+            buffer[sentence_index, word_index] = self.__word_vectors.word_vectors(words, self.word_ids_row)
+        return buffer
 
     def dictionary(self):
         return self.__ngram_to_id_dictionary
 
-    def sentence_to_word_ids(self, sentences):
-        sentences_splitted_by_words = list(
-            map(lambda s: self.tokenizer.split_sentence_to_words(s), sentences))
+    def word_vectors_table(self):
+        return self.__word_vectors
+
+    def cache_stats(self):
+        stats = {'wordIds': self.__word_rows.stats()}
+        if self.__word_vectors is not None:
+            stats['wordVectors'] = self.__word_vectors.cache_stats()
+        return stats
+
+    def sentence_to_word_ids(self, sentences, tokens=None):
+        words, sentence_index, word_index = self.__words_coordinates(sentences, tokens)
         buffer = np.zeros((len(sentences), self.__max_words,
                            self.__max_ngrams), dtype=np.int32)
-        for si, sentence in enumerate(sentences_splitted_by_words):
-            for wi, word in enumerate(sentence):
-                if word in self.__ngram_to_id_dictionary:
-                    buffer[si, wi, 0] = self.__ngram_to_id_dictionary[word]
-                else:
-                    grams = self.generate_word_ids_from_ngrams(word)
-                    for gi, gram in enumerate(grams):
-                        if (gi >= self.__max_ngrams):
-                            print(['Word exceeding max n grams per word: ', word])
-                        else:
-                            buffer[si, wi, gi] = gram
+        if words:
+            with self.__metrics.timer('word_ids_seconds'):
+                buffer[sentence_index, word_index] = np.stack([self.word_ids_row(word) for word in words])
         return buffer
 
+    def tokenize(self, sentences):
+        # the words of all the sentences and the offsets of each sentence words, see tokenize_batch of the tokenizers
+        with self.__metrics.timer('tokenize_seconds'):
+            return self.tokenizer.tokenize_batch(sentences)
+
+    def __words_coordinates(self, sentences, tokens=None):
+        # returns all the words of the batch with their flat (sentence, word) coordinates
+        words, offsets = tokens if tokens is not None else self.tokenize(sentences)
+        words_per_sentence = np.diff(offsets)
+        sentence_index = np.repeat(np.arange(len(sentences)), words_per_sentence)
+        word_index = np.arange(len(words)) - np.repeat(offsets[:-1], words_per_sentence)
+        return words, sentence_index, word_index
+
+    def word_ids_row(self, word):
+        # NOTE: rows are shared by the cache, callers should copy them instead of mutating them
+        row = self.__word_rows.get(word)
+        if row is None:
+            row = np.zeros(self.__max_ngrams, dtype=np.int32)
+            if word in self.__ngram_to_id_dictionary:
+                row[0] = self.__ngram_to_id_dictionary[word]
+            else:
+                grams = self.generate_word_ids_from_ngrams(word)
+                if len(grams) > self.__max_ngrams:
+                    print(['Word exceeding max n grams per word: ', word])
+                    grams = grams[:self.__max_ngrams]
+                row[:len(grams)] = grams
+            self.__word_rows.put(word, row)
+        return row
+
     def generate_word_ids_from_ngrams(self, word):
-        vec_ids = []
-        add_to_vecs_if_not_present = (
-            lambda ngram: (
-                False if ngram not in self.__ngram_to_id_dictionary
-                else vec_ids.append(self.__ngram_to_id_dictionary[ngram]) == None and True
-            )
-        )
+        dictionary = self.__ngram_to_id_dictionary
         # first try using ngrams to reconstruct the word vector
         if len(word) > 2:
-            all_ngrams_found = True
             word_ngrams = self.tokenizer.split_word_to_bigrams(word)
-            for wt in word_ngrams:
-                if all_ngrams_found and not add_to_vecs_if_not_present(wt):
-                    all_ngrams_found = False
-            if all_ngrams_found:
-                return vec_ids
-        vec_ids = []
+            if all(ngram in dictionary for ngram in word_ngrams):
+                return [dictionary[ngram] for ngram in word_ngrams]
         # if not by ngrams use characters to construct the word vector
         # TODO: use characters to construct ngrams, not the word
-        for char in list(word):
-            add_to_vecs_if_not_present(char)
-        return vec_ids
+        return [dictionary[char] for char in word if char in dictionary]
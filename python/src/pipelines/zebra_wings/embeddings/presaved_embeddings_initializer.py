@@ -1,17 +1,31 @@
 import keras
-import numpy as np
+import src.utils.ngram_vectors_utils as nvu
+
+
+ngram_vectors_matrix = nvu.ngram_vectors_matrix
+
 
 class PreSavedEmbeddingsInitializer(keras.initializers.Initializer):
-    def __init__(self, pretrained_ngram_vectors=None):
+    # quantization (float16 or int8) makes the keras embeddings use the same rounded values as the quantized tables
+    def __init__(self, pretrained_ngram_vectors=None, quantization=None):
         self.config = { "pretrained_ngram_vectors": pretrained_ngram_vectors }
+        self.quantization = quantization
 
     def __call__(self, shape, dtype=None):
-        if not self.config["pretrained_ngram_vectors"]:
+        if self.config["pretrained_ngram_vectors"] is None or len(self.config["pretrained_ngram_vectors"]) == 0:
             return keras.constant(0, shape=shape, dtype=dtype)
-        else:
-            #  pretrained_ngram_vectors is like [['__', [0, ... ]]], so we only extract the vectors with index order
-            encoded_sentences = [x[1] for x in self.config["pretrained_ngram_vectors"]]
-            return np.array(encoded_sentences, dtype)
+        vectors = ngram_vectors_matrix(self.config["pretrained_ngram_vectors"], 'float32')
+        if self.quantization:
+            vectors = nvu.quantize_ngram_vectors(vectors, self.quantization).dequantize()
+        return vectors.astype(dtype)
 
     def get_config(self):
-        return self.config["pretrained_ngram_vectors"]
+        # NOTE: the vectors aren't part of the config, they are saved as the weights of the embedding layer
+        return {'quantization': self.quantization}
+
+    @classmethod
+    def from_config(cls, config):
+        # NOTE: models saved before had the vectors themselves as config, the loaded weights replace them anyway
+        if not isinstance(config, dict):
+            return cls(config)
+        return cls(None, config.get('quantization'))
@@ -0,0 +1,44 @@
+import threading
+import numpy as np
+import src.utils.lru_cache as lru
+
+
+# numpy equivalent of the embeddings keras model (TimeDistributed Embedding + CombineNgramsLayer).
+# The embedding weights are not trainable, so each word vector only depends on its ngram ids and
+# can be computed once and cached, then sentences are built by gathering the cached word vectors.
+class WordVectorsTable:
+    def __init__(self, ngram_vectors, cache_size=100000):
+        # matrix of (number of ngrams, embedding dimensions)
+        self.__ngram_vectors = ngram_vectors
+        self.__vectors = lru.LRUCache(cache_size)
+        # NOTE: a table can be shared by several pipelines used from different threads
+        self.__lock = threading.Lock()
+
+    def ngram_vectors(self):
+        return self.__ngram_vectors
+
+    def dimensions(self):
+        return self.__ngram_vectors.shape[1]
+
+    def combine(self, ids_rows):
+        # same as the CombineNgramsLayer: sum all ngram vectors of the word (padding included)
+        # and apply keras.backend.l2_normalize (x * rsqrt(max(sum(x^2), epsilon)))
+        combined = self.__ngram_vectors[ids_rows].sum(axis=-2, dtype=np.float32)
+        square_sum = np.sum(np.square(combined), axis=-1, keepdims=True)
+        return combined * (1 / np.sqrt(np.maximum(square_sum, 1e-12)))
+
+    def word_vectors(self, words, word_ids_row):
+        with self.__lock:
+            vectors = [self.__vectors.get(word) for word in words]
+        missing = list(dict.fromkeys(w for w, v in zip(words, vectors) if v is None))
+        if missing:
+            computed = dict(zip(missing, self.combine(np.stack([word_ids_row(w) for w in missing]))))
+            with self.__lock:
+                for word, vector in computed.items():
+                    self.__vectors.put(word, vector)
+            vectors = [computed[w] if v is None else v for w, v in zip(words, vectors)]
+        return np.stack(vectors)
+
+    def cache_stats(self):
+        with self.__lock:
+            return self.__vectors.stats()
@@ -0,0 +1,96 @@
+import numpy as np
+
+# Scores the classification and ner predictions of a whole test dataset at once with numpy:
+# accuracy, per intent precision/recall/F1 and the confusion matrix for the classification model,
+# sentences with all the tags right and per slot span F1 for the ner model.
+
+
+def precision_recall_f1(true_positives, predicted, expected):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, true_positives / predicted, 0.)
+        recall = np.where(expected > 0, true_positives / expected, 0.)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.)
+    return precision, recall, f1
+
+
+def scores_by_name(names, true_positives, predicted, expected):
+    precision, recall, f1 = precision_recall_f1(true_positives, predicted, expected)
+    return {
+        name: {'precision': float(precision[i]), 'recall': float(recall[i]), 'f1': float(f1[i]), 'support': int(expected[i])}
+        for i, name in enumerate(names)
+    }
+
+
+def classification_stats(expected_intents, predicted_intents, confidences, intents, low_confidence_threshold):
+    # expected_intents and predicted_intents are intent ids, the confidences are the predicted intent probabilities
+    num_intents = len(intents)
+    expected_intents = np.asarray(expected_intents, dtype=np.int64)
+    low_confidence = confidences < low_confidence_threshold
+    correct = predicted_intents == expected_intents
+    confusion_matrix = np.bincount(
+        expected_intents * num_intents + predicted_intents, minlength=num_intents * num_intents
+    ).reshape(num_intents, num_intents)
+    true_positives = np.diag(confusion_matrix)
+    return {
+        'correct': int(np.count_nonzero(correct & ~low_confidence)),
+        'wrong': int(np.count_nonzero(~correct & ~low_confidence)),
+        'lowConfidence': int(np.count_nonzero(low_confidence)),
+        'accuracy': float(correct.mean()) if len(correct) else 0.,
+        'intents': scores_by_name(intents, true_positives, confusion_matrix.sum(axis=0), confusion_matrix.sum(axis=1)),
+        # rows are the expected intents and columns the predicted ones
+        'confusionMatrix': confusion_matrix.tolist(),
+    }
+
+
+def padded_tags(sentences_tags, max_words):
+    # the slot ids of each sentence word as a (sentences, max words) matrix, padded with -1
+    lengths = np.array([min(len(tags), max_words) for tags in sentences_tags], dtype=np.int64)
+    tags = np.full((len(sentences_tags), max_words), -1, dtype=np.int64)
+    if lengths.sum():
+        tags[np.arange(max_words) < lengths[:, None]] = np.concatenate([t[:max_words] for t in sentences_tags if len(t)])
+    return tags
+
+
+def sentences_correct(expected_tags, predicted_tags):
+    # a sentence is correct when all its (not padding) words have the expected tag
+    return np.all((expected_tags == predicted_tags) | (expected_tags == -1), axis=1)
+
+
+def tag_spans(tags):
+    # runs of consecutive words with the same tag, as (flat index of the first word, index of the last word, tag)
+    valid = tags != -1
+    sentinel = np.full((len(tags), 1), -2, dtype=tags.dtype)
+    starts = valid & (tags != np.concatenate([sentinel, tags[:, :-1]], axis=1))
+    ends = valid & (tags != np.concatenate([tags[:, 1:], sentinel], axis=1))
+    start_idx = np.flatnonzero(starts)
+    end_words = np.flatnonzero(ends) % tags.shape[1]
+    return start_idx, end_words, tags.flat[start_idx]
+
+
+def ner_stats(expected_tags, predicted_tags, slot_names, outside_slot='O'):
+    # expected_tags is padded with -1 (see padded_tags), predictions of padding words are ignored
+    num_slots = len(slot_names)
+    max_words = expected_tags.shape[1]
+    predicted_tags = np.where(expected_tags == -1, -1, predicted_tags)
+    correct = sentences_correct(expected_tags, predicted_tags)
+    spans_keys = []
+    spans_tags = []
+    for tags in (expected_tags, predicted_tags):
+        start_idx, end_words, span_tags = tag_spans(tags)
+        keep = np.asarray(slot_names, dtype=object)[span_tags] != outside_slot
+        spans_keys.append((start_idx[keep] * max_words + end_words[keep]) * num_slots + span_tags[keep])
+        spans_tags.append(span_tags[keep])
+    # NOTE: a predicted span is right when it has the same words and tag as an expected span
+    matched = np.intersect1d(spans_keys[0], spans_keys[1], assume_unique=True) % num_slots
+    true_positives = np.bincount(matched, minlength=num_slots)
+    predicted = np.bincount(spans_tags[1], minlength=num_slots)
+    expected = np.bincount(spans_tags[0], minlength=num_slots)
+    slots = [i for i, name in enumerate(slot_names) if name != outside_slot]
+    _, _, span_f1 = precision_recall_f1(true_positives[slots].sum(), predicted[slots].sum(), expected[slots].sum())
+    return {
+        'correct': int(np.count_nonzero(correct)),
+        'wrong': int(np.count_nonzero(~correct)),
+        'spanF1': float(span_f1),
+        'slots': scores_by_name(
+            [slot_names[i] for i in slots], true_positives[slots], predicted[slots], expected[slots]),
+    }
@@ -0,0 +1,21 @@
+import numpy as np
+
+# Helpers to group sentences by length, so the sequence models only run over the timesteps
+# of the longest sentence in each bucket instead of always running over max words per sentence.
+
+
+def sequence_lengths(embedded_sentences):
+    # padding words are embedded as zero vectors, the length is the position of the last non padding word
+    words_mask = np.any(embedded_sentences != 0, axis=2)
+    max_words = words_mask.shape[1]
+    return np.where(words_mask.any(axis=1), max_words - np.argmax(words_mask[:, ::-1], axis=1), 0)
+
+
+def bucket_lengths(lengths, buckets, max_words):
+    # the timesteps of each sentence bucket, the smallest bucket that fits the sentence
+    boundaries = np.array(sorted(b for b in buckets if b < max_words) + [max_words])
+    return boundaries[np.searchsorted(boundaries, np.maximum(lengths, 1))]
+
+
+def group_by_bucket(buckets_per_sentence):
+    return {int(timesteps): np.flatnonzero(buckets_per_sentence == timesteps) for timesteps in np.unique(buckets_per_sentence)}
@@ -1,11 +1,15 @@
 import json
 import keras
 import src.utils.dictionary_utils as du
+import src.pipelines.zebra_wings.training_data as td
+import src.pipelines.zebra_wings.training_sequence as ts
+import src.pipelines.zebra_wings.evaluation as ev
+import src.utils.metrics as mu
+import src.pipelines.zebra_wings.numpy_models.classification as nc
+import src.pipelines.zebra_wings.numpy_models.layers_weights as lw
 import json
 from random import shuffle
 import numpy as np
-import math
-from keras.utils import to_categorical
 
 # from src.utils.get_activations import visualize, visualize_layer_output
 
@@ -19,10 +23,7 @@ class ClassificationModel:
         filter_sizes = config['filterSizes']
         drop = config["drop"]
         num_classes = len(intents)
-        LEARNING_RATE = 0.0012  # use 1e-4 as default as alternative starting point
-        ADAM_BETA_1 = 0.0008
-        ADAM_BETA_2 =  0.03
-        optimizer = keras.optimizers.Adam(lr=LEARNING_RATE, beta_1=ADAM_BETA_1, beta_2=ADAM_BETA_2)
+        optimizer = keras.optimizers.Adam(lr=config['learningRate'], beta_1=config['adamBeta1'], beta_2=config['adamBeta2'])
         # Layer 1: Convolution + max pool
         inputs = keras.layers.Input(
             shape=(max_words, embedding_dimensions), name="embedded_words")
@@ -82,7 +83,7 @@ class ClassificationModel:
         )
         return model
 
-    def __init__(self, config, dataset_params, embeddings_model, logger, pretrained_model=None):
+    def __init__(self, config, dataset_params, embeddings_model, logger, pretrained_model=None, metrics=mu.NOOP_METRICS):
         self.__config = config
         self.__dataset_params = dataset_params
         self.__embeddings_model = embeddings_model
@@ -91,14 +92,33 @@ class ClassificationModel:
         else:
             self.__model = ClassificationModel.setup(config, dataset_params)
         self.__logger = logger
+        self.__metrics = metrics
+        self.__numpy_engine = None
 
     def keras_model(self):
         return self.__model
 
-    def predict(self, sentences):
+    def set_weights(self, weights):
+        self.__model.set_weights(weights)
+        self.__numpy_engine = None
+
+    def numpy_engine(self):
+        # NOTE: the engine copies the trained weights, so it is created again after training
+        if self.__numpy_engine is None:
+            self.__numpy_engine = nc.ClassificationEngine(lw.LayersWeights.from_keras_model(self.__model))
+        return self.__numpy_engine
+
+    def raw_output(self, sentences, embedded_sentences=None, backend='keras'):
+        if embedded_sentences is None:
+            embedded_sentences = self.__embeddings_model.embed(sentences)
+        with self.__metrics.timer('classification_forward_seconds'):
+            if backend == 'numpy':
+                return self.numpy_engine().predict(embedded_sentences)
+            return self.__model.predict(embedded_sentences, batch_size=self.__config['evaluationBatchSize'])
+
+    def predict(self, sentences, embedded_sentences=None, backend='keras'):
         prediction = []
-        embedded_sentences = self.__embeddings_model.embed(sentences)
-        output = self.__model.predict(embedded_sentences)
+        output = self.raw_output(sentences, embedded_sentences, backend)
         intents = self.__dataset_params['intents']
         for sidx, s in enumerate(output):
             max_intent_index = s.argmax()
@@ -107,16 +127,12 @@ class ClassificationModel:
             })
         return prediction
 
-    def train(self, train_dataset):
-        train_data = du.chunks(
-            train_dataset['trainX'], self.__config['batchSize'], train_dataset['trainY'])
-        n_batches = math.ceil(
-            len(train_dataset['trainX'])/self.__config['batchSize'])
+    def train(self, train_dataset, training_data=None, callbacks=[]):
+        prepared_data = training_data if training_data is not None else td.TrainingData.prepare(
+            train_dataset, self.__embeddings_model, self.__dataset_params, self.__config)
         self.__logger('Start training classification model!')
-        enough_accuracy_reached = False
         m = self.__model
-        intents = self.__dataset_params["intents"]
-        num_classes = len(intents)
+        callbacks = list(callbacks)
         # ===   Visualization code block   ===
         # sentence = 'please remind to me watch real madrid match tomorrow at 9pm'
         # x_viz = self.__embeddings_model.embed([sentence])
@@ -125,71 +141,65 @@ class ClassificationModel:
         # visualize_layer_output('classConv2', m, x_viz, 'class/conv2-')
         # visualize_layer_output('classConv3', m, x_viz, 'class/conv3-')
         # visualize(m.predict(x_viz), 'class/output-')
+        # callbacks.append(keras.callbacks.LambdaCallback(on_epoch_end=lambda idx, logs: (
+        #     visualize_layer_output('classConv1', m, x_viz, f'class/conv1-{idx}'),
+        #     visualize_layer_output('classConv2', m, x_viz, f'class/conv2-{idx}'),
+        #     visualize_layer_output('classConv3', m, x_viz, f'class/conv3-{idx}'),
+        #     visualize(m.predict(x_viz), f'class/output-{idx}'),
+        # )))
         # === END visualization code block ===
-        for idx, t_chunk in enumerate(train_data):
-            if enough_accuracy_reached:
-                break
-            x = self.__embeddings_model.embed(t_chunk[0])
-            y = to_categorical(np.array(t_chunk[1], dtype=np.int32), num_classes)
-            self.__logger(f'Training batch {idx+1}.')
-            m.fit(
-                x=x,
-                y=y,
-                # batch_size=self.__config['batchSize'],
-                shuffle=True,
-                epochs=self.__config['epochs'],
-                verbose=0,
-                validation_split=self.__config['trainingValidationSplit'],
-            )
-            # ===   Visualization code block   ===
-            # visualize_layer_output('classConv1', m, x_viz, f'class/conv1-{idx}')
-            # visualize_layer_output('classConv2', m, x_viz, f'class/conv2-{idx}')
-            # visualize_layer_output('classConv3', m, x_viz, f'class/conv3-{idx}')
-            # visualize(m.predict(x_viz), f'class/output-{idx}')
-            # === END visualization code block ===
-            self.__logger(
-                f'Trained {m.history.epoch[-1]+1} epochs on batch {idx + 1} of {n_batches}')
-            self.__logger(
-                f'Training Loss: {m.history.history["loss"][-1]} | Training Accuracy: {m.history.history["acc"][-1]}')
-            self.__logger(
-                f'Validation Loss: {m.history.history["val_loss"][-1]} | Validation Accuracy: {m.history.history["val_acc"][-1]}')
-            self.__logger(
-                '==================================================================================================')
-            if (self.__config["lossThresholdToStopTraining"] > 0 and
-                m.history.history["loss"][-1] < self.__config["lossThresholdToStopTraining"] and
-                    m.history.history["val_loss"][-1] < self.__config["lossThresholdToStopTraining"]):
-                enough_accuracy_reached = True
-                self.__logger(
-                    f'Enough accuracy reached! Ending training after batch {idx + 1} of {n_batches}')
+
+        def batch_builder(indices, timesteps):
+            return prepared_data.embedded()[indices], prepared_data.intents()[indices]
+        try:
+            ts.fit(m, batch_builder, len(prepared_data), self.__config, self.__logger, callbacks)
+        finally:
+            self.__numpy_engine = None
+            if training_data is None:
+                prepared_data.close()
+
+    def test(self, test_examples, results_handler=None, embedded_sentences=None, log_sentences=False):
+        if results_handler != None:
+            return self.__test_with_handler(test_examples, results_handler, embedded_sentences)
+        # NOTE: the whole dataset is predicted in large batches and scored at once
+        batch_size = self.__config['evaluationBatchSize']
+        sentences = test_examples['testX']
+        outputs = []
+        for start in range(0, len(sentences), batch_size):
+            # NOTE: when the sentences are already embedded, only slice the chunk instead of embedding it again
+            embedded_chunk = None if embedded_sentences is None else embedded_sentences[start:start + batch_size]
+            outputs.append(self.raw_output(sentences[start:start + batch_size], embedded_chunk))
+        return self.test_stats(test_examples, outputs, log_sentences)
+
+    # outputs are the raw outputs of the consecutive chunks of the test sentences
+    def test_stats(self, test_examples, outputs, log_sentences=False):
+        sentences = test_examples['testX']
+        output = np.concatenate([np.zeros((0, len(self.__dataset_params['intents'])), dtype=np.float32)] + list(outputs))
+        predicted_intents = output.argmax(axis=1)
+        confidences = output.max(axis=1)
+        low_confidence_threshold = self.__config['lowConfidenceThreshold']
+        stats = ev.classification_stats(
+            test_examples['testY'], predicted_intents, confidences, self.__dataset_params['intents'], low_confidence_threshold)
+        if log_sentences:
+            intents = self.__dataset_params['intents']
+            wrong = predicted_intents != np.asarray(test_examples['testY'])
+            for idx in np.flatnonzero((confidences < low_confidence_threshold) | wrong):
+                label = 'LOW CONFIDENCE' if confidences[idx] < low_confidence_threshold else 'WRONG'
                 self.__logger(
-                    '==================================================================================================')
+                    f'{label} (intent: {intents[predicted_intents[idx]]}, confidence: {confidences[idx]}) - {sentences[idx]}')
+        return stats
 
-    def test(self, test_examples, results_handler=None):
+    def __test_with_handler(self, test_examples, results_handler, embedded_sentences=None):
+        # results_handler(sentences, intent ids, predictions, stats) is called for each chunk of the dataset
+        batch_size = self.__config['batchSize']
         chunks = du.chunks(
-            test_examples['testX'], self.__config['batchSize'], test_examples['testY'])
-        handler = results_handler if results_handler != None else self.__default_results_logger
+            test_examples['testX'], batch_size, test_examples['testY'])
         stats = {'correct': 0, 'wrong': 0, 'lowConfidence': 0}
-        for t_chunk in chunks:
+        for idx, t_chunk in enumerate(chunks):
             x = t_chunk[0]  # sentences
             y = t_chunk[1]  # intents code per sentence
-            predictions = self.predict(x)
-            handler(x, y, predictions, stats)
-        return stats
-
-    def __default_results_logger(self, x, y, o, stats):
-        for i, s in enumerate(x):
-            intent = self.__dataset_params['intents'][y[i]]
-            correct = o[i]['intent'] == intent
-            if (o[i]['confidence'] < self.__config['lowConfidenceThreshold']):
-                stats['lowConfidence'] += 1
-                self.__logger(
-                    f'LOW CONFIDENCE (intent: {o[i]["intent"]}, confidence: {o[i]["confidence"]}) - {s}')
-            elif (correct):
-                stats['correct'] += 1
-                # self.__logger(
-                #     f'CORRECT (intent: {o[i]['intent']}, confidence: {o[i]['confidence']}) - {s}')
-            else:
-                stats['wrong'] += 1
-                self.__logger(
-                    f'WRONG (intent: {o[i]["intent"]}, confidence: {o[i]["confidence"]}) - {s}')
+            # NOTE: when the sentences are already embedded, only slice the chunk instead of embedding it again
+            embedded_chunk = None if embedded_sentences is None else embedded_sentences[idx * batch_size:idx * batch_size + len(x)]
+            predictions = self.predict(x, embedded_chunk)
+            results_handler(x, y, predictions, stats)
         return stats
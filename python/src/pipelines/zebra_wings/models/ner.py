@@ -1,11 +1,19 @@
 import json
 import keras
 import src.utils.dictionary_utils as du
+import src.pipelines.zebra_wings.training_data as td
+import src.pipelines.zebra_wings.training_sequence as ts
+import src.pipelines.zebra_wings.evaluation as ev
+import src.utils.metrics as mu
 import json
 from random import shuffle
 import numpy as np
-import math
 from keras.utils import to_categorical
+import src.pipelines.zebra_wings.length_buckets as lb
+import src.pipelines.zebra_wings.models.ner_decoder as nd
+import src.pipelines.zebra_wings.numpy_models.layers_weights as lw
+import src.pipelines.zebra_wings.numpy_models.ner as nn
+from src.pipelines.zebra_wings.repeat_to_sequence import RepeatToSequence
 from src.pipelines.zebra_wings.time_series_attention import TimeSeriesAttention
 
 # from src.utils.get_activations import visualize, visualize_layer_output
@@ -13,23 +21,22 @@ from src.pipelines.zebra_wings.time_series_attention import TimeSeriesAttention
 class NerModel:
     @staticmethod
     def setup(config, dataset_params):
-        max_words = dataset_params["maxWordsPerSentence"]
         embedding_dimensions = config["embeddingDimensions"]
         num_filters = config["numFilters"]
         add_attention = config["addAttention"]
         rnn_units = config["rnnUnits"]
         num_slot_types = len(dataset_params["slotsToId"].keys())
-        LEARNING_RATE = 0.0066  # use 1e-4 as default as alternative starting point
-        ADAM_BETA_1 = 0.0025
-        ADAM_BETA_2 = 0.1
-        optimizer = keras.optimizers.Adam(lr=LEARNING_RATE, beta_1=ADAM_BETA_1, beta_2=ADAM_BETA_2)
+        optimizer = keras.optimizers.Adam(lr=config['learningRate'], beta_1=config['adamBeta1'], beta_2=config['adamBeta2'])
         # WORD-NGRAMS LEVEL EMBEDDINGS
+        # NOTE: the timesteps are not fixed, so sentences can be batched by length buckets
         embedded_sentences_input = keras.layers.Input(
-            shape=(max_words, embedding_dimensions), name="embedded_words")
+            shape=(None, embedding_dimensions), name="embedded_words")
+        # padding words are embedded as zero vectors, mask them for the recurrent layers
+        masked_sentences = keras.layers.Masking(mask_value=0., name="words_mask")(embedded_sentences_input)
         conv_layer_1 = keras.layers.Conv1D(
             num_filters[0],
             1,
-            input_shape=(max_words, embedding_dimensions),
+            input_shape=(None, embedding_dimensions),
             kernel_initializer='random_normal',
             padding='valid',
             activation='relu',
@@ -45,9 +52,9 @@ class NerModel:
         )(conv_layer_1)
         # CONCATENATE BOTH CNN ENCODERS (WORD AND CHAR) WITH THE INPUT AND THE CHAR CNN LAYER 1
         class_label_input = keras.layers.Input(shape=(len(dataset_params['intents']),), name="embedded_intent")
-        class_label_repeated = keras.layers.RepeatVector(max_words)(class_label_input)
+        class_label_repeated = RepeatToSequence()([class_label_input, embedded_sentences_input])
         concated = keras.layers.Concatenate()([
-            class_label_repeated, embedded_sentences_input, conv_layer_2,
+            class_label_repeated, masked_sentences, conv_layer_2,
         ])
         lstm = keras.layers.LSTM(rnn_units, return_sequences=True)
         bi_lstm = keras.layers.Bidirectional(lstm, merge_mode=None, name='bidi_encoder')(concated)
@@ -68,7 +75,7 @@ class NerModel:
         )
         return model
 
-    def __init__(self, config, dataset_params, embeddings_model, logger, pretrained_model=None):
+    def __init__(self, config, dataset_params, embeddings_model, logger, pretrained_model=None, metrics=mu.NOOP_METRICS):
         self.__config = config
         self.__dataset_params = dataset_params
         self.__embeddings_model = embeddings_model
@@ -77,13 +84,27 @@ class NerModel:
         else:
             self.__model = NerModel.setup(config, dataset_params)
         self.__logger = logger
+        self.__metrics = metrics
+        self.__slot_names = nd.slot_names(dataset_params['slotsToId'])
+        self.__numpy_engine = None
 
     def keras_model(self):
         return self.__model
 
-    def raw_prediction(self, sentences, classification_pred):
+    def set_weights(self, weights):
+        self.__model.set_weights(weights)
+        self.__numpy_engine = None
+
+    def numpy_engine(self):
+        # NOTE: the engine copies the trained weights, so it is created again after training
+        if self.__numpy_engine is None:
+            self.__numpy_engine = nn.NerEngine(lw.LayersWeights.from_keras_model(self.__model))
+        return self.__numpy_engine
+
+    def raw_output(self, sentences, classification_pred, embedded_sentences=None, backend='keras'):
         intents = self.__dataset_params['intents']
-        embedded_sentences = self.__embeddings_model.embed(sentences)
+        if embedded_sentences is None:
+            embedded_sentences = self.__embeddings_model.embed(sentences)
         class_label = []
         for p in classification_pred:
             intent_encoded = np.zeros(len(intents))
@@ -96,93 +117,58 @@ class NerModel:
                 intent_encoded[idx] = 1
             class_label.append(intent_encoded)
         intent_labels = np.array(class_label)
-        output = self.__model.predict([ intent_labels, embedded_sentences ])
-        ret_predictions = []
-        for sentence_preds in output:
-            sentence_word_predictions = []
-            for idx, word_tag_preds in enumerate(sentence_preds):
-                highest_index = word_tag_preds.argmax()
-                confidence = word_tag_preds[highest_index]
-                sentence_word_predictions.append({
-                    "highestIndex": highest_index,
-                    "confidence": confidence,
-                })
-            ret_predictions.append(sentence_word_predictions)
-        return ret_predictions
+        return self.bucketed_prediction(intent_labels, embedded_sentences, backend)
+
+    def raw_prediction(self, sentences, classification_pred, embedded_sentences=None, backend='keras'):
+        output = self.raw_output(sentences, classification_pred, embedded_sentences, backend)
+        highest_indexes = output.argmax(axis=2)
+        confidences = output.max(axis=2)
+        return [
+            [{"highestIndex": h, "confidence": c} for h, c in zip(sentence_indexes, sentence_confidences)]
+            for sentence_indexes, sentence_confidences in zip(highest_indexes, confidences)
+        ]
 
-    def predict(self, sentences, classification_pred):
-        prediction = []
-        low_confidence_threshold = self.__config['lowConfidenceThreshold']
-        slots_to_id = self.__dataset_params['slotsToId']
-        word_predictions_chunk = self.raw_prediction(
-            sentences, classification_pred)
-        for i, s in enumerate(sentences):
-            sentence_word_prediction_ids = word_predictions_chunk[i]
-            sentence_words = self.__embeddings_model.tokenizer.split_sentence_to_words(
-                s)
-            accumulator = {
-                'current': {'key': '', 'value': '', 'confidence': 0},
-                'slots': {},
-                'sentence': sentences[i]
-            }
-            for wpidx, w in enumerate(sentence_words):
-                wp = sentence_word_prediction_ids[wpidx]
-                current_slot_key = None
-                for _id, slot in enumerate(slots_to_id.keys()):
-                    if (current_slot_key != None):
-                        break
-                    if _id == wp['highestIndex']:
-                        current_slot_key = slot
-                if (accumulator['current']['confidence'] == 0):
-                    accumulator['current']['confidence'] = wp['confidence']
-                if (accumulator['current']['key'] == current_slot_key):
-                    accumulator['current']['value'] += ' ' + w
-                    confidence_avg = (
-                        (wp['confidence'] + accumulator['current']['confidence'])/2)
-                    accumulator['current']['confidence'] = confidence_avg
+    def length_buckets(self, backend='keras'):
+        # NOTE: ner models built before the length buckets (like a pretrained model) have a fixed input of
+        # maxWordsPerSentence timesteps, so they always run over all of them. The numpy engine runs over any timesteps
+        if backend != 'numpy' and self.__model.input_shape[1][1] is not None:
+            return []
+        return self.__config['lengthBuckets']
+
+    def bucketed_prediction(self, intent_labels, embedded_sentences, backend='keras'):
+        # NOTE: sentences are grouped by length buckets and each bucket only runs over its timesteps,
+        # the predictions of the padding words after the bucket timesteps are left as zeros
+        max_words = embedded_sentences.shape[1]
+        buckets = lb.bucket_lengths(
+            lb.sequence_lengths(embedded_sentences), self.length_buckets(backend), max_words)
+        output = np.zeros((len(embedded_sentences), max_words, len(self.__dataset_params['slotsToId'])), dtype=np.float32)
+        with self.__metrics.timer('ner_forward_seconds'):
+            for timesteps, indices in lb.group_by_bucket(buckets).items():
+                if backend == 'numpy':
+                    output[indices, :timesteps] = self.numpy_engine().predict(
+                        intent_labels[indices], embedded_sentences[indices, :timesteps])
                 else:
-                    if (accumulator['current']['key'] != '' and
-                        accumulator['current']['key'] != 'O' and
-                            wp['confidence'] >= low_confidence_threshold):
-                        new_slot = {
-                            'confidence': wp['confidence'], 'value': accumulator['current']['value']}
-                        if accumulator['current']['key'] in accumulator['slots']:
-                            accumulator['slots'][accumulator['current']['key']].append(
-                                new_slot)
-                        else:
-                            accumulator['slots'][accumulator['current']['key']] = [
-                                new_slot]
-                    accumulator['current'] = {
-                        'key': current_slot_key, 'value': w, 'confidence': wp['confidence'],
-                    }
-                if (wpidx + 1 == len(sentence_word_prediction_ids)):
-                    if (accumulator['current']['key'] != 'O' and wp['confidence'] >= low_confidence_threshold):
-                        new_slot = {
-                            'confidence': wp['confidence'], 'value': accumulator['current']['value']}
-                        if accumulator['current']['key'] in accumulator['slots']:
-                            accumulator['slots'][accumulator['current']['key']].append(
-                                new_slot)
-                        else:
-                            accumulator['slots'][accumulator['current']['key']] = [
-                                new_slot]
-            prediction.append({
-                'sentence': accumulator['sentence'],
-                'slots': accumulator['slots'],
-            })
-        return prediction
+                    output[indices, :timesteps] = self.__model.predict(
+                        [intent_labels[indices], embedded_sentences[indices, :timesteps]])
+        return output
 
-    def train(self, train_dataset):
-        chunks = du.chunks(
-            train_dataset['trainX'],
-            self.__config['batchSize'],
-            train_dataset['trainY'],
-            train_dataset['trainY2'])
+    # tokens are the (words, offsets) of EmbeddingsModel.tokenize(sentences), when they were already computed
+    def predict(self, sentences, classification_pred, embedded_sentences=None, backend='keras', tokens=None):
+        if tokens is None:
+            tokens = self.__embeddings_model.tokenize(sentences)
+        if embedded_sentences is None:
+            embedded_sentences = self.__embeddings_model.embed(sentences, tokens)
+        output = self.raw_output(sentences, classification_pred, embedded_sentences, backend)
+        with self.__metrics.timer('ner_decode_seconds'):
+            return nd.decode(output, sentences, tokens, self.__slot_names, self.__config['lowConfidenceThreshold'])
+
+    def train(self, train_dataset, training_data=None, callbacks=[]):
+        prepared_data = training_data if training_data is not None else td.TrainingData.prepare(
+            train_dataset, self.__embeddings_model, self.__dataset_params, self.__config)
         self.__logger(f'Start training NER model! (attention enabled: {self.__config["addAttention"]})')
-        enough_accuracy_reached = False
         m = self.__model
         num_slot_types = len(self.__dataset_params["slotsToId"].keys())
-        n_batches = math.ceil(
-            len(train_dataset['trainX'])/self.__config['batchSize'])
+        callbacks = list(callbacks)
         # ===   Visualization code block   ===
         # sentence = 'please remind to me watch real madrid match tomorrow at 9pm'
         # intent_label = to_categorical(np.array([0], dtype=np.int32), len(self.__dataset_params['intents']))
@@ -191,66 +177,69 @@ class NerModel:
         # visualize_layer_output('nerConv1', m, [intent_label, x_viz], 'ner/conv1-')
         # visualize_layer_output('nerConv2', m, [intent_label, x_viz], 'ner/conv2-')
         # visualize(m.predict([intent_label, x_viz]), 'ner/output-')
+        # callbacks.append(keras.callbacks.LambdaCallback(on_epoch_end=lambda idx, logs: (
+        #     visualize_layer_output('nerConv1', m, [intent_label, x_viz], f'ner/conv1-{idx}'),
+        #     visualize_layer_output('nerConv2', m, [intent_label, x_viz], f'ner/conv2-{idx}'),
+        #     visualize(m.predict([intent_label, x_viz]), f'ner/output-{idx}'),
+        # )))
         # === END visualization code block ===
-        for idx, t_chunk in enumerate(chunks):
-            train_x_chunks = t_chunk[0]  # sentences
-            train_y_chunks = t_chunk[1]  # intents code per sentence
-            train_y2_chunks = t_chunk[2]  # slots encoded per sentence word
-            if enough_accuracy_reached:
-                break
-            intent_labels = to_categorical(np.array(
-                train_y_chunks, dtype=np.int32), len(self.__dataset_params['intents']))
-            embedded_sentence_words = self.__embeddings_model.embed(train_x_chunks)
-            y2_sentences = []
-            for words_slot_id in train_y2_chunks:
-                slot_ids = np.array(words_slot_id, dtype=np.int32)
-                pad_width = self.__dataset_params['maxWordsPerSentence'] - len(
-                    words_slot_id)
-                padded_slot_ids = np.pad(
-                    slot_ids, [[0, pad_width]], mode='constant'
-                )
-                y2_sentences.append(to_categorical(padded_slot_ids, num_slot_types))
-            slot_tags = np.stack(y2_sentences)
-            m.fit(
-                x=[intent_labels, embedded_sentence_words],
-                y=slot_tags,
-                shuffle=True,
-                # batch_size=self.__config['batchSize'], # IMPORTANT: adding batch size here makes the optimization bad
-                epochs=self.__config['epochs'],
-                verbose=0,
-                validation_split=self.__config['trainingValidationSplit'],
-            )
-            # ===   Visualization code block   ===
-            # visualize_layer_output('nerConv1', m, [intent_label, x_viz], f'ner/conv1-{idx}')
-            # visualize_layer_output('nerConv2', m, [intent_label, x_viz], f'ner/conv2-{idx}')
-            # visualize(m.predict([intent_label, x_viz]), f'ner/output-{idx}')
-            # === END visualization code block ===
-            self.__logger(
-                f'Trained {m.history.epoch[-1]+1} epochs on batch {idx + 1} of {n_batches}')
-            self.__logger(
-                f'Training Loss: {m.history.history["loss"][-1]} | Training Accuracy: {m.history.history["acc"][-1]}')
-            self.__logger(
-                f'Validation Loss: {m.history.history["val_loss"][-1]} | Validation Accuracy: {m.history.history["val_acc"][-1]}')
-            self.__logger(
-                '==================================================================================================')
-            if (self.__config["lossThresholdToStopTraining"] > 0 and
-                m.history.history["loss"][-1] < self.__config["lossThresholdToStopTraining"] and
-                    m.history.history["val_loss"][-1] < self.__config["lossThresholdToStopTraining"]):
-                enough_accuracy_reached = True
-                self.__logger(
-                    f'Enough accuracy reached! Ending training after batch {idx + 1} of {n_batches}')
+
+        def batch_builder(indices, timesteps):
+            # slots are stored as ids padded to max words per sentence
+            slot_tags = to_categorical(prepared_data.slots()[indices, :timesteps], num_slot_types)
+            return [prepared_data.intents()[indices], prepared_data.embedded()[indices, :timesteps]], slot_tags
+        bucket_lengths = lb.bucket_lengths(
+            prepared_data.lengths(), self.length_buckets(), self.__dataset_params['maxWordsPerSentence'])
+        try:
+            ts.fit(m, batch_builder, len(prepared_data), self.__config, self.__logger, callbacks, bucket_lengths)
+        finally:
+            self.__numpy_engine = None
+            if training_data is None:
+                prepared_data.close()
+
+    def test(self, test_examples, results_handler=None, embedded_sentences=None, log_sentences=False):
+        if results_handler != None:
+            return self.__test_with_handler(test_examples, results_handler, embedded_sentences)
+        # NOTE: the whole dataset is predicted in large batches (with the dataset intents) and scored at once
+        batch_size = self.__config['evaluationBatchSize']
+        sentences = test_examples['testX']
+        chunks_tags = []
+        for start in range(0, len(sentences), batch_size):
+            # NOTE: when the sentences are already embedded, only slice the chunk instead of embedding it again
+            embedded_chunk = self.__embeddings_model.embed(sentences[start:start + batch_size]) \
+                if embedded_sentences is None else embedded_sentences[start:start + batch_size]
+            chunks_tags.append(self.test_tags(test_examples['testY'][start:start + batch_size], embedded_chunk))
+        return self.test_stats(test_examples, chunks_tags, log_sentences)
+
+    # the predicted tags of the embedded sentences, with the dataset intents (ids) of the sentences
+    def test_tags(self, intents, embedded_sentences):
+        intent_labels = to_categorical(np.array(intents, dtype=np.int32), len(self.__dataset_params['intents']))
+        return self.bucketed_prediction(intent_labels, embedded_sentences).argmax(axis=2)
+
+    # chunks_tags are the predicted tags of the consecutive chunks of the test sentences
+    def test_stats(self, test_examples, chunks_tags, log_sentences=False):
+        sentences = test_examples['testX']
+        max_words = self.__dataset_params['maxWordsPerSentence']
+        predicted_tags = np.concatenate([np.zeros((0, max_words), dtype=np.int64)] + list(chunks_tags))
+        expected_tags = ev.padded_tags(test_examples['testY2'], max_words)
+        stats = ev.ner_stats(expected_tags, predicted_tags, self.__slot_names)
+        if log_sentences:
+            for idx in np.flatnonzero(~ev.sentences_correct(expected_tags, predicted_tags)):
                 self.__logger(
-                    '==================================================================================================')
+                    f'WRONG - {sentences[idx]} expected: {test_examples["testY2"][idx]}, predicted: {predicted_tags[idx].tolist()})'
+                )
+        return stats
 
-    def test(self, test_examples, results_handler=None):
-        handler = results_handler if results_handler != None else self.__default_results_logger
+    def __test_with_handler(self, test_examples, results_handler, embedded_sentences=None):
+        # results_handler(sentences, slots per word, predicted tags, stats) is called for each chunk of the dataset
+        batch_size = self.__config['batchSize']
         chunks = du.chunks(
             test_examples['testX'],
-            self.__config['batchSize'],
+            batch_size,
             test_examples['testY'],
             test_examples['testY2'])
         stats = {'correct': 0, 'wrong': 0}
-        for t_chunk in chunks:
+        for idx, t_chunk in enumerate(chunks):
             test_x = t_chunk[0]  # sentences
             test_y = t_chunk[1]  # intents code per sentence
             test_y2 = t_chunk[2]  # slots encoded per sentence word
@@ -259,28 +248,8 @@ class NerModel:
                 'intent': self.__dataset_params['intents'][test_y[sentence_id]],
                 'sentence': sentence,
             } for sentence_id, sentence in enumerate(test_x)]
-            predictions = self.raw_prediction(test_x, p_intent)
-            preds = []
-            for sentences in predictions:
-                preds.append([sentence['highestIndex']
-                              for sentence in sentences])
-            handler(test_x, test_y2, preds, stats)
-        return stats
-
-    def __default_results_logger(self, x, y2, o, stats):
-        for sentence_idx, s in enumerate(x):
-            expected_tags = y2[sentence_idx]
-            predicted_tags = o[sentence_idx]
-            correct = True
-            for idx, tag in enumerate(expected_tags):
-                if (predicted_tags[idx] != tag and correct):
-                    correct = False
-            if (correct):
-                stats['correct'] += 1
-                # self.__logger(f'CORRECT - {s} expected: {expected_tags}, predicted: {predicted_tags})')
-            else:
-                stats['wrong'] += 1
-                self.__logger(
-                    f'WRONG - {s} expected: {expected_tags}, predicted: {predicted_tags})'
-                )
+            # NOTE: when the sentences are already embedded, only slice the chunk instead of embedding it again
+            embedded_chunk = None if embedded_sentences is None else embedded_sentences[idx * batch_size:idx * batch_size + len(test_x)]
+            preds = self.raw_output(test_x, p_intent, embedded_chunk).argmax(axis=2).tolist()
+            results_handler(test_x, test_y2, preds, stats)
         return stats
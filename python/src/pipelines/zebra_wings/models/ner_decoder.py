@@ -0,0 +1,45 @@
+import numpy as np
+
+# Decodes the ner model output of (sentences, words, slot types) into the slots of each sentence.
+# The highest slot type and its confidence are taken for all the words at once, then the words of each
+# sentence are grouped into spans with a run length encoding of the slot tags.
+
+
+def slot_names(slots_to_id):
+    # NOTE: the model outputs follow the order of the slotsToId keys
+    return np.array(list(slots_to_id.keys()), dtype=object)
+
+
+def decode(output, sentences, tokens, names, low_confidence_threshold):
+    # tokens are the words of all the sentences and the offsets of each sentence words (see tokenize_batch)
+    words, offsets = tokens
+    tags = output.argmax(axis=2)
+    confidences = output.max(axis=2)
+    num_predictions = output.shape[1]
+    prediction = []
+    for i in range(len(sentences)):
+        first_word = offsets[i]
+        num_words = min(offsets[i + 1] - first_word, num_predictions)
+        sentence_tags = tags[i, :num_words]
+        sentence_confidences = confidences[i, :num_words]
+        # start index of each run of consecutive words with the same tag
+        starts = np.concatenate(([0], np.flatnonzero(sentence_tags[1:] != sentence_tags[:-1]) + 1)) if num_words else []
+        slots = {}
+        for run_idx, start in enumerate(starts):
+            end = starts[run_idx + 1] if run_idx + 1 < len(starts) else num_words
+            key = names[sentence_tags[start]]
+            if key == 'O':
+                continue
+            # NOTE: a span is kept when the confidence of the word that ends it (the first word of the next span,
+            # or the last predicted word) reaches the threshold. Spans only end at the last predicted word.
+            if end < num_words:
+                confidence = sentence_confidences[end]
+            elif num_words == num_predictions:
+                confidence = sentence_confidences[end - 1]
+            else:
+                continue
+            if confidence >= low_confidence_threshold:
+                slots.setdefault(key, []).append(
+                    {'confidence': confidence, 'value': ' '.join(words[first_word + start:first_word + end])})
+        prediction.append({'sentence': sentences[i], 'slots': slots})
+    return prediction
@@ -0,0 +1,17 @@
+import numpy as np
+
+
+def relu(x):
+    return np.maximum(x, 0)
+
+
+def softmax(x, axis=-1):
+    exps = np.exp(x - x.max(axis=axis, keepdims=True))
+    return exps / exps.sum(axis=axis, keepdims=True)
+
+
+def hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0, 1)
+
+
+ACTIVATIONS = {'linear': lambda x: x, 'relu': relu, 'softmax': softmax, 'tanh': np.tanh, 'hard_sigmoid': hard_sigmoid}
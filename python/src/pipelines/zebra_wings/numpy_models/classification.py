@@ -0,0 +1,29 @@
+import numpy as np
+import src.pipelines.zebra_wings.numpy_models.activations as act
+
+# Numpy forward pass of the ClassificationModel architecture (three Conv1D + global max pooling
+# branches, concatenated with the first branch again and a softmax Dense), without tensorflow.
+# Dropout is only active while training, so it is skipped here.
+
+
+def conv1d_max_pool(x, kernel, bias):
+    # im2col over the words axis: each row has the concatenated vectors of the kernel_size words
+    # of a window, so the whole valid convolution is a single (batch * windows, k * dims) matmul
+    kernel_size, dimensions, filters = kernel.shape
+    windows = x.shape[1] - kernel_size + 1
+    columns = np.concatenate([x[:, i:i + windows] for i in range(kernel_size)], axis=2)
+    convolved = act.relu(columns @ kernel.reshape(kernel_size * dimensions, filters) + bias)
+    return convolved.max(axis=1)
+
+
+class ClassificationEngine:
+    def __init__(self, layers_weights):
+        self.__convs = [layers_weights.layer(name)['weights'] for name in ['classConv1', 'classConv2', 'classConv3']]
+        self.__dense = layers_weights.layers_of_class('Dense')[0]['weights']
+
+    def predict(self, embedded_sentences):
+        x = np.asarray(embedded_sentences, dtype=np.float32)
+        pooled = [conv1d_max_pool(x, kernel, bias) for kernel, bias in self.__convs]
+        hidden = np.concatenate(pooled + [pooled[0]], axis=1)
+        kernel, bias = self.__dense
+        return act.softmax(hidden @ kernel + bias)
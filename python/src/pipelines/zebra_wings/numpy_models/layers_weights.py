@@ -0,0 +1,68 @@
+import json
+import os
+import numpy as np
+
+# Trained weights and configuration of each layer of a model, read either from a keras model or from the
+# tensorflowjs artifacts written by AidaPipeline.save. Reading the artifacts doesn't import tensorflow.
+
+
+def read_tfjs_weights(weights_manifest, path):
+    # returns a list of (weight name, value) in the order of the weights manifest
+    weights = []
+    for group in weights_manifest:
+        buffer = b''.join(open(os.path.join(path, shard), 'rb').read() for shard in group['paths'])
+        offset = 0
+        for weight in group['weights']:
+            quantization = weight.get('quantization')
+            dtype = np.dtype(quantization['dtype'] if quantization else weight['dtype'])
+            count = int(np.prod(weight['shape']))
+            value = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(weight['shape'])
+            offset += count * dtype.itemsize
+            if quantization:
+                value = (value * quantization['scale'] + quantization['min']).astype(weight['dtype'])
+            weights.append((weight['name'], value))
+    return weights
+
+
+class LayersWeights:
+    @staticmethod
+    def from_keras_model(model):
+        return LayersWeights([{
+            'name': layer.name,
+            'class_name': layer.__class__.__name__,
+            'config': layer.get_config(),
+            'weights': layer.get_weights(),
+        } for layer in model.layers])
+
+    @staticmethod
+    def from_tfjs_artifacts(path):
+        with open(os.path.join(path, 'model.json')) as f:
+            model_json = json.load(f)
+        topology = model_json['modelTopology']
+        topology = topology.get('model_config', topology)
+        weights = read_tfjs_weights(model_json['weightsManifest'], path)
+        # NOTE: the config of the keras 2.2.4 Sequential models is the list of layers, functional models have {'layers': ...}
+        layers = topology['config']['layers'] if isinstance(topology['config'], dict) else topology['config']
+        # NOTE: weights are named after the layer that owns them, like 'classConv1/kernel'
+        return LayersWeights([{
+            'name': layer['config']['name'],
+            'class_name': layer['class_name'],
+            'config': layer['config'],
+            'weights': [value for name, value in weights if name.startswith(layer['config']['name'] + '/')],
+        } for layer in layers])
+
+    def __init__(self, layers):
+        # list of layers in topology order, each one like {'name', 'class_name', 'config', 'weights'}
+        self.layers = layers
+
+    def layer(self, name):
+        for layer in self.layers:
+            if layer['name'] == name:
+                return layer
+        raise KeyError(f'Layer {name} not found')
+
+    def layers_of_class(self, class_name):
+        return [layer for layer in self.layers if layer['class_name'] == class_name]
+
+    def nbytes(self):
+        return sum(np.asarray(weight).nbytes for layer in self.layers for weight in layer['weights'])
@@ -0,0 +1,73 @@
+import numpy as np
+import src.pipelines.zebra_wings.numpy_models.activations as act
+
+# Numpy forward pass of the NerModel architecture (two pointwise Conv1D, the intent repeated per word,
+# a bidirectional LSTM, the optional TimeSeriesAttention and a softmax Dense), without tensorflow.
+# The LSTM recurrence runs for all the sentences of the batch at once, the input projections of
+# all the timesteps are precomputed with a single matmul.
+
+
+def lstm(inputs, mask, kernel, recurrent_kernel, bias, activation, recurrent_activation, go_backwards=False):
+    # same as keras LSTM with return_sequences, masked timesteps keep the previous states and output
+    batch_size, timesteps, _ = inputs.shape
+    units = recurrent_kernel.shape[0]
+    projected = inputs @ kernel + bias
+    h = np.zeros((batch_size, units), dtype=np.float32)
+    c = np.zeros((batch_size, units), dtype=np.float32)
+    outputs = np.zeros((batch_size, timesteps, units), dtype=np.float32)
+    steps = range(timesteps - 1, -1, -1) if go_backwards else range(timesteps)
+    for t in steps:
+        z = projected[:, t] + h @ recurrent_kernel
+        i = recurrent_activation(z[:, :units])
+        f = recurrent_activation(z[:, units:units * 2])
+        c_candidate = f * c + i * activation(z[:, units * 2:units * 3])
+        o = recurrent_activation(z[:, units * 3:])
+        h_candidate = o * activation(c_candidate)
+        step_mask = mask[:, t, None]
+        c = np.where(step_mask, c_candidate, c)
+        h = np.where(step_mask, h_candidate, h)
+        outputs[:, t] = h
+    return outputs
+
+
+def time_series_attention(inputs, mask, kernel_1, bias_1, kernel_2, bias_2):
+    # both per timestep dense layers are applied to the (batch, time, dims) tensor at once
+    encoded = np.tanh(act.softmax(inputs @ kernel_1 + bias_1) @ kernel_2 + bias_2)
+    # padded timesteps can't be attended and don't contribute to the output
+    float_mask = mask.astype(np.float32)
+    self_attended = inputs @ encoded.transpose(0, 2, 1) - (1 - float_mask[:, None, :]) * 1e9
+    attention = act.softmax(self_attended) * float_mask[:, :, None]
+    return attention.transpose(0, 2, 1) @ inputs
+
+
+class NerEngine:
+    def __init__(self, layers_weights):
+        self.__conv1 = layers_weights.layer('nerConv1')['weights']
+        self.__conv2 = layers_weights.layer('nerConv2')['weights']
+        bidi_encoder = layers_weights.layer('bidi_encoder')
+        lstm_config = bidi_encoder['config']['layer']['config']
+        self.__lstm_activations = (
+            act.ACTIVATIONS[lstm_config['activation']], act.ACTIVATIONS[lstm_config['recurrent_activation']])
+        # NOTE: bidirectional weights are the forward layer weights followed by the backward layer weights
+        self.__forward = bidi_encoder['weights'][:3]
+        self.__backward = bidi_encoder['weights'][3:]
+        attention = layers_weights.layers_of_class('TimeSeriesAttention')
+        self.__attention = attention[0]['weights'] if attention else None
+        self.__dense = layers_weights.layers_of_class('Dense')[-1]['weights']
+
+    def predict(self, intent_labels, embedded_sentences):
+        x = np.asarray(embedded_sentences, dtype=np.float32)
+        # padding words are zero vectors, same as the keras Masking layer
+        mask = np.any(x != 0, axis=2)
+        conv1 = act.relu(x @ self.__conv1[0][0] + self.__conv1[1])
+        conv2 = np.tanh(conv1 @ self.__conv2[0][0] + self.__conv2[1])
+        intents = np.repeat(np.asarray(intent_labels, dtype=np.float32)[:, None, :], x.shape[1], axis=1)
+        concated = np.concatenate([intents, x, conv2], axis=2)
+        forward = lstm(concated, mask, *self.__forward, *self.__lstm_activations)
+        backward = lstm(concated, mask, *self.__backward, *self.__lstm_activations, go_backwards=True)
+        if self.__attention is not None:
+            hidden = np.concatenate([time_series_attention(forward, mask, *self.__attention), forward, backward], axis=2)
+        else:
+            hidden = np.concatenate([forward, backward], axis=2)
+        kernel, bias = self.__dense
+        return act.softmax(hidden @ kernel + bias)
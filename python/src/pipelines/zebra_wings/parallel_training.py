@@ -0,0 +1,59 @@
+import concurrent.futures
+import multiprocessing as mp
+import os
+import keras
+import tensorflow as tf
+import src.pipelines.zebra_wings.models.classification as cm
+import src.pipelines.zebra_wings.models.ner as nm
+import src.pipelines.zebra_wings.training_data as td
+
+# Trains the classification and ner models at the same time, each one in its own process with its own
+# tensorflow session. The models are independent (the ner model is trained with the dataset intents)
+# and share the training dataset prepared by the parent through TrainingData.
+# NOTE: processes are spawned (not forked) because tensorflow doesn't support forking after it is used.
+
+MODEL_CLASSES = {'classification': cm.ClassificationModel, 'ner': nm.NerModel}
+
+
+def limit_session_threads(num_threads):
+    keras.backend.set_session(tf.Session(config=tf.ConfigProto(
+        intra_op_parallelism_threads=num_threads, inter_op_parallelism_threads=num_threads)))
+
+
+def _train_model(model_name, config, dataset_params, training_data_path, weights, num_threads):
+    limit_session_threads(num_threads)
+    logs = []
+    model = MODEL_CLASSES[model_name](config, dataset_params, None, logs.append)
+    # NOTE: start from the weights of the parent model, same as training it in the parent process
+    model.set_weights(weights)
+    training_data = td.TrainingData.open(training_data_path)
+    try:
+        model.train(None, training_data)
+    finally:
+        # NOTE: the parent owns the training data files, the worker only closes its memmaps
+        training_data.close()
+    return model.keras_model().get_weights(), logs
+
+
+def train_models(models, configs, dataset_params, training_data, logger, num_threads=None):
+    # models and configs are dicts by model name, the trained weights are set back to the models.
+    # The logs of each model are replayed with the logger when its training finishes.
+    num_threads = num_threads or max(os.cpu_count() // len(models), 1)
+    with concurrent.futures.ProcessPoolExecutor(len(models), mp.get_context('spawn')) as executor:
+        futures = {
+            name: executor.submit(
+                _train_model,
+                name,
+                configs[name],
+                dataset_params,
+                training_data.path,
+                model.keras_model().get_weights(),
+                num_threads,
+            )
+            for name, model in models.items()
+        }
+        for name, future in futures.items():
+            weights, logs = future.result()
+            for log in logs:
+                logger(log)
+            models[name].set_weights(weights)
@@ -1,46 +1,50 @@
+import json
+import os
 import keras
 import numpy as np
-import tensorflowjs as tfjs
-import src.languages.en.english_tokenizer as eng
-import src.languages.es.spanish_tokenizer as spa
 import src.pipelines.zebra_wings.models.classification as cm
 import src.pipelines.zebra_wings.models.ner as nm
 import src.pipelines.zebra_wings.embeddings.embeddings_model as em
+import src.pipelines.zebra_wings.training_data as td
+import src.pipelines.zebra_wings.parallel_training as pt
+import src.pipelines.zebra_wings.warm_start as ws
+import src.utils.metrics as mu
+import src.pipelines.zebra_wings.numpy_models.layers_weights as lw
+from src.pipelines.zebra_wings.embeddings.combine_ngrams_layer import CombineNgramsLayer
+from src.pipelines.zebra_wings.embeddings.presaved_embeddings_initializer import PreSavedEmbeddingsInitializer
+from src.pipelines.zebra_wings.repeat_to_sequence import RepeatToSequence
+from src.pipelines.zebra_wings.time_series_attention import TimeSeriesAttention
+from src.pipelines.zebra_wings.pipeline_definition import default_config, default_pipeline_definition, get_tokenizer, model_config
 
 
-def get_tokenizer(language):
-    if (language.lower() == 'en'):
-        return eng.EnglishTokenizer()
-    elif (language.lower() == 'es'):
-        return spa.SpanishTokenizer()
-    raise ValueError('Unkown language')
-
-
-default_pipeline_definition = {
-    'config': {
-        'classification': {
-            'epochs': 5,
-            'filterSizes': [2, 4, 8],
-            'lowConfidenceThreshold': 0.3,
-            'numFilters': 128,
-        },
-        'default': {
-            'batchSize': 120, # NOTE: having a large batch size works fine from python but has problems with js (browsers)
-            'drop': 0.5,
-            'embeddingDimensions': 300,
-            'lossThresholdToStopTraining': 1e-6,
-            'maxNgrams': 20,
-            'trainingValidationSplit': 0.3,
-        },
-        'ner': {
-            'epochs': 5,
-            'lowConfidenceThreshold': 0.2,
-            'numFilters': [128, 128],
-            'addAttention': True,
-            'rnnUnits': 100,
-        },
-    },
-}
+def load_keras_model(path):
+    # NOTE: tfjs.converters.load_keras_model builds tf.keras models (not keras ones), so the model is
+    # rebuilt from the saved topology and the weights are read from the artifacts with LayersWeights
+    with open(os.path.join(path, 'model.json')) as f:
+        topology = json.load(f)['modelTopology']
+    custom_objects = {
+        'CombineNgramsLayer': CombineNgramsLayer,
+        'PreSavedEmbeddingsInitializer': PreSavedEmbeddingsInitializer,
+        'RepeatToSequence': RepeatToSequence,
+        'TimeSeriesAttention': TimeSeriesAttention,
+    }
+    with keras.utils.CustomObjectScope(custom_objects):
+        model = keras.models.model_from_json(json.dumps(topology.get('model_config', topology)))
+    layers_weights = lw.LayersWeights.from_tfjs_artifacts(path)
+    for layer in model.layers:
+        layer.set_weights(layers_weights.layer(layer.name)['weights'])
+    return model
+
+
+# tfjs only supports affine uint8/uint16 weights quantization, used for 'int8' and 'float16' respectively
+EMBEDDING_QUANTIZATION_DTYPES = {None: None, 'float16': np.uint16, 'int8': np.uint8}
+
+
+def embedding_quantization_dtype(quantization):
+    if quantization not in EMBEDDING_QUANTIZATION_DTYPES:
+        raise ValueError(
+            f'Unknown embeddingQuantization {quantization}, valid values are {list(EMBEDDING_QUANTIZATION_DTYPES)}')
+    return EMBEDDING_QUANTIZATION_DTYPES[quantization]
 
 
 class AidaPipeline:
@@ -54,75 +58,181 @@ class AidaPipeline:
         pretrained_embedding=None,
         pretrained_ngram_vectors=None,
         pipeline_definition=default_pipeline_definition,
+        metrics=mu.NOOP_METRICS,
     ):
+        # metrics is a sink like src.utils.metrics.InMemoryMetrics, timing each stage of the predictions
         self.__embeddings_model = None
+        self.__metrics = metrics
         self.__dataset_params = dataset_params
         self.__logger = logger
         self.__pipeline_definition = pipeline_definition
         self.__classification_model = pretrained_classifier
         self.__ner_model = pretrained_ner
         self.__tokenizer = get_tokenizer(self.__dataset_params['language'])
+        default_cfg = default_config(pipeline_definition)
+        embedding_quantization = default_cfg['embeddingQuantization']
+        embedding_quantization_dtype(embedding_quantization)
         self.__embeddings_model = em.EmbeddingsModel(
             ngram_to_id_dictionary,
             dataset_params['maxWordsPerSentence'],
-            pipeline_definition['config']['default']['maxNgrams'],
-            pipeline_definition['config']['default']['embeddingDimensions'],
+            default_cfg['maxNgrams'],
+            default_cfg['embeddingDimensions'],
             self.__tokenizer,
             pretrained_embedding,
             pretrained_ngram_vectors,
+            default_cfg['wordIdsCacheSize'],
+            default_cfg['precomputeWordVectors'],
+            metrics=metrics,
+            quantization=embedding_quantization,
         )
-        classification_cfg = dict()
-        classification_cfg.update(pipeline_definition['config']['default'])
-        classification_cfg.update(
-            pipeline_definition['config']['classification'])
         self.__classification_model = cm.ClassificationModel(
-            classification_cfg,
+            model_config(pipeline_definition, 'classification'),
             dataset_params,
             self.__embeddings_model,
             logger,
             pretrained_classifier,
+            metrics,
         )
-        ner_cfg = dict()
-        ner_cfg.update(pipeline_definition['config']['default'])
-        ner_cfg.update(pipeline_definition['config']['ner'])
         self.__ner_model = nm.NerModel(
-            ner_cfg,
+            model_config(pipeline_definition, 'ner'),
             dataset_params,
             self.__embeddings_model,
             logger,
             pretrained_ner,
+            metrics,
+        )
+
+    @staticmethod
+    def load(
+        cfg,
+        dataset_params,
+        logger,
+        ngram_to_id_dictionary,
+        pretrained_ngram_vectors=None,
+        pipeline_definition=default_pipeline_definition,
+        metrics=mu.NOOP_METRICS,
+    ):
+        # loads the models written by save, cfg has the same classificationPath, nerPath and embeddingPath
+        slots_length = len(dataset_params["slotsToId"].keys())
+        return AidaPipeline(
+            dataset_params,
+            logger,
+            ngram_to_id_dictionary,
+            load_keras_model(cfg['classificationPath']),
+            load_keras_model(cfg['nerPath']) if slots_length >= 2 else None,
+            load_keras_model(cfg['embeddingPath']),
+            pretrained_ngram_vectors,
+            pipeline_definition,
+            metrics,
         )
 
     def models(self):
         return {'classification': self.__classification_model, 'ner': self.__ner_model, 'embedding': self.__embeddings_model}
 
-    def train(self, train_dataset):
-        self.__classification_model.train(train_dataset)
+    def train(self, train_dataset, parallel=False):
+        # NOTE: embed the training dataset once and share it between both models
+        default_cfg = default_config(self.__pipeline_definition)
+        training_data = td.TrainingData.prepare(
+            train_dataset, self.__embeddings_model, self.__dataset_params, default_cfg, default_cfg['trainingCachePath'])
         # NOTE: only train the ner model if there are slots in the training params
         slots_length = len(self.__dataset_params["slotsToId"].keys())
-        if slots_length >= 2:
-            self.__ner_model.train(train_dataset)
+        # NOTE: the temporary training data files are removed even when the training fails
+        try:
+            if parallel:
+                models = {'classification': self.__classification_model}
+                if slots_length >= 2:
+                    models['ner'] = self.__ner_model
+                configs = {name: model_config(self.__pipeline_definition, name) for name in models}
+                pt.train_models(
+                    models, configs, self.__dataset_params, training_data, self.__logger, default_cfg['parallelTrainingThreads'])
+            else:
+                self.__classification_model.train(train_dataset, training_data)
+                if slots_length >= 2:
+                    self.__ner_model.train(train_dataset, training_data)
+        finally:
+            training_data.close()
 
-    def test(self, test_dataset):
-        classification_stats = self.__classification_model.test(test_dataset)
+    def train_incremental(self, train_dataset, dataset_params, replay_dataset=None, parallel=False):
+        # continues training the current models with the new examples of train_dataset and a sample of the
+        # previous ones (replay_dataset). The new dataset params can append new intents and slots.
+        ws.validate_dataset_params(self.__dataset_params, dataset_params)
+        classification_model = cm.ClassificationModel(
+            model_config(self.__pipeline_definition, 'classification'),
+            dataset_params,
+            self.__embeddings_model,
+            self.__logger,
+            None,
+            self.__metrics,
+        )
+        ws.transfer_weights(
+            self.__classification_model.keras_model(),
+            classification_model.keras_model(),
+            len(self.__dataset_params['intents']),
+        )
+        ner_model = nm.NerModel(
+            model_config(self.__pipeline_definition, 'ner'), dataset_params, self.__embeddings_model, self.__logger, None, self.__metrics)
+        # NOTE: the previous ner model was only trained if there were slots
+        if len(self.__dataset_params["slotsToId"].keys()) >= 2:
+            ws.transfer_weights(
+                self.__ner_model.keras_model(), ner_model.keras_model(), len(self.__dataset_params['intents']))
+        self.__dataset_params = dataset_params
+        self.__classification_model = classification_model
+        self.__ner_model = ner_model
+        num_replayed = int(len(train_dataset['trainX']) * default_config(self.__pipeline_definition)['incrementalReplayRatio'])
+        self.train(ws.with_replay(train_dataset, replay_dataset, num_replayed), parallel)
+
+    def test(self, test_dataset, log_sentences=False):
         # NOTE: only use the ner model if there are slots in the training params
         slots_length = len(self.__dataset_params["slotsToId"].keys())
+        # NOTE: embed each chunk of test sentences once and share it between both models,
+        # only one chunk of embedded sentences is kept in memory
+        batch_size = default_config(self.__pipeline_definition)['evaluationBatchSize']
+        sentences = test_dataset['testX']
+        classification_outputs = []
+        ner_tags = []
+        for start in range(0, len(sentences), batch_size):
+            embedded_chunk = self.__embeddings_model.embed(sentences[start:start + batch_size])
+            classification_outputs.append(self.__classification_model.raw_output(sentences[start:start + batch_size], embedded_chunk))
+            if slots_length >= 2:
+                ner_tags.append(self.__ner_model.test_tags(test_dataset['testY'][start:start + batch_size], embedded_chunk))
+        classification_stats = self.__classification_model.test_stats(test_dataset, classification_outputs, log_sentences)
         ner_stats = { 'correct': 0, 'wrong': 0 }
         if slots_length >= 2:
-            ner_stats = self.__ner_model.test(test_dataset)
+            ner_stats = self.__ner_model.test_stats(test_dataset, ner_tags, log_sentences)
         return {'classificationStats': classification_stats, 'nerStats': ner_stats}
 
-    def predict(self, sentences):
-        classification = self.__classification_model.predict(sentences)
-        # NOTE: only use the ner model if there are slots in the training params
-        slots_length = len(self.__dataset_params["slotsToId"].keys())
-        ner = self.__ner_model.predict(sentences, classification) if slots_length >= 2 else []
+    # backend is 'keras' or 'numpy', the numpy backend runs the trained weights without tensorflow
+    def predict(self, sentences, backend='keras'):
+        with self.__metrics.timer('predict_seconds'):
+            # NOTE: tokenize and embed the sentences once and share them between the classification and ner models
+            tokens = self.__embeddings_model.tokenize(sentences)
+            embedded_sentences = self.__embeddings_model.embed(sentences, tokens)
+            classification = self.__classification_model.predict(sentences, embedded_sentences, backend)
+            # NOTE: only use the ner model if there are slots in the training params
+            slots_length = len(self.__dataset_params["slotsToId"].keys())
+            ner = self.__ner_model.predict(
+                sentences, classification, embedded_sentences, backend, tokens) if slots_length >= 2 else []
+        if self.__metrics.enabled:
+            self.__metrics.increment('predicted_sentences_total', len(sentences))
+            self.__metrics.observe('predict_batch_size', len(sentences), mu.SIZE_BUCKETS)
+            mu.record_cache_stats(self.__metrics, self.__embeddings_model.cache_stats())
         return {'classification': classification, 'ner': ner}
 
     def save(self, cfg):
+        with self.__metrics.timer('save_seconds'):
+            self.__save(cfg)
+
+    def __save(self, cfg):
+        # NOTE: tensorflowjs is slow to import and only needed to save the models
+        import tensorflowjs as tfjs
         tfjs.converters.save_keras_model(self.__classification_model.keras_model(), cfg['classificationPath'])
         slots_length = len(self.__dataset_params["slotsToId"].keys())
         # NOTE: only save the ner model if there are slots
         if slots_length >= 2:
             tfjs.converters.save_keras_model(self.__ner_model.keras_model(), cfg['nerPath'])
-        tfjs.converters.save_keras_model(self.__embeddings_model.keras_model(), cfg['embeddingPath'])
+        # NOTE: the embeddings model holds the whole ngram vectors matrix, so it can be exported quantized
+        # (by default with the embeddingQuantization of the pipeline config)
+        quantization = cfg.get('embeddingQuantization', default_config(self.__pipeline_definition)['embeddingQuantization'])
+        quantization_dtype = embedding_quantization_dtype(quantization)
+        tfjs.converters.save_keras_model(
+            self.__embeddings_model.keras_model(), cfg['embeddingPath'], quantization_dtype=quantization_dtype)
@@ -0,0 +1,73 @@
+import src.languages.tokenizer_registry as tr
+
+# The pipeline configuration and tokenizers, without the keras dependencies of the pipeline,
+# so the inference only code (see src.serving.inference_pipeline) can import them.
+
+
+def get_tokenizer(language):
+    # NOTE: the tokenizers are shared, every pipeline of the same language gets the same instance
+    return tr.get_tokenizer(language)
+
+
+default_pipeline_definition = {
+    'config': {
+        'classification': {
+            'adamBeta1': 0.0008,
+            'adamBeta2': 0.03,
+            'epochs': 5,
+            'filterSizes': [2, 4, 8],
+            'learningRate': 0.0012, # use 1e-4 as default as alternative starting point
+            'lowConfidenceThreshold': 0.3,
+            'numFilters': 128,
+        },
+        'default': {
+            'batchSize': 120, # NOTE: having a large batch size works fine from python but has problems with js (browsers)
+            'drop': 0.5,
+            'earlyStoppingPatience': 2, # epochs without validation loss improvement before stopping the training
+            'embeddingDimensions': 300,
+            'embeddingQuantization': None, # 'float16' or 'int8' rounds the ngram vectors like the quantized ngram vectors tables
+            'evaluationBatchSize': 2048, # sentences predicted at once when testing the models
+            'incrementalReplayRatio': 1.0, # previous examples replayed per new example when training incrementally
+            'lossThresholdToStopTraining': 1e-6,
+            'maxNgrams': 20,
+            'parallelTrainingThreads': None, # tensorflow threads per model process when training in parallel, cpu count / models if None
+            'precomputeWordVectors': False, # compute the word vectors with numpy instead of the embeddings keras model
+            'trainingBatchSize': 32, # examples per gradient update when streaming the training dataset
+            'trainingCachePath': None, # directory for the embedded training dataset, uses a temporary directory if None
+            'trainingQueueSize': 10, # max training batches prefetched by the workers
+            'trainingValidationSplit': 0.3,
+            'trainingWorkers': 2, # threads preparing the training batches while the model trains
+            'wordIdsCacheSize': 100000, # max number of encoded words kept in memory by the embeddings model
+        },
+        'ner': {
+            'epochs': 5,
+            'lowConfidenceThreshold': 0.2,
+            'numFilters': [128, 128],
+            'addAttention': True,
+            'lengthBuckets': [5, 10, 20], # sentences are batched by the smallest of these lengths that fits them
+            'rnnUnits': 100,
+            'learningRate': 0.0066, # use 1e-4 as default as alternative starting point
+            'adamBeta1': 0.0025,
+            'adamBeta2': 0.1,
+        },
+    },
+}
+
+
+# NOTE: pipeline definitions saved before a config key was added don't have it, so the configs
+# below fill the missing keys with their value at default_pipeline_definition
+
+
+def default_config(pipeline_definition):
+    cfg = dict(default_pipeline_definition['config']['default'])
+    cfg.update(pipeline_definition['config']['default'])
+    return cfg
+
+
+def model_config(pipeline_definition, model_name):
+    # the default config updated with the config of the model ('classification' or 'ner')
+    cfg = dict()
+    for definition in [default_pipeline_definition, pipeline_definition]:
+        cfg.update(definition['config']['default'])
+        cfg.update(definition['config'][model_name])
+    return cfg
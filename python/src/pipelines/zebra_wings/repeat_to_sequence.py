@@ -0,0 +1,22 @@
+import keras
+from keras.engine import Layer
+import keras.backend as K
+
+
+# Repeats a (batch, features) vector once per timestep of a (batch, timesteps, ...) sequence.
+# Same as keras.layers.RepeatVector but following the sequence length, so the models
+# can accept variable length (length bucketed) sentences. Keeps the mask of the sequence.
+class RepeatToSequence(Layer):
+    def __init__(self, **kwargs):
+        super(RepeatToSequence, self).__init__(**kwargs)
+        self.supports_masking = True
+
+    def call(self, inputs):
+        vector, sequence = inputs
+        return K.repeat(vector, K.shape(sequence)[1])
+
+    def compute_mask(self, inputs, mask=None):
+        return mask[1] if isinstance(mask, list) else mask
+
+    def compute_output_shape(self, input_shape):
+        return (input_shape[0][0], input_shape[1][1], input_shape[0][1])
@@ -0,0 +1,210 @@
+import concurrent.futures
+import copy
+import csv
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+import time
+import keras
+import numpy as np
+import src.pipelines.zebra_wings.pipeline as pl
+import src.pipelines.zebra_wings.parallel_training as pt
+import src.pipelines.zebra_wings.training_data as td
+import src.pipelines.zebra_wings.embeddings.embeddings_model as em
+
+# Hyperparameters sweep over the pipeline definition config. The search space has the same structure as
+# pipeline_definition['config'] with a list of values per key, like:
+#   {'default': {'drop': [0.3, 0.5]}, 'classification': {'learningRate': [1e-3, 1e-4], 'numFilters': [64, 128]}}
+# Each trial (a combination of values) trains the models in its own spawned process with a capped number
+# of tensorflow threads. The training dataset is embedded once per embedding config and reused by the trials
+# (and by later sweeps over the same dataset, see prepare_training_data).
+# Trials are pruned when their validation loss at an epoch is worse than the median of the other trials.
+
+
+# stops the training when the validation loss is above the median of the other trials at the same epoch
+class MedianPruning(keras.callbacks.Callback):
+    def __init__(self, model_name, epoch_losses, lock, min_trials=3, warmup_epochs=1):
+        super(MedianPruning, self).__init__()
+        self.model_name = model_name
+        # shared between the trial processes, '<model name>/<epoch>' -> list of losses of the trials
+        self.epoch_losses = epoch_losses
+        self.lock = lock
+        self.min_trials = min_trials
+        self.warmup_epochs = warmup_epochs
+        self.losses = []
+        self.pruned = False
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        loss = logs.get('val_loss', logs.get('loss', math.inf))
+        self.losses.append(loss)
+        key = f'{self.model_name}/{epoch}'
+        with self.lock:
+            previous = self.epoch_losses.get(key, [])
+            self.epoch_losses[key] = previous + [loss]
+        # NOTE: the first warmup_epochs epochs are never pruned
+        if epoch >= self.warmup_epochs and len(previous) >= self.min_trials and loss > np.median(previous):
+            self.model.stop_training = True
+            self.pruned = True
+
+
+def trials_definitions(search_space, pipeline_definition=pl.default_pipeline_definition, max_trials=None, seed=0):
+    # the grid of all the values combinations, or max_trials random ones from it
+    keys = [(section, name) for section, values in search_space.items() for name in values]
+    grid = list(itertools.product(*[search_space[section][name] for section, name in keys]))
+    if max_trials is not None and max_trials < len(grid):
+        grid = random.Random(seed).sample(grid, max_trials)
+    definitions = []
+    for values in grid:
+        definition = copy.deepcopy(pipeline_definition)
+        for (section, name), value in zip(keys, values):
+            definition['config'][section][name] = value
+        definitions.append(({f'{section}.{name}': value for (section, name), value in zip(keys, values)}, definition))
+    return definitions
+
+
+def _run_trial(pipeline_definition, dataset_params, training_data_path, num_threads, epoch_losses, lock, min_trials):
+    start = time.time()
+    pt.limit_session_threads(num_threads)
+    training_data = td.TrainingData.open(training_data_path)
+    result = {'status': 'complete'}
+    model_names = ['classification']
+    # NOTE: only train the ner model if there are slots in the training params
+    if len(dataset_params['slotsToId'].keys()) >= 2:
+        model_names.append('ner')
+    for name in model_names:
+        pruning = MedianPruning(name, epoch_losses, lock, min_trials)
+        model = pt.MODEL_CLASSES[name](pl.model_config(pipeline_definition, name), dataset_params, None, lambda _: None)
+        model.train(None, training_data, [pruning])
+        result[f'{name}Epochs'] = len(pruning.losses)
+        result[f'{name}ValLoss'] = min(pruning.losses)
+        if pruning.pruned:
+            result['status'] = 'pruned'
+            break
+    result['loss'] = sum(result[f'{name}ValLoss'] for name in model_names) if result['status'] == 'complete' else None
+    result['seconds'] = time.time() - start
+    return result
+
+
+# the config of the embeddings, the other keys don't change the embedded training dataset
+EMBEDDING_CONFIG_KEYS = ['embeddingDimensions', 'embeddingQuantization', 'maxNgrams', 'precomputeWordVectors']
+
+
+def embedding_config(pipeline_definition):
+    default_cfg = pl.default_config(pipeline_definition)
+    return {key: default_cfg[key] for key in EMBEDDING_CONFIG_KEYS}
+
+
+def prepare_training_data(train_dataset, dataset_params, ngram_to_id_dictionary, pretrained_ngram_vectors, pipeline_definition, path):
+    # reuses the dataset already embedded at path by previous sweeps, unless it was embedded from other data.
+    # NOTE: the ngram vectors aren't hashed (they are large), they are identified by their dictionary
+    default_cfg = pl.default_config(pipeline_definition)
+    fingerprint = td.fingerprint(
+        train_dataset,
+        dataset_params,
+        ngram_to_id_dictionary,
+        embedding_config(pipeline_definition),
+    )
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        training_data = td.TrainingData.open(path)
+        if training_data.fingerprint == fingerprint:
+            return training_data
+        training_data.close()
+    embeddings_model = em.EmbeddingsModel(
+        ngram_to_id_dictionary,
+        dataset_params['maxWordsPerSentence'],
+        default_cfg['maxNgrams'],
+        default_cfg['embeddingDimensions'],
+        pl.get_tokenizer(dataset_params['language']),
+        None,
+        pretrained_ngram_vectors,
+        default_cfg['wordIdsCacheSize'],
+        default_cfg['precomputeWordVectors'],
+        quantization=default_cfg['embeddingQuantization'],
+    )
+    return td.TrainingData.prepare(train_dataset, embeddings_model, dataset_params, default_cfg, path, fingerprint)
+
+
+def prepare_trials_training_data(
+    definitions, train_dataset, dataset_params, ngram_to_id_dictionary, pretrained_ngram_vectors, output_path, logger):
+    # the path of the embedded training dataset of each trial, the trials with the same embedding config share it
+    training_data_paths = {}
+    trials_paths = []
+    for _, definition in definitions:
+        cfg = embedding_config(definition)
+        key = td.fingerprint(cfg)
+        if key not in training_data_paths:
+            logger(f'Embedding the training dataset with {cfg}')
+            training_data_paths[key] = prepare_training_data(
+                train_dataset, dataset_params, ngram_to_id_dictionary, pretrained_ngram_vectors, definition,
+                os.path.join(output_path, f'training_data_{key[:16]}')).path
+        trials_paths.append(training_data_paths[key])
+    return trials_paths
+
+
+def write_results(results, output_path):
+    with open(os.path.join(output_path, 'results.json'), 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    columns = sorted({key for result in results for key in result})
+    with open(os.path.join(output_path, 'results.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def run_sweep(
+    search_space,
+    train_dataset,
+    dataset_params,
+    ngram_to_id_dictionary,
+    pretrained_ngram_vectors,
+    output_path,
+    logger,
+    pipeline_definition=pl.default_pipeline_definition,
+    max_trials=None,
+    threads_per_trial=2,
+    parallel_trials=None,
+    min_trials_to_prune=3,
+):
+    # returns the results of the trials sorted by loss (the sum of the best validation loss of each model),
+    # they are also written to output_path as results.csv and results.json
+    os.makedirs(output_path, exist_ok=True)
+    definitions = trials_definitions(search_space, pipeline_definition, max_trials)
+    training_data_paths = prepare_trials_training_data(
+        definitions, train_dataset, dataset_params, ngram_to_id_dictionary, pretrained_ngram_vectors, output_path, logger)
+    parallel_trials = parallel_trials or max(os.cpu_count() // threads_per_trial, 1)
+    context = mp.get_context('spawn')
+    with context.Manager() as manager:
+        epoch_losses = manager.dict()
+        lock = manager.Lock()
+        with concurrent.futures.ProcessPoolExecutor(parallel_trials, context) as executor:
+            futures = {}
+            for trial_idx, (params, definition) in enumerate(definitions):
+                future = executor.submit(
+                    _run_trial,
+                    definition,
+                    dataset_params,
+                    training_data_paths[trial_idx],
+                    threads_per_trial,
+                    epoch_losses,
+                    lock,
+                    min_trials_to_prune,
+                )
+                futures[future] = (trial_idx, params)
+            results = []
+            for future in concurrent.futures.as_completed(futures):
+                trial_idx, params = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'status': 'failed', 'error': str(e), 'loss': None}
+                result.update(params)
+                result['trial'] = trial_idx
+                logger(f'Trial {trial_idx + 1} of {len(definitions)} {result["status"]} (loss: {result["loss"]}) {params}')
+                results.append(result)
+    results.sort(key=lambda r: math.inf if r['loss'] is None else r['loss'])
+    write_results(results, output_path)
+    return results
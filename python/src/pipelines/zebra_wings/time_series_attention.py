@@ -18,23 +18,33 @@ class TimeSeriesAttention(Layer):
 
     def build(self, input_shape):
         dimensions = input_shape[2]
-        timed = keras.models.Sequential(name='per_time_step')
-        timed.add(
-            keras.layers.Dense(dimensions, input_shape=(dimensions,), kernel_initializer='zeros', activation='softmax', name='att_dense1')
-        )
-        timed.add(keras.layers.Dense(dimensions, kernel_initializer='glorot_normal', activation='tanh', name='att_dense2'))
-        self.timed = keras.layers.TimeDistributed(timed, name='att_td')
-        self.timed.build(input_shape)
-        self.trainable_weights = self.timed.trainable_weights
-        self.non_trainable_weights = self.timed.non_trainable_weights
-        self.built = True
+        # NOTE: same weights (and order) as the per time step Sequential of two Dense layers
+        # (softmax then tanh) wrapped with TimeDistributed used before, so saved weights still load
+        self.kernel_1 = self.add_weight(
+            name='att_dense1/kernel', shape=(dimensions, dimensions), initializer='zeros')
+        self.bias_1 = self.add_weight(name='att_dense1/bias', shape=(dimensions,), initializer='zeros')
+        self.kernel_2 = self.add_weight(
+            name='att_dense2/kernel', shape=(dimensions, dimensions), initializer='glorot_normal')
+        self.bias_2 = self.add_weight(name='att_dense2/bias', shape=(dimensions,), initializer='zeros')
+        super(TimeSeriesAttention, self).build(input_shape)
 
-    def call(self, inputs):
-        encoded = self.timed(inputs)
-        self_attended = K.batch_dot(inputs, K.permute_dimensions(encoded, (0, 2, 1)))
+    def call(self, inputs, mask=None):
+        # both dense layers are applied to all the timesteps at once with a (batch, time, dims) tensordot
+        encoded = K.tanh(K.bias_add(K.dot(K.softmax(K.bias_add(K.dot(inputs, self.kernel_1), self.bias_1)), self.kernel_2), self.bias_2))
+        # self_attended[b, i, j] = inputs[b, i] . encoded[b, j], the batch_dot axes avoid transposing
+        self_attended = K.batch_dot(inputs, encoded, axes=[2, 2])
+        if mask is not None:
+            # padded timesteps can't be attended and don't contribute to the output
+            float_mask = K.cast(mask, K.floatx())
+            self_attended -= (1 - K.expand_dims(float_mask, 1)) * 1e9
         attention = K.softmax(self_attended)
-        attention = K.permute_dimensions(attention, (0, 2, 1))
-        return K.batch_dot(attention, inputs)
+        if mask is not None:
+            attention *= K.expand_dims(float_mask, 2)
+        # output[b, j] = sum over i of attention[b, i, j] * inputs[b, i]
+        return K.batch_dot(attention, inputs, axes=[1, 1])
+
+    def compute_mask(self, inputs, mask=None):
+        return mask
 
     def compute_output_shape(self, input_shape):
-        return input_shape
\ No newline at end of file
+        return input_shape
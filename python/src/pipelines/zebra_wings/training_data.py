@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import src.pipelines.zebra_wings.length_buckets as lb
+
+# Training dataset prepared once for both models: the sentences are embedded to a disk backed
+# np.memmap, along with the intents one hot encoded, the slot ids of each word padded to max words
+# and the length of each sentence (used for length bucketed batching).
+# The arrays are described at meta.json, so they can be opened again from other processes.
+# meta.json can also keep a fingerprint of what was embedded, to know when a kept dataset is stale.
+
+
+def fingerprint(*values):
+    # hash of json like values (numpy arrays included), the same values always have the same fingerprint
+    encoded = json.dumps(values, sort_keys=True, default=lambda v: v.tolist() if isinstance(v, np.ndarray) else str(v))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def open_array(path, name, shape, dtype, mode):
+    # NOTE: np.memmap can't map empty files, so the arrays of an empty dataset are kept in memory
+    if 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(os.path.join(path, f'{name}.dat'), dtype=dtype, mode=mode, shape=tuple(shape))
+
+
+class TrainingData:
+    @staticmethod
+    def prepare(train_dataset, embeddings_model, dataset_params, config, cache_path=None, fingerprint=None):
+        is_temporary = cache_path is None
+        path = tempfile.mkdtemp(prefix='aida_training_') if is_temporary else cache_path
+        os.makedirs(path, exist_ok=True)
+        train_x = train_dataset['trainX']
+        max_words = dataset_params['maxWordsPerSentence']
+        batch_size = config['batchSize']
+        shapes = {
+            'embedded': ((len(train_x), max_words, config['embeddingDimensions']), 'float32'),
+            'intents': ((len(train_x), len(dataset_params['intents'])), 'float32'),
+            'lengths': ((len(train_x),), 'int32'),
+        }
+        if 'trainY2' in train_dataset:
+            shapes['slots'] = ((len(train_x), max_words), 'int32')
+        try:
+            arrays = {name: open_array(path, name, shape, dtype, 'w+') for name, (shape, dtype) in shapes.items()}
+            for start in range(0, len(train_x), batch_size):
+                embedded = embeddings_model.embed(train_x[start:start + batch_size])
+                arrays['embedded'][start:start + batch_size] = embedded
+                arrays['lengths'][start:start + batch_size] = lb.sequence_lengths(embedded)
+            arrays['intents'][np.arange(len(train_x)), np.array(train_dataset['trainY'], dtype=np.int32)] = 1
+            if 'slots' in arrays:
+                for idx, words_slot_id in enumerate(train_dataset['trainY2']):
+                    arrays['slots'][idx, :len(words_slot_id)] = words_slot_id
+            for array in arrays.values():
+                if isinstance(array, np.memmap):
+                    array.flush()
+            meta = {name: {'shape': shape, 'dtype': dtype} for name, (shape, dtype) in shapes.items()}
+            if fingerprint is not None:
+                meta['fingerprint'] = fingerprint
+            with open(os.path.join(path, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+        except BaseException:
+            if is_temporary:
+                shutil.rmtree(path, ignore_errors=True)
+            raise
+        return TrainingData(path, is_temporary)
+
+    @staticmethod
+    def open(path):
+        return TrainingData(path)
+
+    def __init__(self, path, is_temporary=False):
+        self.path = path
+        self.__is_temporary = is_temporary
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.fingerprint = meta.pop('fingerprint', None)
+        self.__arrays = {name: open_array(path, name, tuple(m['shape']), m['dtype'], 'r') for name, m in meta.items()}
+
+    def __len__(self):
+        return self.embedded().shape[0]
+
+    def embedded(self):
+        return self.__arrays['embedded']
+
+    def intents(self):
+        return self.__arrays['intents']
+
+    def slots(self):
+        return self.__arrays['slots']
+
+    def lengths(self):
+        return self.__arrays['lengths']
+
+    def close(self):
+        self.__arrays = {}
+        # NOTE: only remove the files when they were created at a temporary directory
+        if self.__is_temporary:
+            shutil.rmtree(self.path, ignore_errors=True)
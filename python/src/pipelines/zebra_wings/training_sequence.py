@@ -0,0 +1,109 @@
+import math
+import keras
+import numpy as np
+from random import shuffle
+
+
+# keras Sequence that streams batches of the prepared training data, the examples are shuffled on every
+# epoch and batches are built by the model specific batch_builder(indices, timesteps). When the bucket
+# lengths (timesteps per example) are given, each batch only has examples of the same bucket.
+class TrainingSequence(keras.utils.Sequence):
+    def __init__(self, indices, batch_size, batch_builder, shuffle=True, bucket_lengths=None):
+        self.__indices = np.array(indices, dtype=np.int64)
+        self.__buckets = None if bucket_lengths is None else np.asarray(bucket_lengths)[self.__indices]
+        self.__batch_size = batch_size
+        self.__batch_builder = batch_builder
+        self.__shuffle = shuffle
+        self.__batches = self.__make_batches()
+
+    def __make_batches(self):
+        order = np.random.permutation(len(self.__indices)) if self.__shuffle else np.arange(len(self.__indices))
+        if self.__buckets is None:
+            groups = [(self.__indices[order], None)]
+        else:
+            groups = [(self.__indices[order[self.__buckets[order] == timesteps]], int(timesteps))
+                      for timesteps in np.unique(self.__buckets)]
+        batches = [
+            # NOTE: sorted indices make the reads of the memory mapped arrays sequential
+            (np.sort(group[start:start + self.__batch_size]), timesteps)
+            for group, timesteps in groups
+            for start in range(0, len(group), self.__batch_size)
+        ]
+        if self.__shuffle:
+            shuffle(batches)
+        return batches
+
+    def __len__(self):
+        return len(self.__batches)
+
+    def __getitem__(self, idx):
+        indices, timesteps = self.__batches[idx]
+        return self.__batch_builder(indices, timesteps)
+
+    def on_epoch_end(self):
+        self.__batches = self.__make_batches()
+
+
+# stops the training when both training and validation losses are below the threshold
+class LossThresholdStopping(keras.callbacks.Callback):
+    def __init__(self, threshold, logger):
+        super(LossThresholdStopping, self).__init__()
+        self.threshold = threshold
+        self.logger = logger
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        if (self.threshold > 0 and
+            logs.get('loss', math.inf) < self.threshold and
+                logs.get('val_loss', logs.get('loss', math.inf)) < self.threshold):
+            self.model.stop_training = True
+            self.logger(f'Enough accuracy reached! Ending training after epoch {epoch + 1}')
+            self.logger(
+                '==================================================================================================')
+
+
+def epoch_logger(logger, epochs):
+    def log_epoch(epoch, logs):
+        logger(f'Trained epoch {epoch + 1} of {epochs}')
+        logger(f'Training Loss: {logs.get("loss")} | Training Accuracy: {logs.get("acc")}')
+        if 'val_loss' in logs:
+            logger(f'Validation Loss: {logs.get("val_loss")} | Validation Accuracy: {logs.get("val_acc")}')
+        logger('==================================================================================================')
+    return keras.callbacks.LambdaCallback(on_epoch_end=log_epoch)
+
+
+def split_indices(num_examples, validation_split):
+    indices = np.random.permutation(num_examples)
+    num_validation = int(num_examples * validation_split)
+    return indices[num_validation:], indices[:num_validation]
+
+
+# trains the model with a single fit over the whole dataset, streaming the batches with
+# prefetching worker threads, using a held out validation set and early stopping
+def fit(model, batch_builder, num_examples, config, logger, callbacks=[], bucket_lengths=None):
+    train_indices, validation_indices = split_indices(num_examples, config['trainingValidationSplit'])
+    training = TrainingSequence(train_indices, config['trainingBatchSize'], batch_builder, True, bucket_lengths)
+    validation = None
+    if len(validation_indices):
+        validation = TrainingSequence(
+            validation_indices, config['trainingBatchSize'], batch_builder, False, bucket_lengths)
+    early_stopping = keras.callbacks.EarlyStopping(
+        monitor='val_loss' if validation is not None else 'loss',
+        patience=config['earlyStoppingPatience'],
+        restore_best_weights=True,
+    )
+    return model.fit_generator(
+        training,
+        epochs=config['epochs'],
+        verbose=0,
+        validation_data=validation,
+        callbacks=[
+            epoch_logger(logger, config['epochs']),
+            LossThresholdStopping(config['lossThresholdToStopTraining'], logger),
+            early_stopping,
+        ] + callbacks,
+        max_queue_size=config['trainingQueueSize'],
+        workers=config['trainingWorkers'],
+        use_multiprocessing=False,
+        shuffle=False,
+    )
@@ -0,0 +1,72 @@
+import re
+import numpy as np
+
+# Helpers to continue training the models of a pipeline when its dataset grows (incremental training).
+# New intents and slots can only be appended, so the outputs of the previous ones keep their meaning:
+# the output Dense layers get new columns for the new classes and keep the trained columns of the
+# previous ones, the rest of the weights are copied from the previous models.
+
+
+def validate_dataset_params(previous_params, dataset_params):
+    if dataset_params['language'] != previous_params['language']:
+        raise ValueError('The language of the dataset changed')
+    if dataset_params['maxWordsPerSentence'] != previous_params['maxWordsPerSentence']:
+        raise ValueError('The max words per sentence of the dataset changed')
+    if dataset_params['intents'][:len(previous_params['intents'])] != previous_params['intents']:
+        raise ValueError('New intents must be appended after the previous intents')
+    # NOTE: the ner model outputs follow the order of the slotsToId keys
+    previous_slots = list(previous_params['slotsToId'].items())
+    if list(dataset_params['slotsToId'].items())[:len(previous_slots)] != previous_slots:
+        raise ValueError('New slots must be appended after the previous slots, keeping their ids')
+
+
+def layer_signature(layer):
+    # NOTE: keras numbers the default layer names of each model built in a session (dense_1, dense_2...),
+    # so the number is not part of the signature
+    return type(layer).__name__, re.sub(r'_\d+$', '', layer.name)
+
+
+def validate_architecture(previous_model, model):
+    previous_layers = [layer_signature(layer) for layer in previous_model.layers]
+    layers = [layer_signature(layer) for layer in model.layers]
+    if previous_layers != layers:
+        raise ValueError(f'The architecture of the models changed, previous layers: {previous_layers}, layers: {layers}')
+    for previous_layer, layer in zip(previous_model.layers, model.layers):
+        if len(previous_layer.get_weights()) != len(layer.get_weights()):
+            raise ValueError(f'The weights of the layer {layer.name} changed')
+
+
+def transfer_weights(previous_model, model, num_previous_intents):
+    # both models must have the same architecture, model can have more intents (inputs) or classes (outputs)
+    validate_architecture(previous_model, model)
+    output_layer = model.layers[-1]
+    for previous_layer, layer in zip(previous_model.layers, model.layers):
+        weights = []
+        for previous, initialized in zip(previous_layer.get_weights(), layer.get_weights()):
+            if previous.shape == initialized.shape:
+                weights.append(previous)
+                continue
+            grown = initialized.copy()
+            if layer is output_layer:
+                # new classes are appended
+                grown[..., :previous.shape[-1]] = previous
+            else:
+                # NOTE: the ner recurrent encoder input starts with the intent one hot encoding,
+                # the rows of the new intents are inserted after the ones of the previous intents
+                num_new_intents = initialized.shape[0] - previous.shape[0]
+                grown[:num_previous_intents] = previous[:num_previous_intents]
+                grown[num_previous_intents + num_new_intents:] = previous[num_previous_intents:]
+            weights.append(grown)
+        layer.set_weights(weights)
+
+
+def with_replay(train_dataset, replay_dataset, num_replayed, seed=None):
+    # the new examples plus a random sample of num_replayed previous examples
+    if replay_dataset is None or num_replayed <= 0:
+        return train_dataset
+    num_replayed = min(num_replayed, len(replay_dataset['trainX']))
+    indices = np.random.RandomState(seed).choice(len(replay_dataset['trainX']), num_replayed, replace=False)
+    return {
+        key: list(values) + [replay_dataset[key][idx] for idx in indices]
+        for key, values in train_dataset.items() if key in replay_dataset
+    }
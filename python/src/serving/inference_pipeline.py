@@ -0,0 +1,146 @@
+import argparse
+import json
+import sys
+import numpy as np
+import src.pipelines.zebra_wings.pipeline_definition as pl
+import src.pipelines.zebra_wings.embeddings.embeddings_model as em
+import src.pipelines.zebra_wings.length_buckets as lb
+import src.pipelines.zebra_wings.models.ner_decoder as nd
+import src.pipelines.zebra_wings.numpy_models.classification as nc
+import src.pipelines.zebra_wings.numpy_models.layers_weights as lw
+import src.pipelines.zebra_wings.numpy_models.ner as nn
+import src.utils.ngram_vectors_utils as nvu
+import src.utils.metrics as mu
+
+# Prediction only version of AidaPipeline that runs with numpy: the precomputed word vectors embeddings
+# and the numpy engines of the classification and ner models. It doesn't use tensorflow, so it can be
+# shared with forked processes (see src.serving.process_pool). Only numpy is imported, so it starts fast.
+# It can also predict the sentences of stdin (one per line) as json lines, from the python directory:
+#   python -m src.serving.inference_pipeline --dataset-params dataset_params.json --classification models/classification
+#       --ner models/ner --ngram-vectors models/ngram_vectors < sentences.txt
+
+
+class InferencePipeline:
+    @staticmethod
+    def from_artifacts(
+        cfg, dataset_params, ngram_vectors_path, pipeline_definition=pl.default_pipeline_definition, metrics=mu.NOOP_METRICS):
+        # cfg has the classificationPath and nerPath used by AidaPipeline.save,
+        # the ngram vectors are saved with src.utils.ngram_vectors_utils and memory mapped
+        slots_length = len(dataset_params['slotsToId'].keys())
+        if slots_length >= 2 and not cfg.get('nerPath'):
+            raise ValueError('The dataset params have slots, the ner model path (nerPath) is required')
+        keys, ngram_vectors = nvu.load_ngram_vectors(ngram_vectors_path)
+        return InferencePipeline(
+            dataset_params,
+            nvu.keys_to_id_dictionary(keys),
+            ngram_vectors,
+            lw.LayersWeights.from_tfjs_artifacts(cfg['classificationPath']),
+            lw.LayersWeights.from_tfjs_artifacts(cfg['nerPath']) if slots_length >= 2 else None,
+            pipeline_definition,
+            metrics,
+        )
+
+    def __init__(
+        self,
+        dataset_params,
+        ngram_to_id_dictionary,
+        ngram_vectors,
+        classification_weights,
+        ner_weights=None,
+        pipeline_definition=pl.default_pipeline_definition,
+        metrics=mu.NOOP_METRICS,
+        word_vectors_table=None,
+        word_ids_cache=None,
+    ):
+        # word_vectors_table can be shared by the pipelines with the same ngram vectors and word_ids_cache by the ones
+        # with the same language and dictionary (see src.serving.tenant_manager)
+        default_cfg = pl.default_config(pipeline_definition)
+        self.__dataset_params = dataset_params
+        self.__metrics = metrics
+        self.__ner_config = pl.model_config(pipeline_definition, 'ner')
+        self.__embeddings_model = em.EmbeddingsModel(
+            ngram_to_id_dictionary,
+            dataset_params['maxWordsPerSentence'],
+            default_cfg['maxNgrams'],
+            default_cfg['embeddingDimensions'],
+            pl.get_tokenizer(dataset_params['language']),
+            None,
+            ngram_vectors,
+            default_cfg['wordIdsCacheSize'],
+            True,
+            word_vectors_table=word_vectors_table,
+            metrics=metrics,
+            quantization=default_cfg['embeddingQuantization'],
+            word_ids_cache=word_ids_cache,
+        )
+        self.__classification_engine = nc.ClassificationEngine(classification_weights)
+        # NOTE: only use the ner model if there are slots in the training params
+        self.__ner_engine = nn.NerEngine(ner_weights) if ner_weights is not None else None
+        self.__slot_names = nd.slot_names(dataset_params['slotsToId'])
+
+    def embeddings_model(self):
+        return self.__embeddings_model
+
+    def predict(self, sentences, backend='numpy'):
+        # same output as AidaPipeline.predict, backend is only accepted for compatibility
+        tokens = self.__embeddings_model.tokenize(sentences)
+        embedded_sentences = self.__embeddings_model.embed(sentences, tokens)
+        with self.__metrics.timer('classification_forward_seconds'):
+            output = self.__classification_engine.predict(embedded_sentences)
+        intents = self.__dataset_params['intents']
+        intent_indexes = output.argmax(axis=1)
+        classification = [
+            {'intent': intents[idx], 'confidence': s[idx], 'sentence': sentences[sidx]}
+            for sidx, (s, idx) in enumerate(zip(output, intent_indexes))
+        ]
+        ner = []
+        if self.__ner_engine is not None:
+            intent_labels = np.eye(len(intents), dtype=np.float32)[intent_indexes]
+            ner_output = self.__ner_output(intent_labels, embedded_sentences)
+            with self.__metrics.timer('ner_decode_seconds'):
+                ner = nd.decode(
+                    ner_output,
+                    sentences,
+                    tokens,
+                    self.__slot_names,
+                    self.__ner_config['lowConfidenceThreshold'],
+                )
+        return {'classification': classification, 'ner': ner}
+
+    def __ner_output(self, intent_labels, embedded_sentences):
+        # same length buckets as NerModel.bucketed_prediction
+        max_words = embedded_sentences.shape[1]
+        buckets = lb.bucket_lengths(
+            lb.sequence_lengths(embedded_sentences), self.__ner_config['lengthBuckets'], max_words)
+        output = np.zeros((len(embedded_sentences), max_words, len(self.__slot_names)), dtype=np.float32)
+        with self.__metrics.timer('ner_forward_seconds'):
+            for timesteps, indices in lb.group_by_bucket(buckets).items():
+                output[indices, :timesteps] = self.__ner_engine.predict(
+                    intent_labels[indices], embedded_sentences[indices, :timesteps])
+        return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Predicts the intent and slots of the sentences of stdin')
+    parser.add_argument('--dataset-params', required=True, help='path of dataset_params.json')
+    parser.add_argument('--classification', required=True, help='directory of the saved classification model')
+    parser.add_argument('--ner', help='directory of the saved ner model, required when the dataset params have slots')
+    parser.add_argument('--ngram-vectors', required=True, help='path of the ngram vectors saved with save_ngram_vectors')
+    parser.add_argument('--batch-size', type=int, default=256)
+    args = parser.parse_args()
+    with open(args.dataset_params) as f:
+        dataset_params = json.load(f)
+    if len(dataset_params['slotsToId'].keys()) >= 2 and args.ner is None:
+        parser.error('--ner is required when the dataset params have slots')
+    pipeline = InferencePipeline.from_artifacts(
+        {'classificationPath': args.classification, 'nerPath': args.ner}, dataset_params, args.ngram_vectors)
+    sentences = [line.rstrip('\n') for line in sys.stdin]
+    for start in range(0, len(sentences), args.batch_size):
+        prediction = pipeline.predict(sentences[start:start + args.batch_size])
+        ner = prediction['ner'] or [None] * len(prediction['classification'])
+        for classification, slots in zip(prediction['classification'], ner):
+            print(json.dumps({'classification': classification, 'ner': slots}, default=float))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import asyncio
+import collections
+import contextlib
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Collects the sentences of concurrent callers and runs a single AidaPipeline.predict for all of them,
+# predicting a batch of sentences costs about the same as predicting one with keras.
+# A batch is run when it reaches max_batch_size or when its first sentence waited max_wait_ms.
+# NOTE: the keras models are only used from the batcher thread, so predictions are never concurrent.
+
+_STOP = object()
+
+
+class MicroBatcher:
+    def __init__(self, pipeline, max_batch_size=32, max_wait_ms=5, backend='keras'):
+        self.__pipeline = pipeline
+        self.__max_batch_size = max_batch_size
+        self.__max_wait = max_wait_ms / 1000
+        self.__backend = backend
+        self.__graph = None
+        if backend == 'keras':
+            import tensorflow as tf
+            # NOTE: the tensorflow default graph is per thread, the keras models live in the one of the caller
+            self.__graph = tf.get_default_graph()
+        self.__queue = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__closed = False
+        self.__batch_sizes = collections.Counter()
+        self.__max_queue_depth = 0
+        self.__thread = threading.Thread(target=self.__run, name='micro-batcher', daemon=True)
+        self.__thread.start()
+
+    def submit(self, sentence):
+        # returns a concurrent.futures.Future with the same result as pipeline.predict([sentence])
+        future = Future()
+        with self.__lock:
+            if self.__closed:
+                raise RuntimeError('MicroBatcher is closed')
+            self.__queue.put((sentence, future))
+            self.__max_queue_depth = max(self.__max_queue_depth, self.__queue.qsize())
+        return future
+
+    def predict(self, sentence, timeout=None):
+        return self.submit(sentence).result(timeout)
+
+    async def predict_async(self, sentence):
+        return await asyncio.wrap_future(self.submit(sentence))
+
+    def queue_depth(self):
+        return self.__queue.qsize()
+
+    def stats(self):
+        with self.__lock:
+            batch_sizes = dict(self.__batch_sizes)
+            max_queue_depth = self.__max_queue_depth
+        batches = sum(batch_sizes.values())
+        sentences = sum(size * count for size, count in batch_sizes.items())
+        return {
+            'queueDepth': self.queue_depth(),
+            'maxQueueDepth': max_queue_depth,
+            'batches': batches,
+            'sentences': sentences,
+            'meanBatchSize': sentences / batches if batches else 0,
+            'batchSizes': batch_sizes,
+        }
+
+    def close(self):
+        # the sentences already submitted are still predicted
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+            self.__queue.put(_STOP)
+        self.__thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __run(self):
+        with self.__graph.as_default() if self.__graph is not None else contextlib.nullcontext():
+            stopping = False
+            while not stopping:
+                item = self.__queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.__max_wait
+                while len(batch) < self.__max_batch_size:
+                    try:
+                        item = self.__queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self.__predict_batch(batch)
+
+    def __predict_batch(self, batch):
+        # NOTE: futures cancelled by their callers are dropped from the batch
+        batch = [(sentence, future) for sentence, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        with self.__lock:
+            self.__batch_sizes[len(batch)] += 1
+        try:
+            prediction = self.__pipeline.predict([sentence for sentence, _ in batch], self.__backend)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        classification = prediction['classification']
+        ner = prediction['ner']
+        for i, (_, future) in enumerate(batch):
+            future.set_result({'classification': [classification[i]], 'ner': [ner[i]] if ner else []})
@@ -0,0 +1,149 @@
+import itertools
+import multiprocessing as mp
+import os
+import pickle
+import queue
+import threading
+import traceback
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+# Serves an InferencePipeline from several forked processes, to use all the cores of a box.
+# The parent process loads the pipeline once (memory mapped ngram vectors and the numpy weights of the models)
+# and forks the workers, so they share the memory of the pipeline copy on write instead of loading a copy each.
+# Each batch of sentences goes to the worker with the fewest pending batches.
+# NOTE: the pipeline must not use tensorflow, tensorflow doesn't support forking a process that already uses it.
+# When a worker dies, the pool is broken: the pending and new batches fail with BrokenProcessPool.
+
+# seconds waiting for results before checking that the workers are still alive
+LIVENESS_CHECK_SECONDS = 0.5
+
+
+def _picklable_error(error):
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(''.join(traceback.format_exception(type(error), error, error.__traceback__)))
+
+
+def _serve(pipeline, requests, results):
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, sentences = request
+        # NOTE: the results are pickled here, the queue pickles at a background thread that drops what it can't pickle
+        try:
+            result = pickle.dumps((request_id, pipeline.predict(sentences), None))
+        except Exception as e:
+            result = pickle.dumps((request_id, None, _picklable_error(e)))
+        results.put(result)
+
+
+class ProcessPool:
+    def __init__(self, pipeline, num_workers=None):
+        context = mp.get_context('fork')
+        num_workers = num_workers or os.cpu_count()
+        self.__results = context.Queue()
+        self.__requests = [context.Queue() for _ in range(num_workers)]
+        self.__workers = [
+            context.Process(target=_serve, args=(pipeline, requests, self.__results), daemon=True)
+            for requests in self.__requests
+        ]
+        for worker in self.__workers:
+            worker.start()
+        self.__lock = threading.Lock()
+        self.__ids = itertools.count()
+        # request id -> (future, worker index)
+        self.__pending = {}
+        self.__queue_depths = [0] * num_workers
+        self.__batches = [0] * num_workers
+        self.__closed = False
+        self.__broken = None
+        # NOTE: the thread is started after forking the workers, forking a process with running threads is unsafe
+        self.__collector = threading.Thread(target=self.__collect, name='process-pool-results', daemon=True)
+        self.__collector.start()
+
+    def submit(self, sentences):
+        # returns a concurrent.futures.Future with the result of pipeline.predict(sentences)
+        future = Future()
+        with self.__lock:
+            if self.__closed:
+                raise RuntimeError('ProcessPool is closed')
+            if self.__broken is not None:
+                raise BrokenProcessPool(self.__broken)
+            worker_idx = min(range(len(self.__workers)), key=self.__queue_depths.__getitem__)
+            request_id = next(self.__ids)
+            self.__pending[request_id] = (future, worker_idx)
+            self.__queue_depths[worker_idx] += 1
+            self.__batches[worker_idx] += 1
+        self.__requests[worker_idx].put((request_id, list(sentences)))
+        return future
+
+    def predict(self, sentences, backend='numpy'):
+        # same as InferencePipeline.predict, so the pool can be used behind a MicroBatcher
+        return self.submit(sentences).result()
+
+    def stats(self):
+        with self.__lock:
+            return {'queueDepths': list(self.__queue_depths), 'batches': list(self.__batches)}
+
+    def close(self):
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+        for requests in self.__requests:
+            requests.put(None)
+        for worker in self.__workers:
+            worker.join()
+        self.__results.put(None)
+        self.__collector.join()
+        # NOTE: the batches of workers that died while closing never get a result
+        with self.__lock:
+            pending = [future for future, _ in self.__pending.values()]
+            self.__pending.clear()
+        for future in pending:
+            future.set_exception(BrokenProcessPool('A worker exited before predicting the batch'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __collect(self):
+        while True:
+            try:
+                result = self.__results.get(timeout=LIVENESS_CHECK_SECONDS)
+            except queue.Empty:
+                self.__check_workers()
+                continue
+            if result is None:
+                break
+            request_id, prediction, error = pickle.loads(result)
+            with self.__lock:
+                # NOTE: the futures of a broken pool already failed
+                if request_id not in self.__pending:
+                    continue
+                future, worker_idx = self.__pending.pop(request_id)
+                self.__queue_depths[worker_idx] -= 1
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(prediction)
+
+    def __check_workers(self):
+        with self.__lock:
+            if self.__closed or self.__broken is not None:
+                return
+            dead = [worker for worker in self.__workers if not worker.is_alive()]
+            if not dead:
+                return
+            self.__broken = ', '.join(f'worker {worker.pid} exited with code {worker.exitcode}' for worker in dead)
+            pending = [future for future, _ in self.__pending.values()]
+            self.__pending.clear()
+            self.__queue_depths = [0] * len(self.__workers)
+        for future in pending:
+            future.set_exception(BrokenProcessPool(self.__broken))
@@ -0,0 +1,177 @@
+import collections
+import threading
+import src.pipelines.zebra_wings.pipeline_definition as pl
+import src.pipelines.zebra_wings.embeddings.word_vectors_table as wvt
+import src.pipelines.zebra_wings.numpy_models.layers_weights as lw
+import src.serving.inference_pipeline as ip
+import src.utils.lru_cache as lru
+import src.utils.ngram_vectors_utils as nvu
+import src.utils.metrics as mu
+
+# Serves the InferencePipeline of many tenants (each one with its own dataset params, classification and ner models)
+# from one process. The ngram vectors, the word vectors table and the word ids cache of each language are loaded once
+# and shared by all the tenants of the language, only the weights of the models are loaded per tenant, on the first
+# request of the tenant.
+# When the resident models exceed the memory budget, the least recently used tenants are unloaded, they are loaded
+# again on their next request.
+
+
+class TenantManager:
+    def __init__(
+        self,
+        ngram_vectors_paths,
+        memory_budget_bytes=1024 ** 3,
+        pipeline_definition=pl.default_pipeline_definition,
+        metrics=mu.NOOP_METRICS,
+    ):
+        # language -> path of the ngram vectors saved with src.utils.ngram_vectors_utils (memory mapped)
+        self.__ngram_vectors_paths = {language.lower(): path for language, path in ngram_vectors_paths.items()}
+        self.__memory_budget = memory_budget_bytes
+        self.__pipeline_definition = pipeline_definition
+        self.__metrics = metrics
+        self.__lock = threading.Lock()
+        self.__languages_lock = threading.Lock()
+        # tenant id -> (cfg, dataset params)
+        self.__tenants = {}
+        # language -> (ngram to id dictionary, ngram vectors, word vectors table, word ids cache)
+        self.__languages = {}
+        # tenant id -> (pipeline, bytes of the models weights), least recently used first
+        self.__resident = collections.OrderedDict()
+        self.__resident_bytes = 0
+        # tenant id -> lock held while the tenant is loaded, so concurrent requests only load it once
+        self.__loading = {}
+        self.__loads = 0
+        self.__evictions = 0
+
+    def register(self, tenant_id, cfg, dataset_params):
+        # cfg has the classificationPath and nerPath used by AidaPipeline.save, the models are loaded on the first request
+        if dataset_params['language'].lower() not in self.__ngram_vectors_paths:
+            raise ValueError(f'No ngram vectors for language: {dataset_params["language"]}')
+        with self.__lock:
+            self.__tenants[tenant_id] = (cfg, dataset_params)
+            # NOTE: registering a tenant again replaces its models
+            self.__unload(tenant_id)
+
+    def unregister(self, tenant_id):
+        with self.__lock:
+            self.__tenants.pop(tenant_id, None)
+            self.__unload(tenant_id)
+
+    def pipeline(self, tenant_id):
+        with self.__lock:
+            pipeline = self.__resident_pipeline(tenant_id)
+            if pipeline is not None:
+                return pipeline
+            if tenant_id not in self.__tenants:
+                raise KeyError(f'Unknown tenant: {tenant_id}')
+            loading = self.__loading.setdefault(tenant_id, threading.Lock())
+        with loading:
+            with self.__lock:
+                # NOTE: another request could have loaded the tenant while this one waited
+                pipeline = self.__resident_pipeline(tenant_id)
+                if pipeline is not None:
+                    return pipeline
+                if tenant_id not in self.__tenants:
+                    raise KeyError(f'Unknown tenant: {tenant_id}')
+                registration = self.__tenants[tenant_id]
+            try:
+                with self.__metrics.timer('tenant_load_seconds'):
+                    pipeline, size = self.__load(*registration)
+            except BaseException:
+                with self.__lock:
+                    self.__loading_done(tenant_id, loading)
+                raise
+            # NOTE: the tenant is resident before its loading lock is released, so new requests don't load it again
+            with self.__lock:
+                self.__loading_done(tenant_id, loading)
+                self.__loads += 1
+                self.__metrics.increment('tenant_loads')
+                # NOTE: don't keep the models if the tenant was registered again or unregistered while loading
+                if self.__tenants.get(tenant_id) is registration:
+                    self.__unload(tenant_id)
+                    self.__resident[tenant_id] = (pipeline, size)
+                    self.__resident_bytes += size
+                    self.__evict()
+                    self.__record_residency()
+        return pipeline
+
+    def predict(self, tenant_id, sentences, backend='numpy'):
+        return self.pipeline(tenant_id).predict(sentences, backend)
+
+    def stats(self):
+        with self.__lock:
+            stats = {
+                'registeredTenants': len(self.__tenants),
+                'residentTenants': len(self.__resident),
+                'residentBytes': self.__resident_bytes,
+                'memoryBudgetBytes': self.__memory_budget,
+                'loads': self.__loads,
+                'evictions': self.__evictions,
+            }
+        with self.__languages_lock:
+            stats['wordVectors'] = {language: table.cache_stats() for language, (_, _, table, _) in self.__languages.items()}
+            stats['wordIds'] = {language: cache.stats() for language, (_, _, _, cache) in self.__languages.items()}
+        return stats
+
+    def __resident_pipeline(self, tenant_id):
+        if tenant_id not in self.__resident:
+            return None
+        self.__resident.move_to_end(tenant_id)
+        return self.__resident[tenant_id][0]
+
+    def __load(self, cfg, dataset_params):
+        ngram_to_id_dictionary, ngram_vectors, word_vectors_table, word_ids_cache = self.__language(dataset_params['language'])
+        classification_weights = lw.LayersWeights.from_tfjs_artifacts(cfg['classificationPath'])
+        # NOTE: only use the ner model if there are slots in the training params
+        slots_length = len(dataset_params['slotsToId'].keys())
+        ner_weights = lw.LayersWeights.from_tfjs_artifacts(cfg['nerPath']) if slots_length >= 2 else None
+        pipeline = ip.InferencePipeline(
+            dataset_params,
+            ngram_to_id_dictionary,
+            ngram_vectors,
+            classification_weights,
+            ner_weights,
+            self.__pipeline_definition,
+            self.__metrics,
+            word_vectors_table,
+            word_ids_cache,
+        )
+        size = classification_weights.nbytes() + (ner_weights.nbytes() if ner_weights is not None else 0)
+        return pipeline, size
+
+    def __loading_done(self, tenant_id, loading):
+        # NOTE: a newer loading lock can replace this one when the tenant was unloaded while waiting for it
+        if self.__loading.get(tenant_id) is loading:
+            del self.__loading[tenant_id]
+
+    def __language(self, language):
+        language = language.lower()
+        with self.__languages_lock:
+            if language not in self.__languages:
+                keys, ngram_vectors = nvu.load_ngram_vectors(self.__ngram_vectors_paths[language])
+                cache_size = pl.default_config(self.__pipeline_definition)['wordIdsCacheSize']
+                self.__languages[language] = (
+                    nvu.keys_to_id_dictionary(keys),
+                    ngram_vectors,
+                    wvt.WordVectorsTable(ngram_vectors, cache_size),
+                    lru.LRUCache(cache_size),
+                )
+            return self.__languages[language]
+
+    def __unload(self, tenant_id):
+        if tenant_id in self.__resident:
+            _, size = self.__resident.pop(tenant_id)
+            self.__resident_bytes -= size
+            self.__record_residency()
+
+    def __evict(self):
+        # the most recently used tenant always stays resident, even if its models alone exceed the budget
+        while self.__resident_bytes > self.__memory_budget and len(self.__resident) > 1:
+            _, (_, size) = self.__resident.popitem(last=False)
+            self.__resident_bytes -= size
+            self.__evictions += 1
+            self.__metrics.increment('tenant_evictions')
+
+    def __record_residency(self):
+        self.__metrics.gauge('tenants_resident', len(self.__resident))
+        self.__metrics.gauge('tenants_resident_bytes', self.__resident_bytes)
@@ -1,8 +1,5 @@
 import keras
 import numpy as np
-import matplotlib.pyplot as plt
-
-import pdb
 
 def visualize_layer_output(layer_name, m, inputs, file_name=None):
     intermediate_layer_model = keras.models.Model(inputs=m.input, outputs=m.get_layer(layer_name).output)
@@ -10,6 +7,8 @@ def visualize_layer_output(layer_name, m, inputs, file_name=None):
     visualize(intermediate_output, file_name)
 
 def visualize(inputs, file_name=None):
+    # NOTE: matplotlib is slow to import and only used for debugging
+    import matplotlib.pyplot as plt
     print ('Shape of squeezed:', inputs.shape)
     if (len(inputs.shape) == 2):
         inp = np.expand_dims(inputs, axis=0)
@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+
+# size bounded least recently used cache, keeps hit/miss/eviction counters so the
+# cache effectiveness can be monitored. A capacity of 0 disables the cache.
+# NOTE: the cache is shared by the threads that predict with the same pipeline, so every access holds the lock
+class LRUCache:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__items = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __contains__(self, key):
+        return key in self.__items
+
+    def get(self, key, default=None):
+        with self.__lock:
+            try:
+                self.__items.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return self.__items[key]
+
+    def put(self, key, value):
+        if self.capacity <= 0:
+            return
+        with self.__lock:
+            self.__items[key] = value
+            self.__items.move_to_end(key)
+            if len(self.__items) > self.capacity:
+                self.__items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
+
+    def stats(self):
+        with self.__lock:
+            return {
+                'capacity': self.capacity,
+                'size': len(self.__items),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
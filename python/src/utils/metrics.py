@@ -0,0 +1,127 @@
+import bisect
+import math
+import threading
+import time
+
+# Metrics sinks for the pipeline instrumentation: counters, gauges and histograms (timers observe seconds).
+# NoopMetrics is the default and does nothing, InMemoryMetrics keeps the values and exports them with the
+# prometheus text format, other sinks (statsd, opentelemetry, ...) only need the same methods.
+
+SECONDS_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, math.inf)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, math.inf)
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class NoopMetrics:
+    enabled = False
+
+    def increment(self, name, value=1):
+        pass
+
+    def gauge(self, name, value):
+        pass
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS):
+        pass
+
+    def timer(self, name):
+        return _NOOP_TIMER
+
+
+_NOOP_TIMER = _NoopTimer()
+NOOP_METRICS = NoopMetrics()
+
+
+class _Timer:
+    def __init__(self, metrics, name):
+        self.__metrics = metrics
+        self.__name = name
+        self.__start = None
+
+    def __enter__(self):
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.__metrics.observe(self.__name, time.perf_counter() - self.__start)
+
+
+class InMemoryMetrics:
+    enabled = True
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__counters = {}
+        self.__gauges = {}
+        # name -> {'buckets', 'counts' (per bucket, not cumulative), 'sum', 'count'}
+        self.__histograms = {}
+
+    def increment(self, name, value=1):
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        with self.__lock:
+            self.__gauges[name] = value
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS):
+        with self.__lock:
+            histogram = self.__histograms.get(name)
+            if histogram is None:
+                histogram = {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0, 'count': 0}
+                self.__histograms[name] = histogram
+            histogram['counts'][bisect.bisect_left(histogram['buckets'], value)] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def timer(self, name):
+        return _Timer(self, name)
+
+    def snapshot(self):
+        with self.__lock:
+            return {
+                'counters': dict(self.__counters),
+                'gauges': dict(self.__gauges),
+                'histograms': {
+                    name: {'sum': h['sum'], 'count': h['count'], 'buckets': dict(zip(h['buckets'], h['counts']))}
+                    for name, h in self.__histograms.items()
+                },
+            }
+
+    def reset(self):
+        with self.__lock:
+            self.__counters.clear()
+            self.__gauges.clear()
+            self.__histograms.clear()
+
+    def prometheus_text(self, prefix='aida_'):
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            lines += [f'# TYPE {prefix}{name} counter', f'{prefix}{name} {value}']
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines += [f'# TYPE {prefix}{name} gauge', f'{prefix}{name} {value}']
+        for name, histogram in sorted(snapshot['histograms'].items()):
+            lines.append(f'# TYPE {prefix}{name} histogram')
+            cumulative = 0
+            for bucket, count in histogram['buckets'].items():
+                cumulative += count
+                le = '+Inf' if bucket == math.inf else bucket
+                lines.append(f'{prefix}{name}_bucket{{le="{le}"}} {cumulative}')
+            lines += [f'{prefix}{name}_sum {histogram["sum"]}', f'{prefix}{name}_count {histogram["count"]}']
+        return '\n'.join(lines) + '\n'
+
+
+def record_cache_stats(metrics, cache_stats):
+    # cache_stats like EmbeddingsModel.cache_stats(), {'wordIds': {'hits': ..., ...}, 'wordVectors': {...}}
+    names = {'wordIds': 'word_ids_cache', 'wordVectors': 'word_vectors_cache'}
+    for cache, stats in cache_stats.items():
+        for key, value in stats.items():
+            metrics.gauge(f'{names.get(cache, cache)}_{key}', value)
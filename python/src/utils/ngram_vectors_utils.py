@@ -0,0 +1,101 @@
+import json
+import os
+import numpy as np
+
+# Binary format for the pretrained ngram vectors (dictionary.json), made of two files:
+#   - <path>.npy: float32 matrix of (number of ngrams, embedding dimensions), rows in dictionary order
+#   - <path>.keys.json: list of ngram keys, the index of each key is the row of its vector
+# The matrix is opened with np.memmap, so all the processes loading it share the same page cached copy.
+# Optionally the matrix is stored quantized as float16, or as int8 with a per row scale saved at <path>.scales.npy
+
+QUANTIZATIONS = ['float16', 'int8']
+
+
+# quantized ngram vectors matrix, rows are dequantized to float32 at lookup time
+class QuantizedNgramVectors:
+    def __init__(self, values, scales=None):
+        self.values = values
+        self.scales = scales
+        self.shape = values.shape
+        self.quantization = 'int8' if scales is not None else str(values.dtype)
+        self.nbytes = values.nbytes + (scales.nbytes if scales is not None else 0)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, ids):
+        vectors = self.values[ids].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[ids][..., None]
+        return vectors
+
+    def dequantize(self):
+        return self[:]
+
+
+def ngram_vectors_matrix(pretrained_ngram_vectors, dtype='float32'):
+    # NOTE: the vectors can already be a matrix (e.g. memory mapped with save_ngram_vectors)
+    if isinstance(pretrained_ngram_vectors, QuantizedNgramVectors):
+        return pretrained_ngram_vectors.dequantize().astype(dtype)
+    if isinstance(pretrained_ngram_vectors, np.ndarray):
+        return np.asarray(pretrained_ngram_vectors, dtype)
+    #  pretrained_ngram_vectors is like [['__', [0, ... ]]], so we only extract the vectors with index order
+    return np.array([x[1] for x in pretrained_ngram_vectors], dtype)
+
+
+def quantize_ngram_vectors(matrix, quantization):
+    if quantization == 'float16':
+        return QuantizedNgramVectors(matrix.astype(np.float16))
+    elif quantization == 'int8':
+        scales = np.abs(matrix).max(axis=1) / 127
+        scales[scales == 0] = 1
+        values = np.round(matrix / scales[:, None]).astype(np.int8)
+        return QuantizedNgramVectors(values, scales.astype(np.float32))
+    raise ValueError(f'Unknown quantization {quantization}, valid values are {QUANTIZATIONS}')
+
+
+def matrix_path(path):
+    return f'{path}.npy'
+
+
+def scales_path(path):
+    return f'{path}.scales.npy'
+
+
+def keys_path(path):
+    return f'{path}.keys.json'
+
+
+def save_ngram_vectors(pretrained_ngram_vectors, path, quantization=None):
+    #  pretrained_ngram_vectors is like [['__', [0, ... ]]]
+    keys = [x[0] for x in pretrained_ngram_vectors]
+    matrix = np.array([x[1] for x in pretrained_ngram_vectors], dtype=np.float32)
+    if quantization:
+        quantized = quantize_ngram_vectors(matrix, quantization)
+        np.save(matrix_path(path), quantized.values)
+        if quantized.scales is not None:
+            np.save(scales_path(path), quantized.scales)
+    else:
+        np.save(matrix_path(path), matrix)
+    with open(keys_path(path), 'w') as f:
+        json.dump(keys, f)
+
+
+def convert_dictionary_json(dictionary_json_path, path, quantization=None):
+    with open(dictionary_json_path) as f:
+        save_ngram_vectors(json.load(f), path, quantization)
+
+
+def load_ngram_vectors(path, mmap_mode='r'):
+    with open(keys_path(path)) as f:
+        keys = json.load(f)
+    matrix = np.load(matrix_path(path), mmap_mode=mmap_mode)
+    if os.path.exists(scales_path(path)):
+        return keys, QuantizedNgramVectors(matrix, np.load(scales_path(path), mmap_mode=mmap_mode))
+    elif matrix.dtype == np.float16:
+        return keys, QuantizedNgramVectors(matrix)
+    return keys, matrix
+
+
+def keys_to_id_dictionary(keys):
+    return {key: idx for idx, key in enumerate(keys)}
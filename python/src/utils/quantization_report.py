@@ -0,0 +1,48 @@
+import copy
+import src.pipelines.zebra_wings.pipeline_definition as pl
+import src.utils.ngram_vectors_utils as nvu
+
+# sentence counts of the ClassificationModel.test and NerModel.test stats, the other keys are scores
+STATS_COUNTS = ('correct', 'wrong', 'lowConfidence')
+
+
+def stats_accuracy(stats):
+    total = sum(stats.get(key, 0) for key in STATS_COUNTS)
+    return stats['correct'] / total if total else 0
+
+
+# evaluates trained classification and ner models with the float32 ngram vectors and with each
+# quantization, reporting the memory used by the ngram vectors and the accuracy delta against float32
+def quantization_accuracy_report(
+    dataset_params,
+    ngram_to_id_dictionary,
+    pretrained_ngram_vectors,
+    test_dataset,
+    pretrained_classifier,
+    pretrained_ner,
+    quantizations=nvu.QUANTIZATIONS,
+    logger=lambda *args: None,
+    pipeline_definition=pl.default_pipeline_definition,
+):
+    # NOTE: keras is only imported when the report runs, stats_accuracy doesn't need it
+    import src.pipelines.zebra_wings.pipeline as pp
+    definition = copy.deepcopy(pipeline_definition)
+    definition['config']['default']['precomputeWordVectors'] = True
+    matrix = nvu.ngram_vectors_matrix(pretrained_ngram_vectors)
+    report = {}
+    for quantization in ['float32'] + list(quantizations):
+        vectors = matrix if quantization == 'float32' else nvu.quantize_ngram_vectors(matrix, quantization)
+        pipeline = pp.AidaPipeline(
+            dataset_params, logger, ngram_to_id_dictionary, pretrained_classifier, pretrained_ner, None, vectors, definition,
+        )
+        stats = pipeline.test(test_dataset)
+        report[quantization] = {
+            'bytes': vectors.nbytes,
+            'classificationAccuracy': stats_accuracy(stats['classificationStats']),
+            'nerAccuracy': stats_accuracy(stats['nerStats']),
+        }
+    for quantization in quantizations:
+        report[quantization]['classificationAccuracyDelta'] = (
+            report[quantization]['classificationAccuracy'] - report['float32']['classificationAccuracy'])
+        report[quantization]['nerAccuracyDelta'] = report[quantization]['nerAccuracy'] - report['float32']['nerAccuracy']
+    return report
@@ -0,0 +1,95 @@
+import copy
+import json
+import os
+import string
+import numpy as np
+import src.pipelines.zebra_wings.pipeline_definition as pl
+
+# Small pipelines for the tests: a few dimensions and filters, so the models build and run fast.
+
+SENTENCES = ['hello there', 'what time is it', 'bye', 'call me at nine tomorrow please']
+
+
+def pipeline_definition():
+    definition = copy.deepcopy(pl.default_pipeline_definition)
+    definition['config']['default'].update({'embeddingDimensions': 8, 'maxNgrams': 8})
+    definition['config']['classification'].update({'numFilters': 4, 'filterSizes': [1, 2, 3]})
+    definition['config']['ner'].update({'numFilters': [4, 4], 'rnnUnits': 3})
+    return definition
+
+
+def dataset_params():
+    return {
+        'language': 'en',
+        'maxWordsPerSentence': 6,
+        'intents': ['greet', 'bye', 'ask'],
+        'slotsToId': {'O': 0, 'name': 1, 'time': 2},
+    }
+
+
+def ngram_vectors(dimensions=8, seed=0):
+    # like the pretrained ngram vectors, [['__', [0, ...]], ...] in id order with the zero vector first
+    keys = ['__'] + list(string.ascii_lowercase + string.digits) + ['he', 'el', 'll', 'lo', 'hello', 'time']
+    vectors = np.random.RandomState(seed).randn(len(keys), dimensions)
+    vectors[0] = 0
+    return [[key, vector.tolist()] for key, vector in zip(keys, vectors)]
+
+
+def ngram_to_id_dictionary(vectors):
+    return {key: idx for idx, (key, _) in enumerate(vectors)}
+
+
+def random_weights(model, seed=0):
+    rng = np.random.RandomState(seed)
+    model.set_weights([rng.uniform(-0.5, 0.5, w.shape).astype(np.float32) for w in model.get_weights()])
+
+
+def padded_sentences(lengths, max_words, dimensions, seed=0):
+    # random embedded sentences of the given lengths, padded with zero vectors like the embeddings model
+    x = np.random.RandomState(seed).randn(len(lengths), max_words, dimensions).astype(np.float32)
+    x[np.arange(max_words)[None, :] >= np.asarray(lengths)[:, None]] = 0
+    return x
+
+
+def write_tfjs_artifacts(path, model_config, layers):
+    # writes a model.json and a weights shard like tensorflowjs, layers are (layer name, [weights])
+    os.makedirs(path, exist_ok=True)
+    weights = [(f'{name}/weight_{i}', np.asarray(w, dtype=np.float32)) for name, ws in layers for i, w in enumerate(ws)]
+    with open(os.path.join(path, 'group1-shard1of1'), 'wb') as f:
+        f.write(b''.join(w.tobytes() for _, w in weights))
+    with open(os.path.join(path, 'model.json'), 'w') as f:
+        json.dump({
+            'modelTopology': {'model_config': model_config},
+            'weightsManifest': [{
+                'paths': ['group1-shard1of1'],
+                'weights': [{'name': name, 'shape': list(w.shape), 'dtype': 'float32'} for name, w in weights],
+            }],
+        }, f)
+
+
+def write_numpy_pipeline_artifacts(path, dataset_params, dimensions=8, filters=3, rnn_units=4, seed=0):
+    # random weights for the classification and ner artifacts, with the layers used by the numpy engines
+    rng = np.random.RandomState(seed)
+    num_intents = len(dataset_params['intents'])
+    num_slots = len(dataset_params['slotsToId'])
+    classification = [(f'classConv{i + 1}', [rng.randn(size, dimensions, filters), rng.randn(filters)]) for i, size in enumerate([1, 2, 3])]
+    classification.append(('dense_1', [rng.randn(4 * filters, num_intents), rng.randn(num_intents)]))
+    lstm_inputs = num_intents + dimensions + filters
+    lstm_weights = [rng.randn(lstm_inputs, 4 * rnn_units), rng.randn(rnn_units, 4 * rnn_units), rng.randn(4 * rnn_units)]
+    ner = [
+        ('nerConv1', [rng.randn(1, dimensions, filters), rng.randn(filters)]),
+        ('nerConv2', [rng.randn(1, filters, filters), rng.randn(filters)]),
+        ('bidi_encoder', lstm_weights * 2),
+        ('attention_weight', [rng.randn(rnn_units, rnn_units), rng.randn(rnn_units)] * 2),
+        ('dense_2', [rng.randn(3 * rnn_units, num_slots), rng.randn(num_slots)]),
+    ]
+    class_names = {'bidi_encoder': 'Bidirectional', 'attention_weight': 'TimeSeriesAttention'}
+    lstm_config = {'layer': {'config': {'activation': 'tanh', 'recurrent_activation': 'hard_sigmoid'}}}
+    cfg = {'classificationPath': os.path.join(path, 'classification'), 'nerPath': os.path.join(path, 'ner')}
+    for model_path, layers in [(cfg['classificationPath'], classification), (cfg['nerPath'], ner)]:
+        model_config = {'class_name': 'Model', 'config': {'layers': [{
+            'class_name': class_names.get(name, 'Dense' if name.startswith('dense') else 'Conv1D'),
+            'config': dict(lstm_config if name == 'bidi_encoder' else {}, name=name),
+        } for name, _ in layers]}}
+        write_tfjs_artifacts(model_path, model_config, layers)
+    return cfg
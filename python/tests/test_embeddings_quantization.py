@@ -0,0 +1,37 @@
+import json
+import numpy as np
+import pytest
+import src.languages.tokenizer_registry as tr
+import src.pipelines.zebra_wings.embeddings.embeddings_model as em
+import src.utils.ngram_vectors_utils as nvu
+
+
+def embeddings_model(ngram_vectors, quantization):
+    dictionary = {'__': 0, 'h': 1, 'i': 2, 'hi': 3}
+    return em.EmbeddingsModel(
+        dictionary, 4, 3, ngram_vectors.shape[1], tr.get_tokenizer('en'), None, ngram_vectors, 100, True,
+        quantization=quantization)
+
+
+def test_precomputed_word_vectors_use_the_quantized_ngram_vectors():
+    ngram_vectors = np.random.RandomState(0).randn(4, 8).astype(np.float32)
+    ngram_vectors[0] = 0
+    quantized = embeddings_model(nvu.quantize_ngram_vectors(ngram_vectors, 'int8'), None).embed(['hi ih'])
+    np.testing.assert_array_equal(embeddings_model(ngram_vectors, 'int8').embed(['hi ih']), quantized)
+    assert not np.array_equal(embeddings_model(ngram_vectors, None).embed(['hi ih']), quantized)
+
+
+def test_initializer_config_is_serializable():
+    pytest.importorskip('keras')
+    import src.pipelines.zebra_wings.embeddings.presaved_embeddings_initializer as pei
+    initializer = pei.PreSavedEmbeddingsInitializer(np.ones((4, 8)), 'float16')
+    config = json.loads(json.dumps(initializer.get_config()))
+    assert pei.PreSavedEmbeddingsInitializer.from_config(config).quantization == 'float16'
+
+
+def test_unknown_embedding_quantization_raises():
+    pytest.importorskip('keras')
+    import src.pipelines.zebra_wings.pipeline as pp
+    assert pp.embedding_quantization_dtype('int8') == np.uint8
+    with pytest.raises(ValueError, match='float16'):
+        pp.embedding_quantization_dtype('int4')
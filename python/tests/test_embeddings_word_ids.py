@@ -0,0 +1,43 @@
+import numpy as np
+import src.languages.tokenizer_registry as tr
+import src.pipelines.zebra_wings.embeddings.embeddings_model as em
+
+DICTIONARY = {'__': 0, 'h': 1, 'e': 2, 'l': 3, 'o': 4, 'he': 5, 'el': 6, 'll': 7, 'lo': 8, 'hello': 9, 'x': 10, '?': 11}
+SENTENCES = [
+    'hello hell', # dictionary word and word made of bigrams
+    'helo hex', # missing bigram, falls back to the characters
+    'lllllllllll ?', # more ngrams than max ngrams
+    '',
+    'hell hello hell', # repeated words, served from the cache
+]
+MAX_WORDS = 4
+MAX_NGRAMS = 6
+
+
+def baseline_sentence_to_word_ids(tokenizer, sentences):
+    # EmbeddingsModel.sentence_to_word_ids before it was vectorized, word by word
+    buffer = np.zeros((len(sentences), MAX_WORDS, MAX_NGRAMS), dtype=np.int32)
+    for si, sentence in enumerate(sentences):
+        for wi, word in enumerate(tokenizer.split_sentence_to_words(sentence)):
+            if word in DICTIONARY:
+                buffer[si, wi, 0] = DICTIONARY[word]
+                continue
+            grams = []
+            bigrams = tokenizer.split_word_to_bigrams(word)
+            if len(word) > 2 and all(bigram in DICTIONARY for bigram in bigrams):
+                grams = [DICTIONARY[bigram] for bigram in bigrams]
+            else:
+                grams = [DICTIONARY[char] for char in word if char in DICTIONARY]
+            for gi, gram in enumerate(grams[:MAX_NGRAMS]):
+                buffer[si, wi, gi] = gram
+    return buffer
+
+
+def test_sentence_to_word_ids_matches_the_baseline():
+    tokenizer = tr.get_tokenizer('en')
+    model = em.EmbeddingsModel(DICTIONARY, MAX_WORDS, MAX_NGRAMS, 8, tokenizer, word_ids_cache_size=2)
+    expected = baseline_sentence_to_word_ids(tokenizer, SENTENCES)
+    np.testing.assert_array_equal(expected[0, :2], [[9, 0, 0, 0, 0, 0], [5, 6, 7, 0, 0, 0]])
+    for _ in range(2):
+        np.testing.assert_array_equal(model.sentence_to_word_ids(SENTENCES), expected)
+    np.testing.assert_array_equal(model.sentence_to_word_ids(SENTENCES, model.tokenize(SENTENCES)), expected)
@@ -0,0 +1,48 @@
+import json
+import subprocess
+import sys
+import pytest
+import src.pipelines.zebra_wings.pipeline_definition as pl
+import src.serving.inference_pipeline as ip
+import src.utils.ngram_vectors_utils as nvu
+import tests.fixtures as fx
+
+PYTHON_DIRECTORY = __file__.rsplit('/tests/', 1)[0]
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    dataset_params = fx.dataset_params()
+    # NOTE: the cli uses the default pipeline definition, with its embedding dimensions
+    dimensions = pl.default_pipeline_definition['config']['default']['embeddingDimensions']
+    cfg = fx.write_numpy_pipeline_artifacts(str(tmp_path), dataset_params, dimensions)
+    nvu.save_ngram_vectors(fx.ngram_vectors(dimensions), str(tmp_path / 'vectors'))
+    with open(str(tmp_path / 'dataset_params.json'), 'w') as f:
+        json.dump(dataset_params, f)
+    return cfg, dataset_params, tmp_path
+
+
+def run_cli(tmp_path, *args, sentences=''):
+    command = [
+        sys.executable, '-m', 'src.serving.inference_pipeline', '--dataset-params', str(tmp_path / 'dataset_params.json'),
+        '--ngram-vectors', str(tmp_path / 'vectors'), *args,
+    ]
+    return subprocess.run(command, input=sentences, capture_output=True, text=True, cwd=PYTHON_DIRECTORY, timeout=60)
+
+
+def test_the_ner_path_is_required_with_slots(artifacts):
+    cfg, dataset_params, tmp_path = artifacts
+    with pytest.raises(ValueError, match='nerPath'):
+        ip.InferencePipeline.from_artifacts({'classificationPath': cfg['classificationPath']}, dataset_params, str(tmp_path / 'vectors'))
+    result = run_cli(tmp_path, '--classification', cfg['classificationPath'])
+    assert result.returncode == 2
+    assert '--ner is required' in result.stderr
+
+
+def test_cli_predicts_the_sentences_of_stdin(artifacts):
+    cfg, _, tmp_path = artifacts
+    result = run_cli(tmp_path, '--classification', cfg['classificationPath'], '--ner', cfg['nerPath'], sentences='hello there\nbye\n')
+    assert result.returncode == 0, result.stderr
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [line['classification']['sentence'] for line in lines] == ['hello there', 'bye']
+    assert [line['ner']['sentence'] for line in lines] == ['hello there', 'bye']
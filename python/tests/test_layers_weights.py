@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import src.pipelines.zebra_wings.numpy_models.layers_weights as lw
+import tests.fixtures as fx
+
+LAYERS = [('dense_1', [np.ones((2, 3)), np.zeros(3)]), ('dense_10', [np.full((3, 1), 2.)])]
+
+
+def layer_configs():
+    return [{'class_name': 'Dense', 'config': {'name': name}} for name, _ in LAYERS]
+
+
+@pytest.mark.parametrize('model_config', [
+    # keras 2.2.4 Sequential models
+    {'class_name': 'Sequential', 'config': layer_configs()},
+    {'class_name': 'Model', 'config': {'name': 'model_1', 'layers': layer_configs()}},
+])
+def test_from_tfjs_artifacts_reads_the_layers_of_both_topologies(tmp_path, model_config):
+    fx.write_tfjs_artifacts(str(tmp_path), model_config, LAYERS)
+    layers_weights = lw.LayersWeights.from_tfjs_artifacts(str(tmp_path))
+    assert [layer['name'] for layer in layers_weights.layers] == ['dense_1', 'dense_10']
+    for name, weights in LAYERS:
+        loaded = layers_weights.layer(name)['weights']
+        assert len(loaded) == len(weights)
+        for expected, actual in zip(weights, loaded):
+            np.testing.assert_array_equal(actual, expected)
+
+
+def test_save_and_load_keep_the_predictions(tmp_path):
+    pytest.importorskip('keras')
+    pytest.importorskip('tensorflowjs')
+    import src.pipelines.zebra_wings.pipeline as pp
+    definition = fx.pipeline_definition()
+    dataset_params = fx.dataset_params()
+    vectors = fx.ngram_vectors()
+    dictionary = fx.ngram_to_id_dictionary(vectors)
+    logger = lambda *args: None
+    pipeline = pp.AidaPipeline(dataset_params, logger, dictionary, None, None, None, vectors, definition)
+    for name in ['classification', 'ner']:
+        fx.random_weights(pipeline.models()[name].keras_model())
+    cfg = {f'{name}Path': str(tmp_path / name) for name in ['classification', 'ner', 'embedding']}
+    pipeline.save(cfg)
+    loaded = pp.AidaPipeline.load(cfg, dataset_params, logger, dictionary, vectors, definition)
+    assert loaded.predict(fx.SENTENCES) == pipeline.predict(fx.SENTENCES)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import src.pipelines.zebra_wings.length_buckets as lb
+import tests.fixtures as fx
+
+
+def test_sentences_use_the_smallest_bucket_that_fits_them():
+    lengths = np.array([0, 1, 5, 6, 10, 11, 20, 21, 30])
+    # the buckets from max words up are dropped, max words is always the last bucket
+    buckets = lb.bucket_lengths(lengths, [20, 5, 10, 30, 40], 30)
+    np.testing.assert_array_equal(buckets, [5, 5, 5, 10, 10, 20, 20, 30, 30])
+    np.testing.assert_array_equal(lb.bucket_lengths(lengths, [], 30), [30] * len(lengths))
+    groups = lb.group_by_bucket(buckets)
+    assert list(groups) == [5, 10, 20, 30]
+    np.testing.assert_array_equal(groups[10], [3, 4])
+
+
+def test_sequence_lengths_are_the_position_of_the_last_word():
+    x = fx.padded_sentences([3, 0, 6, 1], 6, 4)
+    # a zero vector before the last word (like an unknown word) doesn't end the sentence
+    x[0, 1] = 0
+    np.testing.assert_array_equal(lb.sequence_lengths(x), [3, 0, 6, 1])
+
+
+class FakeNerModel:
+    # the slot probabilities of each word are its first embedding dimensions, so the outputs identify their sentence
+    def __init__(self, num_slots, timesteps=None):
+        self.num_slots = num_slots
+        self.input_shape = [(None, 3), (None, timesteps, 8)]
+        self.predicted_timesteps = []
+
+    def predict(self, inputs):
+        intent_labels, x = inputs
+        assert self.input_shape[1][1] in (None, x.shape[1])
+        self.predicted_timesteps.append(x.shape[1])
+        return x[:, :, :self.num_slots]
+
+
+@pytest.mark.parametrize('fixed_timesteps', [False, True])
+def test_bucketed_prediction_keeps_the_sentences_order(fixed_timesteps):
+    pytest.importorskip('keras')
+    import src.pipelines.zebra_wings.models.ner as nm
+    import src.pipelines.zebra_wings.pipeline_definition as pl
+    definition = fx.pipeline_definition()
+    definition['config']['ner']['lengthBuckets'] = [2, 4]
+    dataset_params = fx.dataset_params()
+    max_words = dataset_params['maxWordsPerSentence']
+    fake_model = FakeNerModel(len(dataset_params['slotsToId']), max_words if fixed_timesteps else None)
+    model = nm.NerModel(pl.model_config(definition, 'ner'), dataset_params, None, lambda *args: None, fake_model)
+    lengths = [6, 1, 3, 2, 5, 4, 1]
+    x = fx.padded_sentences(lengths, max_words, 8)
+    output = model.bucketed_prediction(np.zeros((len(lengths), 3)), x)
+    np.testing.assert_array_equal(output, x[:, :, :len(dataset_params['slotsToId'])])
+    assert sorted(fake_model.predicted_timesteps) == ([max_words] if fixed_timesteps else [2, 4, max_words])
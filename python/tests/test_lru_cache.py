@@ -0,0 +1,61 @@
+import threading
+import time
+import src.utils.lru_cache as lru
+
+
+def test_least_recently_used_items_are_evicted():
+    cache = lru.LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('b', 'missing') == 'missing'
+    assert cache.stats() == {'capacity': 2, 'size': 2, 'hits': 1, 'misses': 1, 'evictions': 1}
+
+
+def test_zero_capacity_disables_the_cache():
+    cache = lru.LRUCache(0)
+    cache.put('a', 1)
+    assert len(cache) == 0
+    assert cache.get('a') is None
+
+
+class YieldingKey:
+    # gives the other threads a chance to run every time the cache hashes a key
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        time.sleep(0)
+        return hash(self.value)
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def test_concurrent_gets_and_puts():
+    cache = lru.LRUCache(4)
+    keys = [YieldingKey(i) for i in range(16)]
+    errors = []
+    operations = 500
+
+    def worker(offset):
+        try:
+            for i in range(operations):
+                key = keys[(i + offset) % len(keys)]
+                value = cache.get(key)
+                assert value is None or value == key.value * 10
+                cache.put(key, key.value * 10)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    stats = cache.stats()
+    assert stats['size'] == 4
+    assert stats['hits'] + stats['misses'] == 8 * operations
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+import pytest
+import src.serving.micro_batcher as mb
+
+TIMEOUT = 5
+
+
+class FakePipeline:
+    # predicts the sentences as their own intent, the predictions can be held with the release event
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict(self, sentences, backend):
+        self.batches.append(list(sentences))
+        self.started.set()
+        assert self.release.wait(TIMEOUT)
+        if self.error is not None:
+            raise self.error
+        return {
+            'classification': [{'intent': sentence, 'confidence': 1.} for sentence in sentences],
+            'ner': [[{'value': sentence}] for sentence in sentences],
+        }
+
+
+def expected_prediction(sentence):
+    return {'classification': [{'intent': sentence, 'confidence': 1.}], 'ner': [[{'value': sentence}]]}
+
+
+def test_batches_are_run_at_max_batch_size():
+    pipeline = FakePipeline()
+    with mb.MicroBatcher(pipeline, max_batch_size=3, max_wait_ms=60000, backend='numpy') as batcher:
+        futures = [batcher.submit(sentence) for sentence in 'abc']
+        assert [future.result(TIMEOUT) for future in futures] == [expected_prediction(sentence) for sentence in 'abc']
+        assert pipeline.batches == [['a', 'b', 'c']]
+        assert batcher.stats()['batchSizes'] == {3: 1}
+
+
+def test_batches_are_run_after_max_wait():
+    pipeline = FakePipeline()
+    with mb.MicroBatcher(pipeline, max_batch_size=100, max_wait_ms=50, backend='numpy') as batcher:
+        start = time.monotonic()
+        futures = [batcher.submit(sentence) for sentence in 'ab']
+        assert [future.result(TIMEOUT) for future in futures] == [expected_prediction('a'), expected_prediction('b')]
+        assert time.monotonic() - start >= 0.05
+        assert pipeline.batches == [['a', 'b']]
+
+
+def test_results_are_returned_to_their_callers():
+    pipeline = FakePipeline()
+    results = {}
+    with mb.MicroBatcher(pipeline, max_batch_size=8, max_wait_ms=10, backend='numpy') as batcher:
+        def caller(idx):
+            results[idx] = batcher.predict(f'sentence {idx}', TIMEOUT)
+
+        threads = [threading.Thread(target=caller, args=(idx,)) for idx in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = batcher.stats()
+    assert results == {idx: expected_prediction(f'sentence {idx}') for idx in range(50)}
+    assert stats['sentences'] == 50
+    assert sum(len(batch) for batch in pipeline.batches) == 50
+
+
+def test_errors_are_raised_by_every_future_of_the_batch():
+    error = ValueError('prediction failed')
+    with mb.MicroBatcher(FakePipeline(error), max_batch_size=3, max_wait_ms=60000, backend='numpy') as batcher:
+        futures = [batcher.submit(sentence) for sentence in 'abc']
+        for future in futures:
+            assert future.exception(TIMEOUT) is error
+
+
+def test_cancelled_futures_are_not_predicted():
+    pipeline = FakePipeline()
+    pipeline.release.clear()
+    with mb.MicroBatcher(pipeline, max_batch_size=1, max_wait_ms=0, backend='numpy') as batcher:
+        first = batcher.submit('a')
+        assert pipeline.started.wait(TIMEOUT)
+        cancelled = batcher.submit('b')
+        last = batcher.submit('c')
+        assert cancelled.cancel()
+        pipeline.release.set()
+        assert first.result(TIMEOUT) == expected_prediction('a')
+        assert last.result(TIMEOUT) == expected_prediction('c')
+    assert cancelled.cancelled()
+    assert pipeline.batches == [['a'], ['c']]
+
+
+def test_close_predicts_the_pending_sentences():
+    pipeline = FakePipeline()
+    pipeline.release.clear()
+    batcher = mb.MicroBatcher(pipeline, max_batch_size=2, max_wait_ms=0, backend='numpy')
+    futures = [batcher.submit('a')]
+    assert pipeline.started.wait(TIMEOUT)
+    futures += [batcher.submit(sentence) for sentence in 'bcd']
+    closing = threading.Thread(target=batcher.close)
+    closing.start()
+    pipeline.release.set()
+    closing.join(TIMEOUT)
+    assert not closing.is_alive()
+    assert [future.result(0) for future in futures] == [expected_prediction(sentence) for sentence in 'abcd']
+    with pytest.raises(RuntimeError):
+        batcher.submit('e')
+    batcher.close()
+
+
+def test_predict_async():
+    pipeline = FakePipeline()
+    with mb.MicroBatcher(pipeline, max_batch_size=3, max_wait_ms=60000, backend='numpy') as batcher:
+        async def predict_all():
+            return await asyncio.gather(*[batcher.predict_async(sentence) for sentence in 'abc'])
+
+        assert asyncio.run(predict_all()) == [expected_prediction(sentence) for sentence in 'abc']
+    assert pipeline.batches == [['a', 'b', 'c']]
@@ -0,0 +1,60 @@
+import numpy as np
+import src.languages.tokenizer_registry as tr
+import src.pipelines.zebra_wings.models.ner_decoder as nd
+
+SLOTS_TO_ID = {'O': 0, 'name': 1, 'time': 2, 'place': 3}
+WORDS = ['call', 'me', 'at', 'nine', 'tomorrow', 'in', 'madrid', 'please']
+MAX_WORDS = 6
+THRESHOLD = 0.5
+
+
+def baseline_decode(tokenizer, sentences, raw_prediction):
+    # NerModel.predict before it was vectorized, word by word
+    prediction = []
+    for i, s in enumerate(sentences):
+        sentence_word_prediction_ids = raw_prediction[i]
+        accumulator = {'current': {'key': '', 'value': '', 'confidence': 0}, 'slots': {}, 'sentence': s}
+        for wpidx, w in enumerate(tokenizer.split_sentence_to_words(s)):
+            wp = sentence_word_prediction_ids[wpidx]
+            current_slot_key = list(SLOTS_TO_ID.keys())[wp['highestIndex']]
+            if accumulator['current']['confidence'] == 0:
+                accumulator['current']['confidence'] = wp['confidence']
+            if accumulator['current']['key'] == current_slot_key:
+                accumulator['current']['value'] += ' ' + w
+                accumulator['current']['confidence'] = (wp['confidence'] + accumulator['current']['confidence']) / 2
+            else:
+                if accumulator['current']['key'] not in ('', 'O') and wp['confidence'] >= THRESHOLD:
+                    accumulator['slots'].setdefault(accumulator['current']['key'], []).append(
+                        {'confidence': wp['confidence'], 'value': accumulator['current']['value']})
+                accumulator['current'] = {'key': current_slot_key, 'value': w, 'confidence': wp['confidence']}
+            if wpidx + 1 == len(sentence_word_prediction_ids):
+                if accumulator['current']['key'] != 'O' and wp['confidence'] >= THRESHOLD:
+                    accumulator['slots'].setdefault(accumulator['current']['key'], []).append(
+                        {'confidence': wp['confidence'], 'value': accumulator['current']['value']})
+        prediction.append({'sentence': accumulator['sentence'], 'slots': accumulator['slots']})
+    return prediction
+
+
+def random_output(rng, num_sentences):
+    # few slot types per sentence, so there are spans of several words, with confidences around the threshold
+    tags = rng.choice([0, 0, 1, 2, 3], (num_sentences, MAX_WORDS))
+    tags[rng.uniform(size=tags.shape) < 0.5] = 1
+    output = rng.uniform(0, 0.25, (num_sentences, MAX_WORDS, len(SLOTS_TO_ID))).astype(np.float32)
+    np.put_along_axis(output, tags[..., None], rng.uniform(0.3, 1, tags.shape + (1,)).astype(np.float32), axis=2)
+    return output
+
+
+def test_decode_matches_the_baseline():
+    tokenizer = tr.get_tokenizer('en')
+    rng = np.random.RandomState(0)
+    names = nd.slot_names(SLOTS_TO_ID)
+    for _ in range(20):
+        # NOTE: the sentences with max words are the only ones whose last span is kept
+        sentences = [' '.join(rng.choice(WORDS, rng.randint(0, MAX_WORDS + 1))) for _ in range(20)]
+        output = random_output(rng, len(sentences))
+        raw_prediction = [
+            [{'highestIndex': h, 'confidence': c} for h, c in zip(indexes, confidences)]
+            for indexes, confidences in zip(output.argmax(axis=2), output.max(axis=2))
+        ]
+        expected = baseline_decode(tokenizer, sentences, raw_prediction)
+        assert nd.decode(output, sentences, tokenizer.tokenize_batch(sentences), names, THRESHOLD) == expected
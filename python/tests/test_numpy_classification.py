@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+import src.pipelines.zebra_wings.numpy_models.classification as nc
+import src.pipelines.zebra_wings.numpy_models.layers_weights as lw
+import src.pipelines.zebra_wings.pipeline_definition as pl
+import tests.fixtures as fx
+
+
+def test_numpy_engine_matches_keras():
+    pytest.importorskip('keras')
+    import src.pipelines.zebra_wings.models.classification as cm
+    dataset_params = fx.dataset_params()
+    model = cm.ClassificationModel.setup(pl.model_config(fx.pipeline_definition(), 'classification'), dataset_params)
+    fx.random_weights(model)
+    # full, partially padded and empty sentences
+    x = fx.padded_sentences([6, 3, 1, 0], dataset_params['maxWordsPerSentence'], 8)
+    engine = nc.ClassificationEngine(lw.LayersWeights.from_keras_model(model))
+    np.testing.assert_allclose(engine.predict(x), model.predict_on_batch(x), rtol=1e-4, atol=1e-5)
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+import src.pipelines.zebra_wings.numpy_models.layers_weights as lw
+import src.pipelines.zebra_wings.numpy_models.ner as nn
+import src.pipelines.zebra_wings.pipeline_definition as pl
+import tests.fixtures as fx
+
+
+@pytest.mark.parametrize('add_attention', [True, False])
+@pytest.mark.parametrize('timesteps', [6, 4])
+def test_numpy_engine_matches_keras_on_padded_sentences(add_attention, timesteps):
+    pytest.importorskip('keras')
+    import src.pipelines.zebra_wings.models.ner as nm
+    config = pl.model_config(fx.pipeline_definition(), 'ner')
+    config['addAttention'] = add_attention
+    dataset_params = fx.dataset_params()
+    model = nm.NerModel.setup(config, dataset_params)
+    fx.random_weights(model)
+    # variable length sentences, the padded words are where the backward direction and the masking differ
+    x = fx.padded_sentences([timesteps, 3, 1, 2], timesteps, 8)
+    intent_labels = np.eye(len(dataset_params['intents']), dtype=np.float32)[[0, 1, 2, 1]]
+    engine = nn.NerEngine(lw.LayersWeights.from_keras_model(model))
+    np.testing.assert_allclose(
+        engine.predict(intent_labels, x), model.predict_on_batch([intent_labels, x]), rtol=1e-4, atol=1e-5)
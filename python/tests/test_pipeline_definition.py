@@ -0,0 +1,48 @@
+import src.pipelines.zebra_wings.pipeline_definition as pl
+import src.serving.inference_pipeline as ip
+import src.utils.ngram_vectors_utils as nvu
+import tests.fixtures as fx
+
+# config keys added after pipeline definitions were already being saved
+NEW_KEYS = {
+    'default': [
+        'earlyStoppingPatience', 'embeddingQuantization', 'evaluationBatchSize', 'incrementalReplayRatio',
+        'parallelTrainingThreads', 'precomputeWordVectors', 'trainingBatchSize', 'trainingCachePath',
+        'trainingQueueSize', 'trainingWorkers', 'wordIdsCacheSize',
+    ],
+    'classification': ['adamBeta1', 'adamBeta2', 'learningRate'],
+    'ner': ['adamBeta1', 'adamBeta2', 'lengthBuckets', 'learningRate'],
+}
+
+
+def old_pipeline_definition():
+    definition = fx.pipeline_definition()
+    for section, keys in NEW_KEYS.items():
+        for key in keys:
+            del definition['config'][section][key]
+    return definition
+
+
+def test_missing_keys_have_their_default_value():
+    definition = old_pipeline_definition()
+    defaults = pl.default_pipeline_definition['config']
+    default_cfg = pl.default_config(definition)
+    assert default_cfg['embeddingDimensions'] == 8
+    for key in NEW_KEYS['default']:
+        assert default_cfg[key] == defaults['default'][key]
+    for model_name in ['classification', 'ner']:
+        cfg = pl.model_config(definition, model_name)
+        assert cfg['maxNgrams'] == 8
+        for key in NEW_KEYS[model_name]:
+            assert cfg[key] == defaults[model_name][key]
+    assert pl.model_config(definition, 'ner')['rnnUnits'] == 3
+
+
+def test_inference_pipeline_loads_with_an_old_pipeline_definition(tmp_path):
+    dataset_params = fx.dataset_params()
+    cfg = fx.write_numpy_pipeline_artifacts(str(tmp_path), dataset_params)
+    nvu.save_ngram_vectors(fx.ngram_vectors(), str(tmp_path / 'vectors'))
+    vectors_path = str(tmp_path / 'vectors')
+    old = ip.InferencePipeline.from_artifacts(cfg, dataset_params, vectors_path, old_pipeline_definition())
+    current = ip.InferencePipeline.from_artifacts(cfg, dataset_params, vectors_path, fx.pipeline_definition())
+    assert old.predict(fx.SENTENCES) == current.predict(fx.SENTENCES)
@@ -0,0 +1,36 @@
+import pytest
+import tests.fixtures as fx
+
+
+def evaluated_pipeline(evaluation_batch_size):
+    import src.pipelines.zebra_wings.pipeline as pp
+    definition = fx.pipeline_definition()
+    definition['config']['default']['evaluationBatchSize'] = evaluation_batch_size
+    vectors = fx.ngram_vectors()
+    dictionary = fx.ngram_to_id_dictionary(vectors)
+    pipeline = pp.AidaPipeline(fx.dataset_params(), lambda *args: None, dictionary, None, None, None, vectors, definition)
+    for name in ['classification', 'ner']:
+        fx.random_weights(pipeline.models()[name].keras_model())
+    return pipeline
+
+
+def test_the_test_sentences_are_embedded_once_per_evaluation_chunk(monkeypatch):
+    pytest.importorskip('keras')
+    import src.pipelines.zebra_wings.embeddings.embeddings_model as em
+    test_dataset = {
+        'testX': fx.SENTENCES * 2,
+        'testY': [0, 2, 1, 2] * 2,
+        'testY2': [[0, 0], [0, 0, 2, 0], [0], [0, 1, 0, 2, 2, 0]] * 2,
+    }
+    expected = evaluated_pipeline(1000).test(test_dataset)
+    pipeline = evaluated_pipeline(3)
+    embed = em.EmbeddingsModel.embed
+    embedded_lengths = []
+
+    def counting_embed(self, sentences, *args):
+        embedded_lengths.append(len(sentences))
+        return embed(self, sentences, *args)
+
+    monkeypatch.setattr(em.EmbeddingsModel, 'embed', counting_embed)
+    assert pipeline.test(test_dataset) == expected
+    assert embedded_lengths == [3, 3, 2]
@@ -0,0 +1,46 @@
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+import src.serving.process_pool as pp
+
+
+class UnpicklableError(Exception):
+    def __init__(self):
+        super(UnpicklableError, self).__init__('unpicklable')
+        self.lock = threading.Lock()
+
+
+class FakePipeline:
+    def predict(self, sentences, backend='numpy'):
+        if sentences == ['fail']:
+            raise ValueError('bad sentence')
+        if sentences == ['unpicklable']:
+            raise UnpicklableError()
+        if sentences == ['exit']:
+            os._exit(3)
+        return {'classification': [s.upper() for s in sentences], 'ner': []}
+
+
+def test_predicts_the_batches_at_the_workers():
+    with pp.ProcessPool(FakePipeline(), 2) as pool:
+        futures = [pool.submit([f'sentence {i}']) for i in range(6)]
+        assert [f.result(5)['classification'] for f in futures] == [[f'SENTENCE {i}'] for i in range(6)]
+        assert sum(pool.stats()['batches']) == 6
+
+
+def test_worker_errors_are_raised_by_the_futures():
+    with pp.ProcessPool(FakePipeline(), 1) as pool:
+        with pytest.raises(ValueError, match='bad sentence'):
+            pool.predict(['fail'])
+        with pytest.raises(RuntimeError, match='UnpicklableError: unpicklable'):
+            pool.submit(['unpicklable']).result(5)
+        assert pool.predict(['ok'])['classification'] == ['OK']
+
+
+def test_a_dead_worker_breaks_the_pool():
+    with pp.ProcessPool(FakePipeline(), 2) as pool:
+        with pytest.raises(BrokenProcessPool, match='exit'):
+            pool.submit(['exit']).result(10)
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(['ok'])
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import src.pipelines.zebra_wings.evaluation as ev
+import src.utils.quantization_report as qr
+
+
+def evaluation_stats():
+    classification = ev.classification_stats(
+        [0, 1, 1, 2], np.array([0, 1, 2, 2]), np.array([0.9, 0.8, 0.7, 0.1]), ['greet', 'bye', 'ask'], 0.3)
+    expected_tags = ev.padded_tags([[0, 1, 1], [0, 0], [1]], 4)
+    predicted_tags = np.array([[0, 1, 1, 0], [0, 1, 0, 0], [1, 0, 0, 0]])
+    ner = ev.ner_stats(expected_tags, predicted_tags, ['O', 'name'])
+    return {'classificationStats': classification, 'nerStats': ner}
+
+
+def test_stats_accuracy_of_the_evaluation_stats():
+    stats = evaluation_stats()
+    # 2 correct, 1 wrong and 1 low confidence sentences
+    assert qr.stats_accuracy(stats['classificationStats']) == 0.5
+    assert qr.stats_accuracy(stats['nerStats']) == pytest.approx(2 / 3)
+    assert qr.stats_accuracy({'correct': 0, 'wrong': 0}) == 0
+
+
+def test_quantization_accuracy_report_of_the_evaluation_stats(monkeypatch):
+    pytest.importorskip('keras')
+    import src.pipelines.zebra_wings.pipeline as pp
+
+    class FakePipeline:
+        def __init__(self, *args):
+            pass
+
+        def test(self, test_dataset):
+            return evaluation_stats()
+
+    monkeypatch.setattr(pp, 'AidaPipeline', FakePipeline)
+    vectors = np.random.RandomState(0).randn(10, 4)
+    report = qr.quantization_accuracy_report({}, {}, vectors, {}, None, None, quantizations=['float16', 'int8'])
+    assert report['float32']['classificationAccuracy'] == 0.5
+    assert report['int8']['nerAccuracyDelta'] == 0
+    assert report['float16']['bytes'] < report['float32']['bytes']
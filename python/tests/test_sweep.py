@@ -0,0 +1,59 @@
+import threading
+import types
+import pytest
+import tests.fixtures as fx
+
+keras = pytest.importorskip('keras')
+import src.pipelines.zebra_wings.sweep as sw  # noqa: E402
+
+
+def pruning(warmup_epochs):
+    callback = sw.MedianPruning('classification', {f'classification/{epoch}': [1., 1., 1.] for epoch in range(3)},
+                                threading.Lock(), min_trials=3, warmup_epochs=warmup_epochs)
+    callback.model = types.SimpleNamespace(stop_training=False)
+    return callback
+
+
+@pytest.mark.parametrize('warmup_epochs', [0, 1, 2])
+def test_median_pruning_waits_for_the_warmup_epochs(warmup_epochs):
+    callback = pruning(warmup_epochs)
+    for epoch in range(warmup_epochs):
+        callback.on_epoch_end(epoch, {'val_loss': 2.})
+        assert not callback.pruned
+    callback.on_epoch_end(warmup_epochs, {'val_loss': 2.})
+    assert callback.pruned and callback.model.stop_training
+
+
+def test_prepare_training_data_rebuilds_stale_datasets(tmp_path):
+    definition = fx.pipeline_definition()
+    definition['config']['default']['precomputeWordVectors'] = True
+    vectors = fx.ngram_vectors()
+    dictionary = fx.ngram_to_id_dictionary(vectors)
+    path = str(tmp_path / 'training_data')
+
+    def prepare(sentences, dataset_params=fx.dataset_params()):
+        train_dataset = {'trainX': sentences, 'trainY': [0] * len(sentences), 'trainY2': [[1] for _ in sentences]}
+        return sw.prepare_training_data(train_dataset, dataset_params, dictionary, vectors, definition, path)
+
+    first = prepare(['hello there', 'bye'])
+    assert len(first) == 2
+    assert prepare(['hello there', 'bye']).fingerprint == first.fingerprint
+    assert len(prepare(['hello there', 'bye', 'what time is it'])) == 3
+    dataset_params = dict(fx.dataset_params(), maxWordsPerSentence=4)
+    assert prepare(['hello there', 'bye', 'what time is it'], dataset_params).embedded().shape[1] == 4
+
+
+def test_trials_share_the_training_data_of_their_embedding_config(tmp_path):
+    definition = fx.pipeline_definition()
+    definition['config']['default']['precomputeWordVectors'] = True
+    search_space = {'default': {'embeddingQuantization': [None, 'int8'], 'maxNgrams': [6, 8], 'drop': [0.3, 0.5]}}
+    definitions = sw.trials_definitions(search_space, definition)
+    vectors = fx.ngram_vectors()
+    train_dataset = {'trainX': ['hello there', 'bye'], 'trainY': [0, 1], 'trainY2': [[1, 0], [0]]}
+    paths = sw.prepare_trials_training_data(
+        definitions, train_dataset, fx.dataset_params(), fx.ngram_to_id_dictionary(vectors), vectors, str(tmp_path),
+        lambda *args: None)
+    embedding_configs = [(params['default.embeddingQuantization'], params['default.maxNgrams']) for params, _ in definitions]
+    assert len(set(paths)) == 4
+    for config, path in zip(embedding_configs, paths):
+        assert all((other_path == path) == (other_config == config) for other_config, other_path in zip(embedding_configs, paths))
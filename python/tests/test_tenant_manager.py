@@ -0,0 +1,125 @@
+import threading
+import pytest
+import src.pipelines.zebra_wings.numpy_models.layers_weights as lw
+import src.serving.inference_pipeline as ip
+import src.serving.tenant_manager as tm
+import src.utils.metrics as mu
+import src.utils.ngram_vectors_utils as nvu
+import tests.fixtures as fx
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    dataset_params = fx.dataset_params()
+    cfg = fx.write_numpy_pipeline_artifacts(str(tmp_path), dataset_params)
+    nvu.save_ngram_vectors(fx.ngram_vectors(), str(tmp_path / 'vectors'))
+    size = lw.LayersWeights.from_tfjs_artifacts(cfg['classificationPath']).nbytes()
+    size += lw.LayersWeights.from_tfjs_artifacts(cfg['nerPath']).nbytes()
+    return cfg, dataset_params, str(tmp_path / 'vectors'), size
+
+
+def manager(artifacts, tenants_in_budget=10, metrics=mu.NOOP_METRICS):
+    cfg, dataset_params, vectors_path, size = artifacts
+    tenant_manager = tm.TenantManager({'en': vectors_path}, size * tenants_in_budget, fx.pipeline_definition(), metrics)
+    for tenant_id in 'abcd':
+        tenant_manager.register(tenant_id, cfg, dataset_params)
+    return tenant_manager
+
+
+def test_tenants_are_loaded_on_their_first_request(artifacts):
+    cfg, dataset_params, vectors_path, _ = artifacts
+    metrics = mu.InMemoryMetrics()
+    tenant_manager = manager(artifacts, metrics=metrics)
+    assert tenant_manager.stats()['loads'] == 0
+    expected = ip.InferencePipeline.from_artifacts(cfg, dataset_params, vectors_path, fx.pipeline_definition())
+    assert tenant_manager.predict('a', fx.SENTENCES) == expected.predict(fx.SENTENCES)
+    assert tenant_manager.pipeline('a') is tenant_manager.pipeline('a')
+    assert tenant_manager.stats()['loads'] == 1
+    assert metrics.snapshot()['histograms']['tenant_load_seconds']['count'] == 1
+    with pytest.raises(KeyError):
+        tenant_manager.pipeline('unknown')
+
+
+def test_concurrent_first_requests_load_the_tenant_once(artifacts):
+    tenant_manager = manager(artifacts)
+    threads = [threading.Thread(target=tenant_manager.predict, args=('a', ['hello'])) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = tenant_manager.stats()
+    assert stats['loads'] == 1
+    assert stats['residentBytes'] == artifacts[3]
+
+
+def test_least_recently_used_tenants_are_evicted_over_the_budget(artifacts):
+    metrics = mu.InMemoryMetrics()
+    tenant_manager = manager(artifacts, tenants_in_budget=2, metrics=metrics)
+    tenant_manager.pipeline('a')
+    tenant_manager.pipeline('b')
+    tenant_manager.pipeline('a')
+    # b is the least recently used one
+    tenant_manager.pipeline('c')
+    stats = tenant_manager.stats()
+    assert (stats['residentTenants'], stats['evictions'], stats['residentBytes']) == (2, 1, artifacts[3] * 2)
+    tenant_manager.pipeline('a')
+    tenant_manager.pipeline('c')
+    assert tenant_manager.stats()['loads'] == 3
+    tenant_manager.pipeline('b')
+    assert tenant_manager.stats()['loads'] == 4
+    assert metrics.snapshot()['counters']['tenant_evictions'] == 2
+    assert metrics.snapshot()['gauges']['tenants_resident'] == 2
+
+
+def test_the_resident_bytes_stay_right_under_concurrent_requests(artifacts):
+    tenant_manager = manager(artifacts, tenants_in_budget=2)
+
+    def requests(tenant_ids):
+        for tenant_id in tenant_ids * 20:
+            tenant_manager.pipeline(tenant_id)
+    threads = [threading.Thread(target=requests, args=(tenant_ids,)) for tenant_ids in ['abcd', 'dcba', 'abab', 'cdcd']]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = tenant_manager.stats()
+    assert stats['residentTenants'] <= 2
+    assert stats['residentBytes'] == stats['residentTenants'] * artifacts[3]
+
+
+def test_registering_a_tenant_again_while_it_loads(artifacts, monkeypatch):
+    cfg, dataset_params, _, size = artifacts
+    tenant_manager = manager(artifacts)
+    loading = threading.Event()
+    release = threading.Event()
+    from_tfjs_artifacts = lw.LayersWeights.from_tfjs_artifacts
+
+    def slow_from_tfjs_artifacts(path):
+        loading.set()
+        release.wait(5)
+        return from_tfjs_artifacts(path)
+    monkeypatch.setattr(lw.LayersWeights, 'from_tfjs_artifacts', staticmethod(slow_from_tfjs_artifacts))
+    pipelines = []
+    thread = threading.Thread(target=lambda: pipelines.append(tenant_manager.pipeline('a')))
+    thread.start()
+    assert loading.wait(5)
+    tenant_manager.register('a', cfg, dict(dataset_params))
+    release.set()
+    thread.join()
+    # the pipeline of the old registration is returned to its request, but isn't kept
+    assert len(pipelines) == 1
+    assert tenant_manager.stats()['residentTenants'] == 0
+    assert tenant_manager.pipeline('a') is not pipelines[0]
+    stats = tenant_manager.stats()
+    assert (stats['loads'], stats['residentTenants'], stats['residentBytes']) == (2, 1, size)
+
+
+def test_tenants_of_a_language_share_the_word_ids_cache(artifacts):
+    tenant_manager = manager(artifacts)
+    tenant_manager.predict('a', fx.SENTENCES)
+    stats = tenant_manager.stats()['wordIds']['en']
+    assert stats['size'] > 0
+    # NOTE: the word vectors of tenant a are cached, so tenant b doesn't encode the words again
+    assert tenant_manager.pipeline('b').embeddings_model().cache_stats()['wordIds'] == stats
+    tenant_manager.pipeline('b').embeddings_model().word_ids_row('unseen')
+    assert tenant_manager.pipeline('a').embeddings_model().cache_stats()['wordIds']['size'] == stats['size'] + 1
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import src.languages.base_tokenizer as bt
+import src.languages.tokenizer_registry as tr
+import src.pipelines.zebra_wings.numpy_models.layers_weights as lw
+import src.serving.inference_pipeline as ip
+import tests.fixtures as fx
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # NOTE: the registry is global, the languages registered by the tests are dropped after them
+    monkeypatch.setattr(tr, 'LANGUAGE_MODULES', dict(tr.LANGUAGE_MODULES))
+    monkeypatch.setattr(tr, '_tokenizers', {})
+    return tr
+
+
+def pipeline(tmp_path, language):
+    dataset_params = dict(fx.dataset_params(), language=language)
+    cfg = fx.write_numpy_pipeline_artifacts(str(tmp_path), dataset_params)
+    vectors = fx.ngram_vectors()
+    return ip.InferencePipeline(
+        dataset_params,
+        fx.ngram_to_id_dictionary(vectors),
+        np.array([vector for _, vector in vectors], dtype=np.float32),
+        lw.LayersWeights.from_tfjs_artifacts(cfg['classificationPath']),
+        lw.LayersWeights.from_tfjs_artifacts(cfg['nerPath']),
+        fx.pipeline_definition(),
+    )
+
+
+def test_pipelines_of_the_same_language_share_the_tokenizer(registry, tmp_path):
+    first = pipeline(tmp_path / 'first', 'en').embeddings_model().tokenizer
+    second = pipeline(tmp_path / 'second', 'EN').embeddings_model().tokenizer
+    assert first is second
+    assert first is not registry.get_tokenizer('es')
+    assert isinstance(first, bt.BaseTokenizer)
+
+
+def test_unknown_languages_raise(registry):
+    with pytest.raises(ValueError, match='Unknown language: fr'):
+        registry.get_tokenizer('fr')
+
+
+def test_register_language_replaces_the_cached_tokenizer(registry):
+    registry.register_language('xx', 'src.languages.en.english_tokenizer')
+    tokenizer = registry.get_tokenizer('xx')
+    assert registry.get_tokenizer('xx') is tokenizer
+    assert 'xx' in registry.available_languages()
+    registry.register_language('XX', 'src.languages.es.spanish_tokenizer')
+    spanish = registry.get_tokenizer('xx')
+    assert spanish is not tokenizer
+    assert spanish.NUMBERS_MAP['uno'] == '1'
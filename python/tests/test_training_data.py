@@ -0,0 +1,62 @@
+import os
+import numpy as np
+import pytest
+import src.pipelines.zebra_wings.training_data as td
+import tests.fixtures as fx
+
+CONFIG = {'batchSize': 2, 'embeddingDimensions': 8}
+
+
+class FakeEmbeddingsModel:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def embed(self, sentences):
+        if self.fail:
+            raise RuntimeError('embedding failed')
+        return fx.padded_sentences([len(s.split()) for s in sentences], 6, 8)
+
+
+def dataset(sentences):
+    return {'trainX': sentences, 'trainY': [idx % 3 for idx in range(len(sentences))], 'trainY2': [[1] for _ in sentences]}
+
+
+def test_prepare_and_open_the_training_data():
+    training_data = td.TrainingData.prepare(
+        dataset(['hi there', 'bye', 'what time is it']), FakeEmbeddingsModel(), fx.dataset_params(), CONFIG)
+    try:
+        opened = td.TrainingData.open(training_data.path)
+        assert len(opened) == 3
+        np.testing.assert_array_equal(opened.lengths(), [2, 1, 4])
+        np.testing.assert_array_equal(opened.intents().argmax(axis=1), [0, 1, 2])
+        np.testing.assert_array_equal(opened.slots()[:, :2], [[1, 0]] * 3)
+    finally:
+        training_data.close()
+    assert not os.path.exists(training_data.path)
+
+
+def test_prepare_an_empty_dataset():
+    training_data = td.TrainingData.prepare(dataset([]), FakeEmbeddingsModel(), fx.dataset_params(), CONFIG)
+    try:
+        assert len(training_data) == 0
+        assert len(td.TrainingData.open(training_data.path)) == 0
+        assert training_data.slots().shape == (0, 6)
+    finally:
+        training_data.close()
+
+
+def test_failed_prepare_removes_the_temporary_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(td.tempfile, 'mkdtemp', lambda prefix: str(tmp_path / 'cache'))
+    with pytest.raises(RuntimeError):
+        td.TrainingData.prepare(dataset(['hi']), FakeEmbeddingsModel(fail=True), fx.dataset_params(), CONFIG)
+    assert not (tmp_path / 'cache').exists()
+
+
+def test_the_fingerprint_is_kept_at_the_meta(tmp_path):
+    fingerprint = td.fingerprint(dataset(['hi']), fx.dataset_params(), np.arange(3))
+    assert fingerprint == td.fingerprint(dataset(['hi']), fx.dataset_params(), np.arange(3))
+    assert fingerprint != td.fingerprint(dataset(['bye']), fx.dataset_params(), np.arange(3))
+    td.TrainingData.prepare(dataset(['hi']), FakeEmbeddingsModel(), fx.dataset_params(), CONFIG, str(tmp_path), fingerprint)
+    opened = td.TrainingData.open(str(tmp_path))
+    assert opened.fingerprint == fingerprint
+    assert len(opened) == 1
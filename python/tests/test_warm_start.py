@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+import src.pipelines.zebra_wings.warm_start as ws
+import tests.fixtures as fx
+
+
+class Dense:
+    def __init__(self, name, weights):
+        self.name = name
+        self.weights = weights
+
+    def get_weights(self):
+        return [w.copy() for w in self.weights]
+
+    def set_weights(self, weights):
+        assert [w.shape for w in weights] == [w.shape for w in self.weights]
+        self.weights = weights
+
+
+class Bidirectional(Dense):
+    pass
+
+
+class FakeModel:
+    def __init__(self, layers):
+        self.layers = layers
+
+
+def fake_model(num_intents, num_slots, seed, encoder_name='bidi_encoder', output_name='dense_1'):
+    rng = np.random.RandomState(seed)
+    return FakeModel([
+        Dense('nerConv1', [rng.randn(2, 3)]),
+        # the encoder input rows start with the intents one hot encoding, followed by 2 more inputs
+        Bidirectional(encoder_name, [rng.randn(num_intents + 2, 4), rng.randn(4)]),
+        Dense(output_name, [rng.randn(4, num_slots), rng.randn(num_slots)]),
+    ])
+
+
+def test_new_intents_and_classes_are_initialized_and_the_previous_weights_kept():
+    previous = fake_model(2, 3, seed=0)
+    # NOTE: keras numbers the default layer names of every model built in the session
+    model = fake_model(4, 5, seed=1, output_name='dense_7')
+    initialized = [layer.get_weights() for layer in model.layers]
+    ws.transfer_weights(previous, model, 2)
+    conv, encoder, output = model.layers
+    np.testing.assert_array_equal(conv.weights[0], previous.layers[0].weights[0])
+    kernel = encoder.weights[0]
+    np.testing.assert_array_equal(kernel[:2], previous.layers[1].weights[0][:2])
+    np.testing.assert_array_equal(kernel[2:4], initialized[1][0][2:4])
+    np.testing.assert_array_equal(kernel[4:], previous.layers[1].weights[0][2:])
+    np.testing.assert_array_equal(encoder.weights[1], previous.layers[1].weights[1])
+    for weights, previous_weights, initialized_weights in zip(output.weights, previous.layers[2].weights, initialized[2]):
+        np.testing.assert_array_equal(weights[..., :3], previous_weights)
+        np.testing.assert_array_equal(weights[..., 3:], initialized_weights[..., 3:])
+
+
+@pytest.mark.parametrize('model', [
+    fake_model(2, 3, seed=1, encoder_name='encoder'),
+    FakeModel(fake_model(2, 3, seed=1).layers[:2]),
+    FakeModel([Dense(layer.name, layer.weights) for layer in fake_model(2, 3, seed=1).layers]),
+])
+def test_other_architectures_raise(model):
+    with pytest.raises(ValueError, match='architecture'):
+        ws.transfer_weights(fake_model(2, 3, seed=0), model, 2)
+
+
+def test_keras_models_with_new_intents_and_slots_keep_the_previous_weights():
+    pytest.importorskip('keras')
+    import src.pipelines.zebra_wings.models.classification as cm
+    import src.pipelines.zebra_wings.models.ner as nm
+    import src.pipelines.zebra_wings.pipeline_definition as pl
+    definition = fx.pipeline_definition()
+    previous_params = fx.dataset_params()
+    dataset_params = dict(
+        previous_params, intents=previous_params['intents'] + ['thanks'], slotsToId=dict(previous_params['slotsToId'], place=3))
+    ws.validate_dataset_params(previous_params, dataset_params)
+    num_intents = len(previous_params['intents'])
+    num_slots = len(previous_params['slotsToId'])
+    for model_class, name in [(cm.ClassificationModel, 'classification'), (nm.NerModel, 'ner')]:
+        config = pl.model_config(definition, name)
+        previous = model_class.setup(config, previous_params)
+        fx.random_weights(previous)
+        model = model_class.setup(config, dataset_params)
+        initialized = [layer.get_weights() for layer in model.layers]
+        ws.transfer_weights(previous, model, num_intents)
+        num_classes = num_intents if name == 'classification' else num_slots
+        for previous_layer, layer, initialized_weights in zip(previous.layers, model.layers, initialized):
+            for previous_weights, weights, initial in zip(previous_layer.get_weights(), layer.get_weights(), initialized_weights):
+                if layer is model.layers[-1]:
+                    np.testing.assert_array_equal(weights[..., :num_classes], previous_weights)
+                    np.testing.assert_array_equal(weights[..., num_classes:], initial[..., num_classes:])
+                elif previous_weights.shape != weights.shape:
+                    # the rows of the new intent in the ner encoder input
+                    np.testing.assert_array_equal(weights[:num_intents], previous_weights[:num_intents])
+                    np.testing.assert_array_equal(weights[num_intents], initial[num_intents])
+                    np.testing.assert_array_equal(weights[num_intents + 1:], previous_weights[num_intents:])
+                else:
+                    np.testing.assert_array_equal(weights, previous_weights)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+import src.languages.tokenizer_registry as tr
+import src.pipelines.zebra_wings.embeddings.embeddings_model as em
+import tests.fixtures as fx
+
+MAX_WORDS = 6
+MAX_NGRAMS = 4
+SENTENCES = [
+    # padding words, words in the dictionary and words made of bigrams
+    'hello there',
+    'hello hello hello hello hello hello',
+    # unknown words (no ngram in the dictionary) and words longer than max ngrams
+    '%%% what time',
+    'extraordinarily long words like abcdefghijklmnop',
+    '',
+]
+
+
+def embeddings_model(precompute_word_vectors, quantization):
+    vectors = fx.ngram_vectors()
+    return em.EmbeddingsModel(
+        fx.ngram_to_id_dictionary(vectors), MAX_WORDS, MAX_NGRAMS, 8, tr.get_tokenizer('en'), None, vectors, 100,
+        precompute_word_vectors, quantization=quantization)
+
+
+@pytest.mark.parametrize('quantization', [None, 'int8'])
+def test_precomputed_word_vectors_match_the_keras_embeddings(quantization):
+    pytest.importorskip('keras')
+    keras_embeddings = embeddings_model(False, quantization).embed(SENTENCES)
+    precomputed = embeddings_model(True, quantization).embed(SENTENCES)
+    assert precomputed.shape == keras_embeddings.shape == (len(SENTENCES), MAX_WORDS, 8)
+    np.testing.assert_allclose(precomputed, keras_embeddings, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,32 @@
+import * as tf from '@tensorflow/tfjs';
+
+// Repeats a [batch, features] vector once per timestep of a [batch, timesteps, ...] sequence.
+// Same as repeatVector but following the sequence length, needed to load the python ner models
+// that accept variable length (length bucketed) sentences.
+export class RepeatToSequence extends tf.layers.Layer {
+    public static className = 'RepeatToSequence';
+    public className = RepeatToSequence.className;
+
+    constructor(config?: any) {
+        super(config || {});
+        this.supportsMasking = true;
+    }
+
+    public computeOutputShape(inputShape: tf.Shape[]) {
+        return [inputShape[0][0], inputShape[1][1], inputShape[0][1]];
+    }
+
+    public computeMask(inputs: tf.Tensor | tf.Tensor[], mask?: tf.Tensor | tf.Tensor[]) {
+        return (Array.isArray(mask) ? mask[1] : mask) as tf.Tensor;
+    }
+
+    public call(inputs: tf.Tensor[], kwargs: any) {
+        return tf.tidy(() => {
+            this.invokeCallHook(inputs, kwargs);
+            const [vector, sequence] = inputs;
+            return tf.tile(tf.expandDims(vector, 1), [1, sequence.shape[1] as number, 1]);
+        });
+    }
+}
+
+tf.serialization.SerializationMap.register(RepeatToSequence);
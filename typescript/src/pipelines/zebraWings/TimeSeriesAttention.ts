@@ -1,5 +1,6 @@
 import * as tf from '@tensorflow/tfjs';
 import { InputSpec } from '@tensorflow/tfjs-layers/dist/engine/topology';
+import { LayerVariable } from '@tensorflow/tfjs-layers/dist/variables';
 
 // NOTE:
 // Attention of multi dimensional time series following the implementation
@@ -10,7 +11,10 @@ export class TimeSeriesAttention extends tf.layers.Layer {
     public static className = 'TimeSeriesAttention';
     public className = TimeSeriesAttention.className;
 
-    public timed: tf.layers.Layer | null = null;
+    public kernel1: LayerVariable | null = null;
+    public bias1: LayerVariable | null = null;
+    public kernel2: LayerVariable | null = null;
+    public bias2: LayerVariable | null = null;
 
     constructor(config?: any) {
         super(config || {});
@@ -18,89 +22,53 @@ export class TimeSeriesAttention extends tf.layers.Layer {
         this.supportsMasking = true;
     }
 
-    public build(inputShape: tf.Shape): void {
-        const dimensions = inputShape[2] as number;
-        const timed = tf.sequential({ name: 'per_time_step' });
-        timed.add(
-            tf.layers.dense({
-                activation: 'softmax',
-                inputShape: [dimensions],
-                kernelInitializer: 'zeros',
-                name: 'att_dense1',
-                units: dimensions
-            })
-        );
-        timed.add(tf.layers.dense({ units: dimensions, kernelInitializer: 'glorotNormal', activation: 'tanh', name: 'att_dense2' }));
-        this.timed = tf.layers.timeDistributed({ layer: timed, name: 'att_td' });
-        this.timed.build(inputShape);
-        this.trainableWeights = this.timed.trainableWeights;
-        this.nonTrainableWeights = this.timed.nonTrainableWeights;
+    public build(inputShape: tf.Shape | tf.Shape[]): void {
+        const shape = (Array.isArray(inputShape[0]) ? inputShape[0] : inputShape) as tf.Shape;
+        const dimensions = shape[2] as number;
+        // NOTE: same weights (and names) as the python layer, the two per time step dense layers
+        this.kernel1 = this.addWeight('att_dense1/kernel', [dimensions, dimensions], 'float32', tf.initializers.zeros());
+        this.bias1 = this.addWeight('att_dense1/bias', [dimensions], 'float32', tf.initializers.zeros());
+        this.kernel2 = this.addWeight('att_dense2/kernel', [dimensions, dimensions], 'float32', tf.initializers.glorotNormal({}));
+        this.bias2 = this.addWeight('att_dense2/bias', [dimensions], 'float32', tf.initializers.zeros());
         this.built = true;
     }
 
-    public call(inputs: tf.Tensor[], kwargs: any) {
-        if (!this.built || !this.timed) {
+    public computeMask(inputs: tf.Tensor | tf.Tensor[], mask?: tf.Tensor | tf.Tensor[]) {
+        return (Array.isArray(mask) ? mask[0] : mask) as tf.Tensor;
+    }
+
+    public call(inputs: tf.Tensor | tf.Tensor[], kwargs: any) {
+        if (!this.built || !this.kernel1 || !this.bias1 || !this.kernel2 || !this.bias2) {
             throw new Error('Calling TimeSeriesAttention layer before it was built correctly.');
         }
+        const [kernel1, bias1, kernel2, bias2] = [this.kernel1, this.bias1, this.kernel2, this.bias2];
         return tf.tidy(() => {
             this.invokeCallHook(inputs, kwargs);
-            const encoded = (this.timed as tf.layers.Layer).apply(inputs) as tf.Tensor;
-            const permuted = tf.layers.permute({ dims: [2, 1] }).apply(encoded) as tf.Tensor;
-            // NOTE: this code is a workaround the absense of batch_dot in tfjs
-            // TODO: replace this with batch_dot
-            const unstackedInput = tf.unstack(inputs[0]);
-            const unstackedPermuted = tf.unstack(permuted);
-            const dotProds = unstackedInput.map((ui, i) => tf.dot(ui, unstackedPermuted[i]));
-            const selfAttend = tf.stack(dotProds);
-            const attention = tf.softmax(selfAttend);
-            const attentionPermuted = tf.layers.permute({ dims: [2, 1] }).apply(attention) as tf.Tensor;
-            const unstackedAttention = tf.unstack(attentionPermuted);
-            const unstackedOutput = unstackedAttention.map((ua, i) => tf.dot(ua, unstackedInput[i]));
-            const output = tf.stack(unstackedOutput);
-            return output;
+            const input = (Array.isArray(inputs) ? inputs[0] : inputs) as tf.Tensor3D;
+            const dimensions = input.shape[2];
+            // both dense layers are applied to all the timesteps at once
+            const flat = input.reshape([-1, dimensions]) as tf.Tensor2D;
+            const hidden = tf.softmax(tf.add(tf.matMul(flat, kernel1.read() as tf.Tensor2D), bias1.read())) as tf.Tensor2D;
+            const encoded = tf.tanh(tf.add(tf.matMul(hidden, kernel2.read() as tf.Tensor2D), bias2.read())).reshape(input.shape);
+            let selfAttend = tf.matMul(input, encoded as tf.Tensor3D, false, true);
+            const mask = Array.isArray(kwargs.mask) ? kwargs.mask[0] : kwargs.mask;
+            let floatMask: tf.Tensor | null = null;
+            if (mask) {
+                // padded timesteps can't be attended and don't contribute to the output
+                floatMask = (mask as tf.Tensor).toFloat();
+                selfAttend = tf.sub(selfAttend, tf.mul(tf.sub(1, tf.expandDims(floatMask, 1)), 1e9)) as tf.Tensor3D;
+            }
+            let attention = tf.softmax(selfAttend) as tf.Tensor3D;
+            if (floatMask) {
+                attention = tf.mul(attention, tf.expandDims(floatMask, 2)) as tf.Tensor3D;
+            }
+            return tf.matMul(attention, input, true, false);
         });
     }
 
-    public computeOutputShape(inputShape: tf.Shape) {
+    public computeOutputShape(inputShape: tf.Shape | tf.Shape[]) {
         return inputShape;
     }
 }
 
 tf.serialization.SerializationMap.register(TimeSeriesAttention);
-
-// WIP!
-// export function batchDot(x: tf.Tensor, y: tf.Tensor): tf.Tensor {
-//     const xNdim = x.shape.length;
-//     const yNdim = y.shape.length;
-//     const axes = [xNdim - 1, yNdim - 2];
-//     let reshapedX = x;
-//     let reshapedY = y;
-//     let diff = 0;
-//     if (xNdim > yNdim) {
-//         diff = xNdim - yNdim;
-//         reshapedY = tf.reshape(y, y.shape.concat(Array(diff).fill(1)));
-//     } else if (yNdim > xNdim) {
-//         diff = yNdim - xNdim;
-//         reshapedX = tf.reshape(x, x.shape.concat(Array(diff).fill(1)));
-//     }
-//     let out;
-//     if (xNdim === 2 && yNdim === 2) {
-//         if (axes[0] === axes[1]) {
-//             out = tf.sum(tf.mul(reshapedX, reshapedY), axes[0]);
-//         } else {
-//             out = tf.sum(tf.mul(tf.transpose(reshapedX, [1, 0]), reshapedY), axes[1]);
-//         }
-//     } else {
-//         const adjX = axes[0] !== xNdim - 1;
-//         const adjY = axes[1] === yNdim - 1;
-//         out = tf.matMul(reshapedX, reshapedY, adjX, adjY);
-//     }
-//     if (diff) {
-//         const idx = xNdim > yNdim - 3 ? xNdim + yNdim - 3 : xNdim - 1;
-//         out = tf.squeeze(out, Array.from(Array(idx + diff).keys()));
-//     }
-//     if (out.shape.length === 1) {
-//         out = tf.expandDims(out, 1);
-//     }
-//     return out;
-// }
@@ -2,6 +2,7 @@ import * as tf from '@tensorflow/tfjs';
 import { chunk, flatMapDeep } from 'lodash';
 import * as types from '../../../types';
 import { EmbeddingsModel } from '../embeddings/EmbeddingsModel';
+import '../RepeatToSequence';
 import { TimeSeriesAttention } from '../TimeSeriesAttention';
 
 export default class NerModel extends types.PipelineModel implements types.IPipelineModel {